@@ -7,12 +7,14 @@ Django settings for SIR (backend_django).
 - Soporta SQLite/Postgres/MySQL por DB_ENGINE
 - CORS/CSRF listo para Next.js (localhost:3000)
 - WhiteNoise opcional (útil en deploy, no estorba en dev)
+- Cache locmem por defecto; redis/memcached por CACHE_BACKEND (compartido entre workers)
 """
 
 from pathlib import Path
 import os
 import importlib
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 
 # =========================
 # BASE / ENV
@@ -107,6 +109,18 @@ MIDDLEWARE = [
 if USE_WHITENOISE and WHITENOISE_AVAILABLE:
     MIDDLEWARE.insert(1, "whitenoise.middleware.WhiteNoiseMiddleware")
 
+# Latencia/consultas por vista para GET /api/metrics/ (Prometheus). Primero para medir todo el stack.
+METRICAS_HABILITADAS = env_bool("METRICAS_HABILITADAS", False)
+if METRICAS_HABILITADAS:
+    MIDDLEWARE.insert(0, "reservas.middleware.MetricasMiddleware")
+
+# Detector de N+1 y consultas lentas por request: "log" (staging), "raise" (tests) u "off".
+DETECTOR_CONSULTAS = os.getenv("DETECTOR_CONSULTAS", "off").lower()
+DETECTOR_CONSULTAS_UMBRAL = env_int("DETECTOR_CONSULTAS_UMBRAL", 5)
+DETECTOR_CONSULTAS_LENTAS_MS = env_int("DETECTOR_CONSULTAS_LENTAS_MS", 100)
+if DETECTOR_CONSULTAS != "off":
+    MIDDLEWARE.append("reservas.deteccion.DeteccionConsultasMiddleware")
+
 # =========================
 # URLS / TEMPLATES
 # =========================
@@ -169,6 +183,56 @@ else:
         }
     }
 
+# =========================
+# CACHE
+# =========================
+# locmem sirve para dev/tests; en producción usa un backend compartido para que
+# todos los workers de gunicorn (y los contenedores de outbox/scheduler) vean las
+# mismas versiones de disponibilidad y de horario. Con DEBUG apagado locmem se
+# rechaza salvo CACHE_LOCMEM_PERMITIDO=true (un solo proceso, sin sidecars).
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "locmem").lower()
+
+if CACHE_BACKEND not in ("redis", "memcached") and not DEBUG and not env_bool("CACHE_LOCMEM_PERMITIDO", False):
+    raise ImproperlyConfigured(
+        "CACHE_BACKEND=locmem no se comparte entre workers: con DEBUG=False usa redis o memcached "
+        "(CACHE_LOCATION) o define CACHE_LOCMEM_PERMITIDO=true si corre un solo proceso."
+    )
+
+if CACHE_BACKEND == "redis":
+    # Requiere el paquete `redis` (en requirements.txt)
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("CACHE_LOCATION") or "redis://127.0.0.1:6379/1",
+        }
+    }
+elif CACHE_BACKEND == "memcached":
+    # Requiere el paquete `pymemcache`
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache",
+            "LOCATION": os.getenv("CACHE_LOCATION") or "127.0.0.1:11211",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "sir-default",
+        }
+    }
+
+# Segundos que vive una disponibilidad calculada (las versiones la invalidan antes si cambia algo)
+AVAILABILITY_CACHE_TIMEOUT = env_int("AVAILABILITY_CACHE_TIMEOUT", 300)
+# Segundos que vive una clave de versión (una por servicio y fecha); al expirar se crea otra distinta
+AVAILABILITY_VERSION_TIMEOUT = env_int("AVAILABILITY_VERSION_TIMEOUT", 86400)
+# ETag/304 sobre las versiones del cache: solo son fiables si el cache es compartido entre workers
+GET_CONDICIONAL_HABILITADO = env_bool("GET_CONDICIONAL_HABILITADO", CACHE_BACKEND in ("redis", "memcached"))
+# Cache-Control de las lecturas públicas con ETag (el cliente revalida con If-None-Match al vencer)
+CACHE_CONTROL_CATALOGO_SEGUNDOS = env_int("CACHE_CONTROL_CATALOGO_SEGUNDOS", 60)
+CACHE_CONTROL_DISPONIBILIDAD_SEGUNDOS = env_int("CACHE_CONTROL_DISPONIBILIDAD_SEGUNDOS", 5)
+
 # =========================
 # PASSWORDS / AUTH
 # =========================
@@ -264,6 +328,23 @@ GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET", "")
 GOOGLE_REDIRECT_URI = os.getenv("GOOGLE_REDIRECT_URI", "")
 GOOGLE_CALENDAR_ID = os.getenv("GOOGLE_CALENDAR_ID", "primary")
 
+# =========================
+# SCHEDULER (manage.py run_scheduler)
+# =========================
+
+# Intervalo en segundos por comando; 0 desactiva el job.
+SCHEDULER_JOBS = {
+    "enviar_recordatorios": env_int("SCHEDULER_RECORDATORIOS_SEG", 3600),
+    "marcar_no_show": env_int("SCHEDULER_NO_SHOW_SEG", 60),
+    "sync_calendar": env_int("SCHEDULER_CALENDAR_SEG", 60),
+    "purgar_outbox": env_int("SCHEDULER_PURGA_OUTBOX_SEG", 86400),
+}
+# Días que se conservan los eventos procesados de la outbox antes de purgarlos
+OUTBOX_RETENCION_DIAS = env_int("OUTBOX_RETENCION_DIAS", 7)
+# Duración del lease de líder: si la réplica líder muere, otra toma el relevo tras este tiempo.
+# Mientras corre un job se renueva cada tercio del lease, así no limita la duración de los jobs.
+SCHEDULER_LEASE_SEGUNDOS = env_int("SCHEDULER_LEASE_SEGUNDOS", 90)
+
 # =========================
 # CORS / CSRF (Next.js)
 # =========================
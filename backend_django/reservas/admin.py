@@ -1,5 +1,17 @@
-from django.contrib import admin
-from .models import Negocio, Servicio, Cliente, Cita, Mesa, CalendarCredential
+from django.contrib import admin, messages
+
+from .asignacion import optimizar_dia
+from .models import (
+    Negocio,
+    Servicio,
+    Cliente,
+    Cita,
+    Mesa,
+    CalendarCredential,
+    OutboxEvento,
+    HorarioSemanal,
+    DiaEspecial,
+)
 
 
 @admin.register(Negocio)
@@ -25,9 +37,22 @@ class ClienteAdmin(admin.ModelAdmin):
 
 @admin.register(Cita)
 class CitaAdmin(admin.ModelAdmin):
-    list_display = ('cliente', 'servicio', 'negocio', 'fecha', 'hora_inicio', 'hora_fin', 'estado', 'creado_en')
+    list_display = ('cliente', 'servicio', 'negocio', 'fecha', 'hora_inicio', 'hora_fin', 'mesa', 'personas', 'estado', 'creado_en')
     list_filter = ('negocio', 'fecha', 'estado')
     search_fields = ('cliente__nombre', 'servicio__nombre', 'notas')
+    actions = ['optimizar_mesas']
+
+    @admin.action(description="Reoptimizar mesas del día de las citas seleccionadas")
+    def optimizar_mesas(self, request, queryset):
+        dias = queryset.values_list('servicio', 'fecha').distinct()
+        servicios = Servicio.objects.in_bulk({servicio_id for servicio_id, _ in dias})
+        for servicio_id, fecha in sorted(dias):
+            resultado = optimizar_dia(servicios[servicio_id], fecha)
+            self.message_user(
+                request,
+                resultado.resumen(),
+                messages.SUCCESS if resultado.aplicado else messages.INFO,
+            )
 
 
 @admin.register(Mesa)
@@ -37,6 +62,27 @@ class MesaAdmin(admin.ModelAdmin):
     search_fields = ('nombre', 'servicio__nombre', 'negocio__nombre')
 
 
+@admin.register(HorarioSemanal)
+class HorarioSemanalAdmin(admin.ModelAdmin):
+    list_display = ('negocio', 'dia_semana', 'apertura', 'cierre', 'cerrado')
+    list_filter = ('negocio', 'cerrado')
+
+
+@admin.register(DiaEspecial)
+class DiaEspecialAdmin(admin.ModelAdmin):
+    list_display = ('negocio', 'fecha', 'cerrado', 'apertura', 'cierre', 'motivo')
+    list_filter = ('negocio', 'cerrado')
+    search_fields = ('motivo',)
+
+
 @admin.register(CalendarCredential)
 class CalendarCredentialAdmin(admin.ModelAdmin):
     list_display = ('nombre', 'calendar_id', 'creado_en', 'actualizado_en')
+
+
+@admin.register(OutboxEvento)
+class OutboxEventoAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tipo', 'estado', 'intentos', 'disponible_en', 'creado_en', 'procesado_en')
+    list_filter = ('tipo', 'estado')
+    search_fields = ('ultimo_error',)
+    readonly_fields = ('creado_en', 'procesado_en')
@@ -0,0 +1,29 @@
+import threading
+from contextlib import contextmanager, nullcontext
+from datetime import date
+
+from django.db import connection, transaction
+
+from .models import AgendaDia
+
+# SQLite ignora select_for_update y admite un solo escritor a la vez, así que
+# en ese caso serializamos el camino de reserva dentro del proceso.
+_sqlite_lock = threading.Lock()
+
+
+@contextmanager
+def bloquear_agenda(servicio_id: int, fecha: date):
+    """
+    Transacción que serializa las reservas que compiten por el mismo (servicio, fecha).
+
+    Bloquea la fila AgendaDia con select_for_update hasta el commit, de modo que
+    validar capacidad y guardar la cita ocurren sin que otra reserva del mismo día
+    se cuele en medio. En SQLite se usa un lock de proceso que se libera después
+    del commit.
+    """
+    lock = nullcontext() if connection.features.has_select_for_update else _sqlite_lock
+    with lock, transaction.atomic():
+        fila, _ = AgendaDia.objects.get_or_create(servicio_id=servicio_id, fecha=fecha)
+        if connection.features.has_select_for_update:
+            fila = AgendaDia.objects.select_for_update().get(pk=fila.pk)
+        yield fila
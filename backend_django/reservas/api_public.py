@@ -1,53 +1,15 @@
 from datetime import date, time
 
-import logging
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
-from django.core.mail import send_mail
-from django.conf import settings
 
 from .models import Cliente, Servicio, Negocio
+from .agenda_lock import bloquear_agenda
 from .serializers import CitaSerializer
 from .utils import suggest_slot
 
-logger = logging.getLogger(__name__)
-
-
-def _send_confirmation_email(cita):
-    destinatarios = []
-    if cita.cliente.email:
-        destinatarios.append(cita.cliente.email)
-    if cita.negocio.propietario and cita.negocio.propietario.email:
-        destinatarios.append(cita.negocio.propietario.email)
-    if cita.negocio.email_contacto:
-        destinatarios.append(cita.negocio.email_contacto)
-
-    if not destinatarios:
-        return
-
-    subject = f"Confirmación de cita – {cita.negocio.nombre}"
-    body = (
-        f"Hola {cita.cliente.nombre},\n\n"
-        f"Tu cita en {cita.negocio.nombre} está registrada.\n"
-        f"Servicio: {cita.servicio.nombre}\n"
-        f"Fecha: {cita.fecha}\n"
-        f"Horario: {cita.hora_inicio.strftime('%H:%M')} - {cita.hora_fin.strftime('%H:%M')}\n"
-        f"Estado: {cita.estado}\n"
-        f"Notas: {cita.notas or 'Sin notas'}\n"
-    )
-    try:
-        send_mail(
-            subject=subject,
-            message=body,
-            from_email=getattr(settings, "DEFAULT_FROM_EMAIL", None),
-            recipient_list=list(dict.fromkeys(destinatarios)),  # evita duplicados
-            fail_silently=False,
-        )
-    except Exception as exc:  # pragma: no cover - solo log
-        logger.exception("No se pudo enviar correo de confirmación: %s", exc)
-
 
 def _get_or_create_cliente(negocio: Negocio, nombre: str, email: str = "", telefono: str = "") -> Cliente:
     cliente, _ = Cliente.objects.get_or_create(
@@ -86,6 +48,7 @@ def crear_cita_publica(request):
     hora_inicio = data.get("hora_inicio")
     hora_fin = data.get("hora_fin")
     notas = _clean_str(data.get("notas", ""), 500)
+    personas = data.get("personas") or None
 
     if not all([negocio_id, servicio_id, nombre, fecha, hora_inicio, hora_fin]):
         return Response({"detail": "Faltan campos obligatorios."}, status=status.HTTP_400_BAD_REQUEST)
@@ -100,38 +63,49 @@ def crear_cita_publica(request):
     except Servicio.DoesNotExist:
         return Response({"detail": "Servicio no encontrado o inactivo."}, status=status.HTTP_404_NOT_FOUND)
 
-    cliente = _get_or_create_cliente(
-        negocio=negocio,
-        nombre=nombre,
-        email=email,
-        telefono=telefono,
-    )
-
-    payload = {
-        "negocio": negocio.id,
-        "servicio": servicio.id,
-        "cliente": cliente.id,
-        "fecha": fecha,
-        "hora_inicio": hora_inicio,
-        "hora_fin": hora_fin,
-        "estado": data.get("estado", "confirmada"),
-        "notas": notas,
-    }
+    try:
+        fecha_val = date.fromisoformat(str(fecha))
+    except ValueError:
+        return Response({"detail": "Fecha inválida. Usa YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
 
     # Si no envían hora_fin, calcúlala con la duración del servicio
-    if not payload["hora_fin"]:
+    if not hora_fin:
         try:
-            h_ini = time.fromisoformat(payload["hora_inicio"])
+            h_ini = time.fromisoformat(hora_inicio)
         except ValueError:
             return Response({"detail": "Hora inicio inválida."}, status=status.HTTP_400_BAD_REQUEST)
         minutes = servicio.duracion_minutos or 60
         fin_min = h_ini.hour * 60 + h_ini.minute + minutes
-        payload["hora_fin"] = time(fin_min // 60, fin_min % 60).isoformat(timespec="minutes")
+        hora_fin = time(fin_min // 60, fin_min % 60).isoformat(timespec="minutes")
+
+    # Validar capacidad y guardar en la misma transacción, en serie por (servicio, fecha),
+    # para que reservas simultáneas no pasen ambas la validación y sobrevendan mesas.
+    with bloquear_agenda(servicio.id, fecha_val):
+        cliente = _get_or_create_cliente(
+            negocio=negocio,
+            nombre=nombre,
+            email=email,
+            telefono=telefono,
+        )
+
+        payload = {
+            "negocio": negocio.id,
+            "servicio": servicio.id,
+            "cliente": cliente.id,
+            "fecha": fecha,
+            "hora_inicio": hora_inicio,
+            "hora_fin": hora_fin,
+            "estado": data.get("estado", "confirmada"),
+            "notas": notas,
+            "personas": personas,
+        }
+
+        serializer = CitaSerializer(data=payload)
+        cita = None
+        if serializer.is_valid():
+            cita = serializer.save()
 
-    serializer = CitaSerializer(data=payload)
-    if serializer.is_valid():
-        cita = serializer.save()
-        _send_confirmation_email(cita)
+    if cita:
         return Response(
             {
                 "detail": "Cita creada",
@@ -139,6 +113,8 @@ def crear_cita_publica(request):
                 "fecha": cita.fecha,
                 "hora_inicio": cita.hora_inicio,
                 "hora_fin": cita.hora_fin,
+                "mesa": cita.mesa_id,
+                "mesa_nombre": cita.mesa.nombre if cita.mesa else None,
             },
             status=status.HTTP_201_CREATED,
         )
@@ -146,7 +122,7 @@ def crear_cita_publica(request):
     # Si no es válido, intenta sugerir un hueco
     suggestion = suggest_slot(
         servicio=servicio,
-        fecha_desde=date.fromisoformat(fecha),
+        fecha_desde=fecha_val,
         duracion_minutos=None,
         prefer_hora=time.fromisoformat(hora_inicio),
     )
@@ -0,0 +1,398 @@
+"""
+Asignación de mesas concretas a citas.
+
+Cada mesa guarda sus intervalos ocupados del día como dos listas ordenadas
+(inicios y fines, en minutos desde medianoche, semiabiertos). Una mesa atiende
+una cita a la vez, así que sus intervalos no se solapan y ambas listas quedan
+alineadas: comprobar un conflicto es un bisect O(log n) y reservar, un insort.
+
+La mesa elegida es la de menor `capacidad_max` que admite a las personas
+(best fit, deja libres las mesas grandes) y, entre las de igual capacidad, la
+que deja menos tiempo muerto antes y después de la cita.
+
+`optimizar_dia` re-resuelve el plan completo de un día (tras cancelaciones la
+asignación incremental queda fragmentada) sin mover citas ya empezadas ni
+completadas.
+"""
+from __future__ import annotations
+
+import time as _time
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from itertools import groupby
+from typing import Iterable, Optional
+
+from django.db.models import Q
+from django.utils import timezone
+
+from . import cache as availability_cache
+from .agenda_lock import bloquear_agenda
+from .horarios import Intervalo, horario_de
+from .models import Cita, Mesa, Servicio
+from .utils import ACTIVE_STATES, CLOSE_TIME, OPEN_TIME, _to_minutes
+
+
+class AgendaMesa:
+    """Intervalos ocupados de una mesa en un día."""
+
+    __slots__ = ("mesa", "inicios", "fines")
+
+    def __init__(self, mesa: Mesa):
+        self.mesa = mesa
+        self.inicios: list[int] = []
+        self.fines: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self.inicios)
+
+    def libre(self, inicio: int, fin: int) -> bool:
+        # Primer intervalo que termina después de `inicio`: hay conflicto si empieza antes de `fin`
+        i = bisect_right(self.fines, inicio)
+        return i == len(self.inicios) or self.inicios[i] >= fin
+
+    def holgura(self, inicio: int, fin: int, apertura: int, cierre: int) -> int:
+        """Minutos libres que quedarían entre la cita anterior y la siguiente."""
+        i = bisect_right(self.fines, inicio)
+        fin_previo = self.fines[i - 1] if i else apertura
+        inicio_siguiente = self.inicios[i] if i < len(self.inicios) else cierre
+        return max(inicio - fin_previo, 0) + max(inicio_siguiente - fin, 0)
+
+    def ocupar(self, inicio: int, fin: int) -> None:
+        insort(self.inicios, inicio)
+        insort(self.fines, fin)
+
+    def liberar(self, inicio: int, fin: int) -> None:
+        del self.inicios[bisect_left(self.inicios, inicio)]
+        del self.fines[bisect_left(self.fines, fin)]
+
+    def solapadas(self, inicio: int, fin: int) -> list[int]:
+        """Inicios de los intervalos que se solapan con [inicio, fin)."""
+        i = bisect_right(self.fines, inicio)
+        j = bisect_left(self.inicios, fin)
+        return self.inicios[i:j]
+
+    def huecos_utiles(self, duracion: int, apertura: int, cierre: int) -> int:
+        """Minutos en huecos donde aún cabe una cita de `duracion`."""
+        total = 0
+        previo = apertura
+        for inicio, fin in zip(self.inicios + [cierre], self.fines + [cierre]):
+            hueco = min(inicio, cierre) - max(previo, apertura)
+            if hueco >= duracion:
+                total += hueco
+            previo = max(previo, fin)
+        return total
+
+
+def admite(mesa: Mesa, personas: Optional[int]) -> bool:
+    return personas is None or mesa.capacidad_min <= personas <= mesa.capacidad_max
+
+
+class PlanMesas:
+    """
+    Plan de mesas de un día: una AgendaMesa por mesa, agrupadas por capacidad
+    para cortar la búsqueda en el primer grupo con una mesa libre. La ventana
+    del día es el `intervalo` del horario del negocio (el default si no hay).
+    """
+
+    def __init__(
+        self,
+        mesas: Iterable[Mesa],
+        ocupadas: Iterable[tuple[int, int, int]] = (),
+        intervalo: Intervalo = None,
+    ):
+        self.apertura, self.cierre = intervalo or (_to_minutes(OPEN_TIME), _to_minutes(CLOSE_TIME))
+        self.agendas = {mesa.id: AgendaMesa(mesa) for mesa in mesas}
+        orden = sorted(self.agendas.values(), key=lambda a: (a.mesa.capacidad_max, a.mesa.id))
+        self._por_capacidad = [list(grupo) for _, grupo in groupby(orden, key=lambda a: a.mesa.capacidad_max)]
+        for mesa_id, inicio, fin in ocupadas:
+            agenda = self.agendas.get(mesa_id)
+            if agenda is not None:
+                agenda.ocupar(inicio, fin)
+
+    @classmethod
+    def del_dia(cls, servicio: Servicio, fecha: date, excluir_pk: Optional[int] = None) -> "PlanMesas":
+        """Mesas activas del servicio y sus citas activas de la fecha (dos consultas más el horario)."""
+        mesas = list(Mesa.objects.filter(servicio=servicio, activa=True))
+        citas = Cita.objects.filter(
+            mesa_id__in=[mesa.id for mesa in mesas],
+            fecha=fecha,
+            estado__in=ACTIVE_STATES,
+        )
+        if excluir_pk:
+            citas = citas.exclude(pk=excluir_pk)
+        ocupadas = [
+            (mesa_id, _to_minutes(h_ini), _to_minutes(h_fin))
+            for mesa_id, h_ini, h_fin in citas.values_list("mesa_id", "hora_inicio", "hora_fin")
+        ]
+        return cls(mesas, ocupadas, horario_de(servicio.negocio_id).intervalo(fecha))
+
+    def hay_mesa_para(self, personas: Optional[int]) -> bool:
+        """Si alguna mesa admite a `personas`, sin importar el horario."""
+        return any(admite(agenda.mesa, personas) for agenda in self.agendas.values())
+
+    def mejor_mesa(
+        self,
+        inicio: int,
+        fin: int,
+        personas: Optional[int] = None,
+        preferida_id: Optional[int] = None,
+    ) -> Optional[Mesa]:
+        """Mesa libre en [inicio, fin) que mejor ajusta; conserva `preferida_id` si sigue libre."""
+        preferida = self.agendas.get(preferida_id)
+        if preferida is not None and admite(preferida.mesa, personas) and preferida.libre(inicio, fin):
+            return preferida.mesa
+
+        for grupo in self._por_capacidad:
+            libres = [a for a in grupo if admite(a.mesa, personas) and a.libre(inicio, fin)]
+            if libres:
+                return min(libres, key=lambda a: a.holgura(inicio, fin, self.apertura, self.cierre)).mesa
+        return None
+
+    def asignar(self, inicio: int, fin: int, personas: Optional[int] = None) -> Optional[Mesa]:
+        """Elige mesa y la marca ocupada en el plan (para asignar varias citas en memoria)."""
+        mesa = self.mejor_mesa(inicio, fin, personas)
+        if mesa is not None:
+            self.agendas[mesa.id].ocupar(inicio, fin)
+        return mesa
+
+    def huecos_utiles(self, duracion: int) -> int:
+        return sum(a.huecos_utiles(duracion, self.apertura, self.cierre) for a in self.agendas.values())
+
+    def mesas_libres(self) -> int:
+        return sum(1 for a in self.agendas.values() if not len(a))
+
+
+def _resolver_con(
+    mesas: list[Mesa],
+    fijas: list[tuple[int, int, int]],
+    movibles: list[tuple[int, int, int, Optional[int]]],
+    orden,
+    preferencia,
+    intervalo: Intervalo = None,
+) -> tuple[PlanMesas, dict[int, Optional[int]]]:
+    plan = PlanMesas(mesas, fijas, intervalo)
+    agendas = list(plan.agendas.values())
+    asignacion = {}
+    # (mesa_id, inicio) -> cita movible, para poder cambiarla de mesa al reparar
+    ocupante = {}
+    pendientes = []
+
+    def colocar(agenda, cita):
+        clave, inicio, fin, _ = cita
+        agenda.ocupar(inicio, fin)
+        asignacion[clave] = agenda.mesa.id
+        ocupante[(agenda.mesa.id, inicio)] = cita
+
+    for cita in sorted(movibles, key=orden):
+        _, inicio, fin, personas = cita
+        libres = [a for a in agendas if admite(a.mesa, personas) and a.libre(inicio, fin)]
+        if libres:
+            colocar(min(libres, key=lambda a: preferencia(a, inicio, fin, plan)), cita)
+        else:
+            asignacion[cita[0]] = None
+            pendientes.append(cita)
+
+    # Reparación (camino aumentante de largo 1, como en un emparejamiento bipartito):
+    # si una sola cita movible estorba en una mesa que admite a la pendiente y
+    # cabe en otra mesa, se mueve y la pendiente ocupa su lugar.
+    # Citas que ya no caben en otra mesa; solo cambia cuando una reparación libera algo
+    sin_destino = set()
+    for cita in pendientes:
+        _, inicio, fin, personas = cita
+        for agenda in agendas:
+            if not admite(agenda.mesa, personas):
+                continue
+            estorban = agenda.solapadas(inicio, fin)
+            if len(estorban) != 1 or (agenda.mesa.id, estorban[0]) not in ocupante:
+                continue
+            otra = ocupante[(agenda.mesa.id, estorban[0])]
+            if otra[0] in sin_destino:
+                continue
+            destino = next(
+                (a for a in agendas if a is not agenda and admite(a.mesa, otra[3]) and a.libre(otra[1], otra[2])),
+                None,
+            )
+            if destino is None:
+                sin_destino.add(otra[0])
+                continue
+            agenda.liberar(otra[1], otra[2])
+            del ocupante[(agenda.mesa.id, otra[1])]
+            colocar(destino, otra)
+            colocar(agenda, cita)
+            sin_destino.clear()
+            break
+    return plan, asignacion
+
+
+def _holgura(agenda: AgendaMesa, inicio: int, fin: int, plan: PlanMesas) -> int:
+    return agenda.holgura(inicio, fin, plan.apertura, plan.cierre)
+
+
+# (orden de las citas, preferencia entre mesas libres)
+_ESTRATEGIAS = (
+    # Particionado de intervalos por hora de inicio: a cada cita la mesa más chica
+    # que la admite y, dentro de esa capacidad, la que quedó libre más recientemente.
+    (
+        lambda c: (c[1], -(c[3] or 0), -c[2]),
+        lambda a, inicio, fin, plan: (a.mesa.capacidad_max, _holgura(a, inicio, fin, plan)),
+    ),
+    # Grupos grandes primero (tienen menos mesas posibles) y ajuste por tiempo antes
+    # que por capacidad: evita que una cita corta bloquee la única mesa grande.
+    (
+        lambda c: (-(c[3] or 0), c[1], -c[2]),
+        lambda a, inicio, fin, plan: (_holgura(a, inicio, fin, plan), a.mesa.capacidad_max),
+    ),
+)
+
+
+def resolver(
+    mesas: Iterable[Mesa],
+    fijas: Iterable[tuple[int, int, int]],
+    movibles: Iterable[tuple[int, int, int, Optional[int]]],
+    duracion: int = 60,
+    intervalo: Intervalo = None,
+) -> tuple[PlanMesas, dict[int, Optional[int]]]:
+    """
+    Asigna de cero las citas `movibles` (clave, inicio, fin, personas) alrededor
+    de las `fijas` (mesa_id, inicio, fin), dentro del `intervalo` del día.
+
+    Sin capacidades es el particionado de intervalos clásico (coloreo de un grafo
+    de intervalos), óptimo recorriendo por hora de inicio. Con mesas de distinto
+    tamaño ningún orden voraz es óptimo siempre, así que se prueban las
+    `_ESTRATEGIAS` en orden, cada una con una pasada de reparación, y gana la
+    primera que coloca todo o, si ninguna, la que deja menos citas sin mesa y
+    más minutos en huecos donde cabe otra cita de `duracion`.
+    """
+    mesas, fijas, movibles = list(mesas), list(fijas), list(movibles)
+    mejor = None
+    for orden, preferencia in _ESTRATEGIAS:
+        plan, asignacion = _resolver_con(mesas, fijas, movibles, orden, preferencia, intervalo)
+        sin_mesa = sum(1 for m in asignacion.values() if m is None)
+        puntaje = (sin_mesa, -plan.huecos_utiles(duracion))
+        if mejor is None or puntaje < mejor[0]:
+            mejor = (puntaje, plan, asignacion)
+        if not sin_mesa:
+            break  # la primera estrategia que coloca todo ya compacta mejor
+    return mejor[1], mejor[2]
+
+
+@dataclass
+class ResultadoOptimizacion:
+    servicio_id: int
+    fecha: date
+    citas: int
+    movidas: int
+    sin_mesa: int
+    huecos_antes: int
+    huecos_despues: int
+    mesas_libres_antes: int
+    mesas_libres_despues: int
+    segundos: float
+    aplicado: bool
+
+    @property
+    def minutos_liberados(self) -> int:
+        return self.huecos_despues - self.huecos_antes
+
+    def resumen(self) -> str:
+        return (
+            f"{self.fecha} servicio {self.servicio_id}: {self.citas} citas, {self.movidas} movidas, "
+            f"huecos útiles {self.huecos_antes}→{self.huecos_despues} min ({self.minutos_liberados:+d}), "
+            f"mesas libres {self.mesas_libres_antes}→{self.mesas_libres_despues}, {self.segundos:.3f}s"
+            + ("" if self.aplicado else " (sin aplicar)")
+        )
+
+
+def optimizar_dia(
+    servicio: Servicio,
+    fecha: date,
+    aplicar: bool = True,
+    ahora: Optional[datetime] = None,
+) -> ResultadoOptimizacion:
+    """
+    Reasigna las mesas de las citas activas que aún no empiezan. Las completadas,
+    las ya empezadas y las de otro servicio en estas mesas quedan fijas. Solo se
+    guarda si ninguna cita con mesa se queda sin ella y los huecos útiles no bajan.
+    """
+    inicio_reloj = _time.perf_counter()
+    ahora = timezone.localtime(ahora) if ahora else timezone.localtime()
+    duracion = servicio.duracion_minutos or 60
+    intervalo = horario_de(servicio.negocio_id).intervalo(fecha)
+
+    with bloquear_agenda(servicio.id, fecha):
+        mesas = list(Mesa.objects.filter(servicio=servicio, activa=True))
+        mesa_ids = {mesa.id for mesa in mesas}
+        citas = list(
+            Cita.objects.filter(Q(servicio=servicio) | Q(mesa_id__in=mesa_ids), fecha=fecha)
+            .filter(estado__in=ACTIVE_STATES + ("completada",))
+            .only("id", "servicio_id", "mesa_id", "hora_inicio", "hora_fin", "personas", "estado")
+        )
+
+        fijas, movibles, actuales = [], [], []
+        for cita in citas:
+            inicio, fin = _to_minutes(cita.hora_inicio), _to_minutes(cita.hora_fin)
+            empezada = fecha < ahora.date() or (fecha == ahora.date() and cita.hora_inicio <= ahora.time())
+            if cita.estado == "completada" or empezada or cita.servicio_id != servicio.id:
+                if cita.mesa_id in mesa_ids:
+                    fijas.append((cita.mesa_id, inicio, fin))
+                continue
+            movibles.append((cita.pk, inicio, fin, cita.personas))
+            if cita.mesa_id in mesa_ids:
+                actuales.append((cita.mesa_id, inicio, fin))
+
+        antes = PlanMesas(mesas, fijas + actuales, intervalo)
+        despues, asignacion = resolver(mesas, fijas, movibles, duracion, intervalo)
+
+        por_pk = {cita.pk: cita for cita in citas}
+        cambiadas = []
+        perdidas = 0
+        for pk, mesa_id in asignacion.items():
+            cita = por_pk[pk]
+            if mesa_id is None:
+                perdidas += cita.mesa_id in mesa_ids
+                continue
+            if cita.mesa_id != mesa_id:
+                cita.mesa_id = mesa_id
+                cambiadas.append(cita)
+
+        huecos_antes, huecos_despues = antes.huecos_utiles(duracion), despues.huecos_utiles(duracion)
+        aplicado = aplicar and not perdidas and huecos_despues >= huecos_antes and bool(cambiadas)
+        if aplicado:
+            Cita.objects.bulk_update(cambiadas, ["mesa"], batch_size=500)
+
+    if aplicado:
+        # bulk_update no emite post_save: la disponibilidad por tipo de mesa cambia
+        availability_cache.bump_fecha(servicio.id, fecha)
+
+    return ResultadoOptimizacion(
+        servicio_id=servicio.id,
+        fecha=fecha,
+        citas=len(movibles),
+        movidas=len(cambiadas),
+        sin_mesa=sum(1 for mesa_id in asignacion.values() if mesa_id is None),
+        huecos_antes=huecos_antes,
+        huecos_despues=huecos_despues,
+        mesas_libres_antes=antes.mesas_libres(),
+        mesas_libres_despues=despues.mesas_libres(),
+        segundos=_time.perf_counter() - inicio_reloj,
+        aplicado=aplicado,
+    )
+
+
+def asignar_mesa(
+    servicio: Servicio,
+    fecha: date,
+    hora_inicio: time,
+    hora_fin: time,
+    personas: Optional[int] = None,
+    excluir_pk: Optional[int] = None,
+    preferida_id: Optional[int] = None,
+) -> tuple[Optional[Mesa], PlanMesas]:
+    """
+    Mesa para una cita nueva o editada (`excluir_pk` deja fuera su propio intervalo).
+    Devuelve también el plan para distinguir "sin horario" de "sin mesa de ese tamaño".
+    """
+    plan = PlanMesas.del_dia(servicio, fecha, excluir_pk=excluir_pk)
+    mesa = plan.mejor_mesa(_to_minutes(hora_inicio), _to_minutes(hora_fin), personas, preferida_id)
+    return mesa, plan
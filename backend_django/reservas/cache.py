@@ -0,0 +1,277 @@
+"""
+Cache de disponibilidad versionado.
+
+Las claves llevan versiones en lugar de borrarse explícitamente:
+- generación por servicio (cambia al activar/desactivar/mover mesas),
+- versión por (servicio, fecha) (cambia al guardar o borrar citas de ese día).
+
+Cada bump también sube la versión global (`TODOS`) equivalente, que usan las
+vistas agregadas sobre todos los servicios (p. ej. disponibilidad de mesas).
+
+El horario compilado de cada negocio (reservas.horarios) se valida contra una
+versión por negocio que vive aquí, y esa versión forma parte de las claves de
+slots y sugerencias: un worker con el horario viejo nunca guarda slots bajo la
+clave que leen los que ya tienen el nuevo.
+
+Al subir una versión las entradas viejas dejan de consultarse y expiran solas.
+Las claves de versión también expiran (AVAILABILITY_VERSION_TIMEOUT, hay una por
+servicio y fecha): la siguiente lectura crea otra basada en tiempo, que nunca
+coincide con una anterior. Las versiones solo invalidan entre workers si viven
+en un backend compartido (redis/memcached); locmem es para tests/dev y
+core/settings.py lo rechaza con DEBUG apagado.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+import time as _time
+from collections import Counter
+from datetime import date, timedelta
+from typing import Callable, Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+
+PREFIX = "disp"
+TODOS = "*"
+_CATALOGO_KEY = f"{PREFIX}:catalogo"
+
+_lock = threading.Lock()
+_stats = Counter()
+
+
+def _timeout() -> int:
+    return getattr(settings, "AVAILABILITY_CACHE_TIMEOUT", 300)
+
+
+def _version_timeout() -> int:
+    # Nunca menos que los datos que valida
+    return max(getattr(settings, "AVAILABILITY_VERSION_TIMEOUT", 86400), _timeout())
+
+
+def _gen_key(servicio_id) -> str:
+    return f"{PREFIX}:gen:{servicio_id}"
+
+
+def _ver_key(servicio_id, fecha: date) -> str:
+    return f"{PREFIX}:ver:{servicio_id}:{fecha.isoformat()}"
+
+
+def _horario_key(negocio_id) -> str:
+    return f"{PREFIX}:horario:{negocio_id}"
+
+
+def _nueva_version() -> int:
+    # Basada en tiempo: si una clave de versión se pierde (evicción), la nueva
+    # nunca coincide con una versión usada antes.
+    return _time.time_ns()
+
+
+def _bump(key: str) -> None:
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _nueva_version(), timeout=_version_timeout())
+
+
+def _versiones(servicio_id, fechas: Iterable[date]) -> tuple[int, dict[date, int]]:
+    """Devuelve (generación, {fecha: versión}) con un solo get_many."""
+    fechas = list(fechas)
+    keys = [_gen_key(servicio_id)] + [_ver_key(servicio_id, f) for f in fechas]
+    found = cache.get_many(keys)
+    faltantes = [k for k in keys if k not in found]
+    if faltantes:
+        # add() no pisa una versión que otro proceso haya subido mientras tanto
+        for key in faltantes:
+            cache.add(key, _nueva_version(), timeout=_version_timeout())
+        found.update(cache.get_many(faltantes))
+    return found[keys[0]], {f: found[k] for f, k in zip(fechas, keys[1:])}
+
+
+def _registrar(evento: str, n: int = 1) -> None:
+    if not n:
+        return
+    with _lock:
+        _stats[evento] += n
+    # Contador global compartido por todos los workers (best effort)
+    key = f"{PREFIX}:stats:{evento}"
+    try:
+        cache.incr(key, n)
+    except ValueError:
+        cache.add(key, 0, timeout=_version_timeout())
+        try:
+            cache.incr(key, n)
+        except ValueError:
+            pass
+
+
+def bump_fecha(servicio_id, fecha: date) -> None:
+    """Invalida la disponibilidad cacheada de un servicio en una fecha."""
+    _bump(_ver_key(servicio_id, fecha))
+    _bump(_ver_key(TODOS, fecha))
+
+
+def bump_servicio(servicio_id) -> None:
+    """Invalida toda la disponibilidad cacheada de un servicio (cambios de mesas)."""
+    _bump(_gen_key(servicio_id))
+    _bump(_gen_key(TODOS))
+
+
+def bump_horario(negocio_id) -> None:
+    """Invalida el horario compilado del negocio en todos los workers."""
+    _bump(_horario_key(negocio_id))
+
+
+def version_horario(negocio_id) -> int:
+    """Versión compartida del horario del negocio (la crea si no existe)."""
+    key = _horario_key(negocio_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _nueva_version(), timeout=_version_timeout())
+        version = cache.get(key)
+    return version
+
+
+def bump_catalogo() -> None:
+    """Invalida las ETags del catálogo público (servicios y sus negocios)."""
+    _bump(_CATALOGO_KEY)
+
+
+def huella_versiones(servicio_id, fechas: Iterable[date]):
+    """
+    Huella de (generación, versión por fecha) para ETags, leída con un get_many
+    y sin crear claves: None si alguna no existe todavía (nada se ha calculado,
+    así que no hay respuesta previa que validar).
+    """
+    keys = [_gen_key(servicio_id)] + [_ver_key(servicio_id, f) for f in fechas]
+    found = cache.get_many(keys)
+    if len(found) != len(keys):
+        return None
+    return ":".join(str(found[k]) for k in keys)
+
+
+def huella_catalogo() -> str:
+    cache.add(_CATALOGO_KEY, _nueva_version(), timeout=_version_timeout())
+    return str(cache.get(_CATALOGO_KEY))
+
+
+def _slots_key(servicio_id, gen, fecha: date, ver, duracion, horario) -> str:
+    return f"{PREFIX}:slots:{servicio_id}:{gen}:{fecha.isoformat()}:{ver}:{duracion}:{horario}"
+
+
+def cached_slots(
+    servicio_id, fecha: date, duracion: int, calcular: Callable[[], list], horario_version: int = 0
+) -> list:
+    """
+    Slots de (servicio, fecha, duracion) desde cache o calculados con `calcular()`.
+    `horario_version` es la del horario con que se calculan (Horario.version).
+    """
+    gen, versiones = _versiones(servicio_id, [fecha])
+    key = _slots_key(servicio_id, gen, fecha, versiones[fecha], duracion, horario_version)
+    slots = cache.get(key)
+    if slots is not None:
+        _registrar("hits")
+        return slots
+
+    _registrar("misses")
+    slots = calcular()
+    cache.set(key, slots, timeout=_timeout())
+    return slots
+
+
+def cached_slots_range(
+    servicio_id,
+    fechas: list[date],
+    duracion: int,
+    calcular: Callable[[list[date]], dict[date, list]],
+    horario_version: int = 0,
+) -> dict[date, list]:
+    """
+    Versión por rango: un get_many para versiones y otro para slots; solo los
+    días faltantes se pasan a `calcular(fechas_faltantes)` y se guardan con set_many.
+    """
+    gen, versiones = _versiones(servicio_id, fechas)
+    keys = {f: _slots_key(servicio_id, gen, f, versiones[f], duracion, horario_version) for f in fechas}
+    found = cache.get_many(list(keys.values()))
+
+    resultado = {}
+    faltantes = []
+    for fecha in fechas:
+        key = keys[fecha]
+        if key in found:
+            resultado[fecha] = found[key]
+        else:
+            faltantes.append(fecha)
+
+    _registrar("hits", len(fechas) - len(faltantes))
+    _registrar("misses", len(faltantes))
+    if faltantes:
+        calculados = calcular(faltantes)
+        cache.set_many({keys[f]: calculados[f] for f in faltantes}, timeout=_timeout())
+        resultado.update(calculados)
+    return {f: resultado[f] for f in fechas}
+
+
+def cached_mesas(servicio_id, fecha: date, hora_inicio, hora_fin, calcular: Callable[[], list]) -> list:
+    """
+    Disponibilidad agregada por tipo de mesa para un bucket (fecha, hora_inicio,
+    hora_fin). Sin `servicio_id` usa las versiones globales, que cambian con
+    cualquier cita de la fecha o cualquier cambio de mesas/servicios.
+    """
+    alcance = servicio_id or TODOS
+    gen, versiones = _versiones(alcance, [fecha])
+    key = (
+        f"{PREFIX}:mesas:{alcance}:{gen}:{fecha.isoformat()}:{versiones[fecha]}:"
+        f"{hora_inicio.strftime('%H%M')}:{hora_fin.strftime('%H%M') if hora_fin else '-'}"
+    )
+    valor = cache.get(key)
+    if valor is not None:
+        _registrar("hits")
+        return valor
+
+    _registrar("misses")
+    valor = calcular()
+    cache.set(key, valor, timeout=_timeout())
+    return valor
+
+
+_SIN_SUGERENCIA = "__none__"
+
+
+def cached_suggestion(servicio_id, fecha_desde: date, dias: int, params: tuple, calcular: Callable):
+    """
+    Cachea la sugerencia de una ventana de días. La clave incluye la huella de
+    las versiones de todos los días de la ventana, así que cualquier cambio en
+    uno de ellos la invalida.
+    """
+    fechas = [fecha_desde + timedelta(days=i) for i in range(dias + 1)]
+    gen, versiones = _versiones(servicio_id, fechas)
+    huella = hashlib.sha1(
+        ":".join(str(versiones[f]) for f in fechas).encode()
+    ).hexdigest()[:16]
+    key = f"{PREFIX}:sug:{servicio_id}:{gen}:{fecha_desde.isoformat()}:{dias}:{huella}:" + ":".join(
+        str(p) for p in params
+    )
+    valor = cache.get(key)
+    if valor is not None:
+        _registrar("hits")
+        return None if valor == _SIN_SUGERENCIA else valor
+
+    _registrar("misses")
+    valor = calcular()
+    cache.set(key, _SIN_SUGERENCIA if valor is None else valor, timeout=_timeout())
+    return valor
+
+
+def stats() -> dict:
+    """Contadores hit/miss del proceso actual y globales (todos los workers)."""
+    with _lock:
+        proceso = {"hits": _stats["hits"], "misses": _stats["misses"]}
+    compartidos = cache.get_many([f"{PREFIX}:stats:hits", f"{PREFIX}:stats:misses"])
+    return {
+        "proceso": proceso,
+        "global": {
+            "hits": compartidos.get(f"{PREFIX}:stats:hits", 0),
+            "misses": compartidos.get(f"{PREFIX}:stats:misses", 0),
+        },
+    }
@@ -0,0 +1,119 @@
+"""
+GET condicional (ETag / If-None-Match) para las lecturas públicas más consultadas.
+
+La ETag no se calcula sobre el cuerpo sino sobre las versiones de datos de
+reservas.cache (generación del servicio y versión por fecha, o la versión del
+catálogo) más la URL completa. Así un ``If-None-Match`` que coincide se
+responde con 304 antes de tocar la BD o calcular slots.
+
+Es una ETag fuerte: las versiones cambian con cualquier cita, mesa, servicio
+u horario que afecte la respuesta, así que misma ETag = mismo cuerpo. Eso solo
+vale si las versiones viven en un cache compartido: con locmem un worker que no
+vio el bump respondería 304 a datos que ya cambiaron. Por eso las ETags se
+emiten solo con GET_CONDICIONAL_HABILITADO (por defecto, cuando CACHE_BACKEND es
+redis o memcached); sin él las vistas responden siempre 200 con Cache-Control.
+"""
+from __future__ import annotations
+
+import hashlib
+from datetime import date, timedelta
+from functools import wraps
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+from . import cache as availability_cache
+
+
+def _etag(huella: str, request) -> str:
+    digest = hashlib.sha1(f"{huella}|{request.get_full_path()}".encode()).hexdigest()[:32]
+    return quote_etag(digest)
+
+
+def get_condicional(huella: Callable[..., Optional[str]], max_age_setting: str):
+    """
+    Decorador para ``get``/``list``/``retrieve`` de vistas DRF. ``huella(request,
+    *args, **kwargs)`` devuelve la huella de versiones o None (parámetros
+    inválidos o sin versiones aún): en ese caso la vista corre sin ETag.
+    Las respuestas 200 y 304 llevan ``Cache-Control: public, max-age=<setting>``.
+    Sin GET_CONDICIONAL_HABILITADO no se calcula ETag ni se responde 304.
+    """
+
+    def decorador(metodo):
+        @wraps(metodo)
+        def envuelto(self, request, *args, **kwargs):
+            max_age = getattr(settings, max_age_setting)
+            etag = None
+            if getattr(settings, "GET_CONDICIONAL_HABILITADO", False):
+                valor = huella(request, *args, **kwargs)
+                etag = _etag(valor, request) if valor else None
+            if etag:
+                no_modificado = get_conditional_response(request, etag=etag)
+                if no_modificado is not None:
+                    no_modificado["ETag"] = etag
+                    patch_cache_control(no_modificado, public=True, max_age=max_age)
+                    return no_modificado
+
+            response = metodo(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                if etag:
+                    response["ETag"] = etag
+                patch_cache_control(response, public=True, max_age=max_age)
+            return response
+
+        return envuelto
+
+    return decorador
+
+
+# --- huellas ---
+
+
+def _servicio_id(valor) -> Optional[int]:
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def _fecha(valor) -> Optional[date]:
+    try:
+        return date.fromisoformat(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def huella_dia(request, *args, **kwargs) -> Optional[str]:
+    """Disponibilidad de ?servicio=<id>&fecha=YYYY-MM-DD."""
+    servicio_id = _servicio_id(request.query_params.get("servicio"))
+    fecha = _fecha(request.query_params.get("fecha"))
+    if servicio_id is None or fecha is None:
+        return None
+    return availability_cache.huella_versiones(servicio_id, [fecha])
+
+
+def huella_rango(request, *args, **kwargs) -> Optional[str]:
+    """Disponibilidad de ?servicio=<id>&desde=...&hasta=... (máx. 62 días)."""
+    servicio_id = _servicio_id(request.query_params.get("servicio"))
+    desde = _fecha(request.query_params.get("desde"))
+    hasta = _fecha(request.query_params.get("hasta"))
+    if servicio_id is None or desde is None or hasta is None or not 0 <= (hasta - desde).days < 62:
+        return None
+    fechas = [desde + timedelta(days=i) for i in range((hasta - desde).days + 1)]
+    return availability_cache.huella_versiones(servicio_id, fechas)
+
+
+def huella_mesas(request, *args, **kwargs) -> Optional[str]:
+    """Disponibilidad de mesas de ?servicio=<id|all>&fecha=...; "all" usa las versiones globales."""
+    crudo = request.query_params.get("servicio")
+    alcance = availability_cache.TODOS if crudo in (None, "", "all") else _servicio_id(crudo)
+    fecha = _fecha(request.query_params.get("fecha"))
+    if alcance is None or fecha is None:
+        return None
+    return availability_cache.huella_versiones(alcance, [fecha])
+
+
+def huella_catalogo(request, *args, **kwargs) -> str:
+    return availability_cache.huella_catalogo()
@@ -0,0 +1,205 @@
+"""
+Detector de consultas N+1 y lentas.
+
+Agrupa las consultas por *forma* (el SQL con parámetros y literales
+normalizados) y marca las formas que se repiten ``umbral`` veces o más en un
+mismo bloque: la firma de un N+1, p. ej. ``SELECT ... FROM reservas_negocio
+WHERE id = %s`` una vez por fila serializada.
+
+Tres formas de usarlo:
+- ``DetectorConsultas``: context manager para cualquier bloque de código.
+- ``DeteccionConsultasMiddleware``: por request; con DETECTOR_CONSULTAS="log"
+  registra avisos (staging), con "raise" lanza ``NMasUnoError`` (tests).
+- ``DetectorConsultasMixin``: para TestCase; corre cada request del test con
+  el middleware en modo "raise" y agrega ``assertSinNMasUno()``.
+"""
+from __future__ import annotations
+
+import logging
+import re
+import time as _time
+import traceback
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from django.conf import settings
+from django.db import connection as default_connection
+from django.test.utils import override_settings
+
+logger = logging.getLogger(__name__)
+
+_IN_LISTA = re.compile(r"\bIN \((?:%s|\?)(?:, (?:%s|\?))*\)", re.IGNORECASE)
+_CADENA = re.compile(r"'(?:[^']|'')*'")
+_NUMERO = re.compile(r"(?<![\w\"])-?\d+(?:\.\d+)?\b")
+_IGNORADAS = ("SAVEPOINT", "RELEASE", "ROLLBACK")
+_ESTE_ARCHIVO = Path(__file__).resolve()
+
+
+def forma_consulta(sql: str) -> str:
+    """SQL sin valores: literales a ``?`` y listas ``IN (...)`` de cualquier largo iguales."""
+    sql = _CADENA.sub("?", sql)
+    sql = _NUMERO.sub("?", sql)
+    return _IN_LISTA.sub("IN (...)", sql)
+
+
+def _umbral() -> int:
+    return getattr(settings, "DETECTOR_CONSULTAS_UMBRAL", 5)
+
+
+def _lentas_ms() -> float:
+    return getattr(settings, "DETECTOR_CONSULTAS_LENTAS_MS", 100)
+
+
+def _origen() -> str:
+    """Frame más interno del proyecto (fuera de site-packages y de este módulo)."""
+    base = Path(settings.BASE_DIR).resolve()
+    for frame in reversed(traceback.extract_stack()):
+        ruta = Path(frame.filename).resolve()
+        if ruta == _ESTE_ARCHIVO or "site-packages" in ruta.parts or base not in ruta.parents:
+            continue
+        return f"{ruta.relative_to(base)}:{frame.lineno} en {frame.name}"
+    return "?"
+
+
+@dataclass
+class ConsultaRepetida:
+    forma: str
+    veces: int
+    ms: float
+    origen: str
+
+    def __str__(self):
+        return f"{self.veces}× ({self.ms:.1f} ms) desde {self.origen}: {self.forma[:300]}"
+
+
+class NMasUnoError(AssertionError):
+    pass
+
+
+class DetectorConsultas:
+    """
+    Cuenta las consultas de la conexión por forma mientras está activo::
+
+        with DetectorConsultas() as detector:
+            ...
+        detector.repetidas  # formas ejecutadas >= umbral veces
+        detector.lentas     # (ms, sql) por encima de DETECTOR_CONSULTAS_LENTAS_MS
+    """
+
+    def __init__(self, umbral: Optional[int] = None, lentas_ms: Optional[float] = None, connection=None):
+        self.umbral = umbral if umbral is not None else _umbral()
+        self.lentas_ms = lentas_ms if lentas_ms is not None else _lentas_ms()
+        self.connection = connection or default_connection
+        self.total = 0
+        self._veces: dict[str, int] = defaultdict(int)
+        self._ms: dict[str, float] = defaultdict(float)
+        self._origenes: dict[str, str] = {}
+        self.lentas: list[tuple[float, str]] = []
+        self._wrapper = None
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = _time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            ms = (_time.perf_counter() - inicio) * 1000
+            self._registrar(sql, ms)
+
+    def _registrar(self, sql: str, ms: float) -> None:
+        if sql.lstrip().upper().startswith(_IGNORADAS):
+            return
+        self.total += 1
+        forma = forma_consulta(sql)
+        self._veces[forma] += 1
+        self._ms[forma] += ms
+        # La pila solo se recorre una vez por forma sospechosa, no en cada consulta
+        if self._veces[forma] == self.umbral:
+            self._origenes[forma] = _origen()
+        if ms >= self.lentas_ms:
+            self.lentas.append((ms, sql))
+
+    def __enter__(self):
+        self._wrapper = self.connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        self._wrapper.__exit__(*exc)
+        return False
+
+    @property
+    def repetidas(self) -> list[ConsultaRepetida]:
+        return sorted(
+            (
+                ConsultaRepetida(forma, veces, self._ms[forma], self._origenes.get(forma, "?"))
+                for forma, veces in self._veces.items()
+                if veces >= self.umbral
+            ),
+            key=lambda r: -r.veces,
+        )
+
+    def reporte(self) -> str:
+        lineas = [f"{self.total} consultas; formas repetidas >= {self.umbral} veces:"]
+        lineas += [f"  - {repetida}" for repetida in self.repetidas]
+        return "\n".join(lineas)
+
+
+class DeteccionConsultasMiddleware:
+    """
+    Detector por request. DETECTOR_CONSULTAS: "log" (aviso en el logger
+    reservas.deteccion, para staging), "raise" (NMasUnoError, para tests) u
+    "off". Las consultas lentas solo se registran en el log.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        modo = getattr(settings, "DETECTOR_CONSULTAS", "log")
+        if modo == "off":
+            return self.get_response(request)
+
+        with DetectorConsultas() as detector:
+            response = self.get_response(request)
+
+        ruta = f"{request.method} {request.path}"
+        for ms, sql in detector.lentas:
+            logger.warning("Consulta lenta (%.1f ms) en %s: %s", ms, ruta, sql[:500])
+        if detector.repetidas:
+            mensaje = f"Posible N+1 en {ruta}: {detector.reporte()}"
+            if modo == "raise":
+                raise NMasUnoError(mensaje)
+            logger.warning(mensaje)
+        return response
+
+
+class DetectorConsultasMixin:
+    """
+    Mixin de TestCase: cada request del test client pasa por el detector en
+    modo "raise", así un viewset que vuelve a hacer N+1 rompe la suite.
+    Para código fuera de una request usa ``with self.assertSinNMasUno(): ...``.
+    """
+
+    detector_umbral: Optional[int] = None
+
+    def setUp(self):
+        middleware = "reservas.deteccion.DeteccionConsultasMiddleware"
+        ajustes = {"DETECTOR_CONSULTAS": "raise"}
+        if self.detector_umbral is not None:
+            ajustes["DETECTOR_CONSULTAS_UMBRAL"] = self.detector_umbral
+        if middleware not in settings.MIDDLEWARE:
+            ajustes["MIDDLEWARE"] = [middleware, *settings.MIDDLEWARE]
+        override = override_settings(**ajustes)
+        override.enable()
+        self.addCleanup(override.disable)
+        super().setUp()
+
+    @contextmanager
+    def assertSinNMasUno(self, umbral: Optional[int] = None):
+        with DetectorConsultas(umbral=umbral or self.detector_umbral) as detector:
+            yield detector
+        if detector.repetidas:
+            raise NMasUnoError(detector.reporte())
@@ -1,53 +1,187 @@
+import hashlib
 import json
 import logging
-from datetime import datetime
+import threading
+import time as _time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from functools import reduce
+from operator import or_
 from typing import Tuple
 
 from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
 from django.utils import timezone
 
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.http import build_http
 
-from .models import CalendarCredential, Cita
+from .models import CalendarCredential, Cita, SyncWatermark
 
 logger = logging.getLogger(__name__)
 
 
-def _get_credentials() -> Credentials | None:
-    cred_obj = CalendarCredential.objects.first()
-    if not cred_obj:
+SCOPES = ["https://www.googleapis.com/auth/calendar"]
+# Refresca el token antes de que expire para no pagar el refresh a mitad de un sync
+REFRESCO_ANTICIPADO = timedelta(minutes=5)
+
+# Cache por proceso: {credencial_id: (actualizado_en, service, creds)}. Construir el
+# service con build() es caro; si la credencial se guarda en otro proceso cambia
+# actualizado_en y se reconstruye. `_service_lock` solo protege los dicts; cada
+# credencial tiene su lock y el refresh/build se hacen fuera de ellos.
+_service_cache: dict = {}
+_credencial_locks: dict = {}
+_service_lock = threading.Lock()
+
+
+class CalendarNoDisponible(Exception):
+    """Hay credenciales pero no se pudo obtener un token (red, 5xx): reintentar."""
+
+
+def invalidar_service_cache(credencial_id=None) -> None:
+    """Descarta el service cacheado de una credencial (o todos si no se indica)."""
+    with _service_lock:
+        if credencial_id is None:
+            _service_cache.clear()
+        else:
+            _service_cache.pop(credencial_id, None)
+
+
+def _lock_credencial(credencial_id) -> threading.Lock:
+    with _service_lock:
+        return _credencial_locks.setdefault(credencial_id, threading.Lock())
+
+
+def _expira_pronto(creds: Credentials) -> bool:
+    if not creds.expiry:
+        return False
+    # google-auth guarda expiry como UTC naive
+    ahora = datetime.now(dt_timezone.utc).replace(tzinfo=None)
+    return creds.expiry - ahora < REFRESCO_ANTICIPADO
+
+
+def nombre_credencial_negocio(negocio_id) -> str:
+    # Mismo formato que guarda api_google_calendar._credential_name
+    return f"negocio_{negocio_id}"
+
+
+def _credencial_para(negocio_id=None) -> dict | None:
+    """
+    Credencial a usar para un negocio: la propia (`negocio_<id>`) si existe; si no
+    la "default" y, por compatibilidad, la primera que no sea de otro negocio.
+    """
+    propia = nombre_credencial_negocio(negocio_id) if negocio_id else None
+    filtro = ~Q(nombre__startswith="negocio_")
+    if propia:
+        filtro |= Q(nombre=propia)
+    candidatas = list(
+        CalendarCredential.objects.filter(filtro).order_by("pk").values("pk", "nombre", "actualizado_en", "calendar_id")
+    )
+    for nombre in (propia, "default"):
+        for meta in candidatas:
+            if nombre and meta["nombre"] == nombre:
+                return meta
+    return candidatas[0] if candidatas else None
+
+
+# Nombres de las credenciales guardadas, en el cache compartido: las señales de Cita
+# lo consultan en cada save para no encolar syncs sin Calendar configurado
+CREDENCIALES_CACHE_KEY = "calendar:credenciales"
+CREDENCIALES_CACHE_TIMEOUT = 300
+
+
+def invalidar_credenciales_configuradas() -> None:
+    cache.delete(CREDENCIALES_CACHE_KEY)
+
+
+def calendar_configurado(negocio_id=None) -> bool:
+    """
+    True si `_credencial_para(negocio_id)` encontraría una credencial. Sin cambios
+    en CalendarCredential no hace consultas.
+    """
+    nombres = cache.get(CREDENCIALES_CACHE_KEY)
+    if nombres is None:
+        nombres = list(CalendarCredential.objects.values_list("nombre", flat=True))
+        cache.set(CREDENCIALES_CACHE_KEY, nombres, CREDENCIALES_CACHE_TIMEOUT)
+    propia = nombre_credencial_negocio(negocio_id) if negocio_id else None
+    return any(nombre == propia or not nombre.startswith("negocio_") for nombre in nombres)
+
+
+def _cargar_calendar(negocio_id=None) -> tuple[object, str, Credentials, int] | None:
+    """
+    Devuelve (service, calendar_id, creds, credencial_id) para el negocio desde el
+    cache del proceso, o None si no hay credenciales. Sin cambios en la credencial
+    cuesta una consulta. Si el token no se puede refrescar lanza
+    `CalendarNoDisponible` (a diferencia de None, hay que reintentar).
+    """
+    meta = _credencial_para(negocio_id)
+    if not meta:
         logger.debug("No hay credenciales de Calendar almacenadas.")
         return None
-
-    data = cred_obj.credentials_json
-    creds = Credentials.from_authorized_user_info(data, scopes=["https://www.googleapis.com/auth/calendar"])
-    if creds.expired and creds.refresh_token:
+    calendar_id = meta["calendar_id"] or settings.GOOGLE_CALENDAR_ID
+    cred_id = meta["pk"]
+
+    with _lock_credencial(cred_id):
+        version, service, creds = _service_cache.get(cred_id, (None, None, None))
+        if version != meta["actualizado_en"]:
+            cred_obj = CalendarCredential.objects.get(pk=cred_id)
+            service = None
+            creds = Credentials.from_authorized_user_info(cred_obj.credentials_json, scopes=SCOPES)
+        version = meta["actualizado_en"]
+        refrescar = bool((creds.expired or _expira_pronto(creds)) and creds.refresh_token)
+        if service is not None and not refrescar:
+            return service, calendar_id, creds, cred_id
+
+    # Red y build() sin locks: un refresh lento no frena a otras credenciales ni a
+    # los hilos que ya tienen un service válido. Dos hilos pueden refrescar a la vez
+    # la misma credencial (solo cerca de la expiración); gana el último en guardar.
+    if refrescar:
         try:
             creds.refresh(Request())
-            # persist refreshed token
-            cred_obj.credentials_json = json.loads(creds.to_json())
-            cred_obj.save(update_fields=["credentials_json", "actualizado_en"])
         except Exception as exc:  # noqa: BLE001
             logger.warning("No se pudo refrescar token de Calendar: %s", exc)
-            return None
-    return creds
+            invalidar_service_cache(cred_id)
+            raise CalendarNoDisponible(str(exc)) from exc
+        # persist refreshed token (el post_save limpia el cache de este proceso)
+        cred_obj = CalendarCredential.objects.get(pk=cred_id)
+        cred_obj.credentials_json = json.loads(creds.to_json())
+        cred_obj.save(update_fields=["credentials_json", "actualizado_en"])
+        version = cred_obj.actualizado_en
+
+    if service is None:
+        # El service comparte `creds`: los refrescos posteriores le llegan sin reconstruirlo
+        service = build("calendar", "v3", credentials=creds, cache_discovery=False)
+    with _service_lock:
+        _service_cache[cred_id] = (version, service, creds)
+    return service, calendar_id, creds, cred_id
+
 
+def _get_credentials(negocio_id=None) -> Credentials | None:
+    cargado = _cargar_calendar(negocio_id)
+    return cargado[2] if cargado else None
 
-def _get_service() -> Tuple[object | None, str | None]:
+
+def _get_service(negocio_id=None) -> Tuple[object | None, str | None]:
     """
-    Devuelve (service, calendar_id). Si faltan credenciales retorna (None, None).
+    Devuelve (service, calendar_id) del negocio. Si faltan credenciales retorna
+    (None, None); si no se pudo refrescar el token lanza `CalendarNoDisponible`.
+    El service se reutiliza entre llamadas del mismo proceso.
     """
-    creds = _get_credentials()
-    if not creds:
+    cargado = _cargar_calendar(negocio_id)
+    if not cargado:
         return None, None
+    return cargado[0], cargado[1]
+
 
-    service = build("calendar", "v3", credentials=creds, cache_discovery=False)
-    cred_obj = CalendarCredential.objects.first()
-    calendar_id = (cred_obj.calendar_id if cred_obj else None) or settings.GOOGLE_CALENDAR_ID
-    return service, calendar_id
+def _http_status(exc: Exception) -> int | None:
+    return getattr(exc, "status_code", None) or getattr(getattr(exc, "resp", None), "status", None)
 
 
 def _local_datetime(fecha, hora):
@@ -70,102 +204,470 @@ def _build_event_body(cita: Cita) -> dict:
     }
 
 
-def sync_cita_to_calendar(cita: Cita):
-    service, calendar_id = _get_service()
+def _calendar_hash(event_body: dict, calendar_id: str) -> str:
+    contenido = json.dumps({"calendar_id": calendar_id, "body": event_body}, sort_keys=True, default=str)
+    return hashlib.sha256(contenido.encode()).hexdigest()
+
+
+def sync_cita_to_calendar(cita: Cita) -> bool:
+    """
+    Crea/actualiza el evento de la cita. Devuelve False si hubo un error que
+    vale la pena reintentar, incluido un token que no se pudo refrescar (sin
+    credenciales no hay nada que hacer: True).
+    Si el cuerpo del evento no cambió desde el último envío no llama a la API.
+    Antes de insertar reserva el alta (ver `_reservar_altas`); si otro proceso
+    la está creando devuelve False y el reintento encuentra su event_id.
+    """
+    try:
+        service, calendar_id = _get_service(cita.negocio_id)
+    except CalendarNoDisponible:
+        return False
     if not service:
-        return
+        return True
 
     event_body = _build_event_body(cita)
+    huella = _calendar_hash(event_body, calendar_id)
+    if cita.event_id and not es_reserva(cita.event_id) and cita.calendar_hash == huella:
+        return True
 
     try:
-        if cita.event_id:
+        if cita.event_id and not es_reserva(cita.event_id):
             try:
                 service.events().update(calendarId=calendar_id, eventId=cita.event_id, body=event_body).execute()
-                return
+                _marcar_sincronizada(cita, huella)
+                return True
             except HttpError as exc:
-                status = getattr(exc, "status_code", None) or getattr(getattr(exc, "resp", None), "status", None)
-                if status != 404:
+                if _http_status(exc) != 404:
                     logger.warning("Error al actualizar evento %s: %s", cita.event_id, exc)
-                    return
+                    return False
                 # 404: el evento fue borrado en Calendar, creamos uno nuevo
                 logger.info("Evento %s inexistente en Calendar; se recreará.", cita.event_id)
 
-        created = service.events().insert(calendarId=calendar_id, body=event_body, sendUpdates="all").execute()
+        marca = _marca_reserva()
+        if not _reservar_altas([cita], marca):
+            logger.info("Otro proceso está creando el evento de la cita %s; se reintentará.", cita.id)
+            return False
+        try:
+            created = service.events().insert(calendarId=calendar_id, body=event_body, sendUpdates="all").execute()
+        except Exception:
+            _liberar_altas([cita.pk], marca)
+            raise
         cita.event_id = created.get("id")
-        cita.save(update_fields=["event_id"])
+        _marcar_sincronizada(cita, huella)
+        return True
     except Exception as exc:  # noqa: BLE001
         logger.warning("No se pudo sincronizar cita %s con Calendar: %s", cita.id, exc)
+        return False
+
+
+# El sync por cita (outbox) y el incremental pueden tomar la misma cita sin evento.
+# Antes de insertar, cada uno reserva el alta escribiendo una marca provisional en
+# event_id con un UPDATE condicional; quien no la consigue no inserta. Una marca
+# de un proceso que murió a mitad vence a los RESERVA_SEGUNDOS.
+RESERVA_PREFIJO = "~insertando:"
+RESERVA_SEGUNDOS = 600
+
 
+def es_reserva(event_id) -> bool:
+    return bool(event_id) and event_id.startswith(RESERVA_PREFIJO)
 
-def delete_cita_from_calendar(cita: Cita):
-    if not cita.event_id:
-        return
-    service, calendar_id = _get_service()
+
+def _marca_reserva() -> str:
+    # Segundos con ancho fijo: las marcas vencidas se encuentran comparando cadenas
+    return f"{RESERVA_PREFIJO}{int(_time.time()):011d}:{uuid.uuid4().hex[:8]}"
+
+
+def _reservar_altas(citas: list, marca: str) -> set:
+    """
+    Pone `marca` en event_id de las citas que siguen como se leyeron: sin evento
+    (o con una marca vencida) o con el id de un evento que Calendar ya no tiene.
+    Devuelve los pks reservados; las demás las está insertando otro proceso.
+    """
+    if not citas:
+        return set()
+    vencida = f"{RESERVA_PREFIJO}{int(_time.time()) - RESERVA_SEGUNDOS:011d}"
+    libres = [cita.pk for cita in citas if not cita.event_id or es_reserva(cita.event_id)]
+    reemplazos = [cita for cita in citas if cita.event_id and not es_reserva(cita.event_id)]
+    if libres:
+        Cita.objects.filter(pk__in=libres).filter(
+            Q(event_id__isnull=True) | Q(event_id="") | Q(event_id__startswith=RESERVA_PREFIJO, event_id__lt=vencida)
+        ).update(event_id=marca)
+    if reemplazos:
+        Cita.objects.filter(reduce(or_, (Q(pk=cita.pk, event_id=cita.event_id) for cita in reemplazos))).update(
+            event_id=marca
+        )
+    return set(Cita.objects.filter(pk__in=[cita.pk for cita in citas], event_id=marca).values_list("pk", flat=True))
+
+
+def _liberar_altas(pks, marca: str) -> None:
+    """Devuelve a "sin evento" las altas reservadas con `marca` que no se insertaron."""
+    if pks:
+        Cita.objects.filter(pk__in=list(pks), event_id=marca).update(event_id=None)
+
+
+def _marcar_sincronizada(cita: Cita, huella: str) -> None:
+    cita.calendar_hash = huella
+    cita.calendar_synced_at = timezone.now()
+    # Solo campos internos: no cambia actualizado_en ni dispara notificaciones
+    cita.save(update_fields=["event_id", "calendar_hash", "calendar_synced_at"])
+
+
+def delete_event_from_calendar(event_id: str, negocio_id=None) -> bool:
+    """Borra un evento por id en el calendario del negocio. Devuelve False si hay que reintentar."""
+    if not event_id or es_reserva(event_id):
+        return True
+    try:
+        service, calendar_id = _get_service(negocio_id)
+    except CalendarNoDisponible:
+        return False
     if not service:
-        return
+        return True
     try:
-        service.events().delete(calendarId=calendar_id, eventId=cita.event_id).execute()
+        service.events().delete(calendarId=calendar_id, eventId=event_id).execute()
+    except HttpError as exc:
+        if _http_status(exc) in (404, 410):
+            return True
+        logger.warning("No se pudo eliminar evento %s de Calendar: %s", event_id, exc)
+        return False
     except Exception as exc:  # noqa: BLE001
-        logger.warning("No se pudo eliminar evento de Calendar para cita %s: %s", cita.id, exc)
+        logger.warning("No se pudo eliminar evento %s de Calendar: %s", event_id, exc)
+        return False
+    return True
+
+
+def delete_cita_from_calendar(cita: Cita) -> bool:
+    return delete_event_from_calendar(cita.event_id, cita.negocio_id)
+
 
+# Google acepta hasta 50 peticiones por lote en la API de Calendar
+BATCH_MAX = 50
+RESYNC_WORKERS = 4
 
-def resync_calendar_events(limit: int = 200, service=None, calendar_id: str | None = None) -> tuple[int, int]:
+
+def _http_por_hilo(creds: Credentials | None):
+    """
+    httplib2 no es thread-safe: cada hilo del pool usa su propio Http autorizado.
+    Sin credenciales (service inyectado, p. ej. en tests) se usa el http del service.
     """
-    Recorre citas futuras y garantiza que existan/estén actualizadas en Calendar.
+    if creds is None:
+        return lambda: None
+    local = threading.local()
 
-    Devuelve (creados, actualizados).
+    def _http():
+        if not hasattr(local, "http"):
+            local.http = AuthorizedHttp(creds, http=build_http())
+        return local.http
+
+    return _http
+
+
+def _ejecutar_lote(service, operaciones: list, http_factory) -> dict:
+    """Ejecuta [(request_id, request)] en un lote HTTP. Devuelve {request_id: (respuesta, excepción)}."""
+    resultados = {}
+
+    def _callback(request_id, response, exception):
+        resultados[request_id] = (response, exception)
+
+    batch = service.new_batch_http_request(callback=_callback)
+    for request_id, request in operaciones:
+        batch.add(request, request_id=request_id)
+    try:
+        batch.execute(http=http_factory())
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("Falló un lote de %s peticiones a Calendar: %s", len(operaciones), exc)
+        for request_id, _ in operaciones:
+            resultados.setdefault(request_id, (None, exc))
+    return resultados
+
+
+def _ejecutar_en_lotes(service, operaciones: list, http_factory, batch_size: int, workers: int) -> dict:
+    batch_size = max(1, min(batch_size, BATCH_MAX))
+    lotes = [operaciones[i : i + batch_size] for i in range(0, len(operaciones), batch_size)]
+    if not lotes:
+        return {}
+    resultados = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(lotes)))) as pool:
+        for parcial in pool.map(lambda lote: _ejecutar_lote(service, lote, http_factory), lotes):
+            resultados.update(parcial)
+    return resultados
+
+
+_CAMPOS_SYNC = ["event_id", "calendar_hash", "calendar_synced_at"]
+
+
+# Particiones (credenciales) que se sincronizan en paralelo, cada una con su pool de lotes
+PARTICIONES_MAX = 4
+
+
+def _enviar_citas(citas: list, service, calendar_id: str, creds, batch_size: int, workers: int) -> tuple:
     """
-    if service is None or calendar_id is None:
-        service, calendar_id = _get_service()
-    if not service:
-        return 0, 0
+    Envía a un calendario las citas en lotes HTTP (hasta 50) ejecutados en un pool
+    de hilos. Solo hace HTTP: deja event_id/huella en los objetos y no toca la BD.
+    Las citas sin event_id se insertan (el llamador ya reservó su alta); las de un
+    update que responde 404 se devuelven en `por_recrear` para reservarlas e
+    insertarlas en otra pasada.
+
+    Devuelve (creados, actualizados, citas_sincronizadas, citas_fallidas, por_recrear).
+    """
+    por_id = {str(cita.pk): cita for cita in citas}
+    bodies = {request_id: _build_event_body(cita) for request_id, cita in por_id.items()}
+    events = service.events()
+    http_factory = _http_por_hilo(creds)
+
+    def _insert(request_id):
+        return events.insert(calendarId=calendar_id, body=bodies[request_id], sendUpdates="all")
+
+    updates = [
+        (request_id, events.update(calendarId=calendar_id, eventId=cita.event_id, body=bodies[request_id]))
+        for request_id, cita in por_id.items()
+        if cita.event_id
+    ]
+    inserts = [(request_id, _insert(request_id)) for request_id, cita in por_id.items() if not cita.event_id]
+    update_ids = {request_id for request_id, _ in updates}
+
+    resultados = _ejecutar_en_lotes(service, updates + inserts, http_factory, batch_size, workers)
+
+    creados = actualizados = 0
+    por_recrear = []
+    enviados = []
+    fallidas = []
+    for request_id, (respuesta, exc) in resultados.items():
+        cita = por_id[request_id]
+        if request_id in update_ids:
+            if exc is None:
+                actualizados += 1
+                enviados.append(request_id)
+            elif _http_status(exc) == 404:
+                logger.info("Evento %s no existe, se creará uno nuevo.", cita.event_id)
+                por_recrear.append(cita)
+            else:
+                logger.warning("No se pudo actualizar cita %s: %s", cita.id, exc)
+                fallidas.append(cita)
+            continue
+        if exc is None:
+            cita.event_id = respuesta.get("id")
+            creados += 1
+            enviados.append(request_id)
+        else:
+            logger.warning("No se pudo resync cita %s: %s", cita.id, exc)
+            fallidas.append(cita)
+
+    ahora = timezone.now()
+    sincronizadas = []
+    for request_id in enviados:
+        cita = por_id[request_id]
+        cita.calendar_hash = _calendar_hash(bodies[request_id], calendar_id)
+        cita.calendar_synced_at = ahora
+        sincronizadas.append(cita)
+    return creados, actualizados, sincronizadas, fallidas, por_recrear
+
+
+def _particionar(citas: list, service=None, calendar_id: str | None = None) -> tuple[list, list]:
+    """
+    Agrupa las citas por credencial de Calendar: ([(service, calendar_id, creds, citas)],
+    no_disponibles). Cada negocio usa su credencial (`negocio_<id>`) o la default;
+    los negocios que comparten credencial comparten partición (y su cuota). Con
+    `service` explícito todas van a ese calendario. Las citas de negocios sin
+    credencial se omiten; las de credenciales cuyo token no se pudo refrescar van
+    a `no_disponibles` para reintentarlas.
+    """
+    if service is not None and calendar_id is not None:
+        return ([(service, calendar_id, None, citas)] if citas else []), []
 
+    destinos = {}
+    particiones = {}
+    no_disponibles = []
+    for cita in citas:
+        if cita.negocio_id not in destinos:
+            # Una carga por negocio: service, calendario y creds salen del mismo cache
+            try:
+                destinos[cita.negocio_id] = _cargar_calendar(cita.negocio_id)
+            except CalendarNoDisponible:
+                destinos[cita.negocio_id] = False
+        destino = destinos[cita.negocio_id]
+        if destino is False:
+            no_disponibles.append(cita)
+            continue
+        if destino is None:
+            continue
+        service_negocio, calendar_negocio, creds, cred_id = destino
+        particiones.setdefault(
+            (cred_id, calendar_negocio), (service_negocio, calendar_negocio, creds, [])
+        )[3].append(cita)
+    return list(particiones.values()), no_disponibles
+
+
+def _push_citas(particiones: list, batch_size: int, workers: int) -> tuple[int, int, list]:
+    """
+    Envía cada partición en paralelo (HTTP en hilos) y guarda event_id/huella de
+    todas las citas enviadas con un solo bulk_update en el hilo actual. Las altas
+    se reservan antes en este hilo (los del pool solo hacen HTTP); las que está
+    insertando otro proceso cuentan como fallidas para reintentarlas.
+
+    Devuelve (creados, actualizados, citas_fallidas).
+    """
+    marca = _marca_reserva()
+    reservadas = set()
+    sincronizadas = []
+    fallidas = []
+
+    def _reservar(particiones, nuevas):
+        ok = _reservar_altas(nuevas, marca)
+        reservadas.update(ok)
+        ocupadas = {cita.pk for cita in nuevas} - ok
+        for cita in nuevas:
+            if cita.pk in ok:
+                cita.event_id = None
+            else:
+                fallidas.append(cita)
+        return [(s, cal, cr, [c for c in citas if c.pk not in ocupadas]) for s, cal, cr, citas in particiones]
+
+    def _enviar(particion):
+        service, calendar_id, creds, citas = particion
+        return _enviar_citas(citas, service, calendar_id, creds, batch_size, workers)
+
+    def _enviar_todas(particiones):
+        particiones = [p for p in particiones if p[3]]
+        if len(particiones) <= 1:
+            resultados = [_enviar(p) for p in particiones]
+        else:
+            with ThreadPoolExecutor(max_workers=min(PARTICIONES_MAX, len(particiones))) as pool:
+                resultados = list(pool.map(_enviar, particiones))
+        creados = actualizados = 0
+        por_recrear = []
+        for particion, (c, a, ok, error, recrear) in zip(particiones, resultados):
+            creados += c
+            actualizados += a
+            sincronizadas.extend(ok)
+            fallidas.extend(error)
+            if recrear:
+                por_recrear.append((*particion[:3], recrear))
+        return creados, actualizados, por_recrear
+
+    nuevas = [cita for particion in particiones for cita in particion[3] if not cita.event_id or es_reserva(cita.event_id)]
+    creados, actualizados, por_recrear = _enviar_todas(_reservar(particiones, nuevas))
+    if por_recrear:
+        # Eventos borrados en Calendar: se reservan desde su event_id viejo y se insertan
+        recreados, _, _ = _enviar_todas(_reservar(por_recrear, [c for p in por_recrear for c in p[3]]))
+        creados += recreados
+
+    _liberar_altas({cita.pk for cita in fallidas} & reservadas, marca)
+    # bulk_update no dispara post_save ni toca actualizado_en: no se vuelve a encolar sync ni correo
+    Cita.objects.bulk_update(sincronizadas, _CAMPOS_SYNC, batch_size=500)
+    return creados, actualizados, fallidas
+
+
+def resync_calendar_events(
+    limit: int = 200,
+    service=None,
+    calendar_id: str | None = None,
+    batch_size: int = BATCH_MAX,
+    workers: int = RESYNC_WORKERS,
+) -> tuple[int, int]:
+    """
+    Recorre citas futuras y garantiza que existan/estén actualizadas en Calendar
+    (resync completo, sin importar si cambiaron), cada negocio en su calendario.
+
+    Devuelve (creados, actualizados).
+    """
     hoy = timezone.localdate()
-    citas = (
+    citas = list(
         Cita.objects.filter(fecha__gte=hoy)
         .select_related("cliente", "servicio")
         .order_by("fecha", "hora_inicio")[:limit]
     )
+    particiones, _ = _particionar(citas, service, calendar_id)
+    if not particiones:
+        return 0, 0
+    creados, actualizados, _ = _push_citas(particiones, batch_size, workers)
+    return creados, actualizados
 
-    creados = actualizados = 0
-    for cita in citas:
-        event_body = _build_event_body(cita)
-        try:
-            if cita.event_id:
-                try:
-                    # Si existe, actualizamos para reflejar cambios locales
-                    service.events().get(calendarId=calendar_id, eventId=cita.event_id).execute()
-                    service.events().update(calendarId=calendar_id, eventId=cita.event_id, body=event_body).execute()
-                    actualizados += 1
-                    continue
-                except HttpError as exc:
-                    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "resp", None), "status", None)
-                    if status != 404:
-                        logger.warning("No se pudo actualizar cita %s: %s", cita.id, exc)
-                        continue
-                    logger.info("Evento %s no existe, se creará uno nuevo.", cita.event_id)
 
-            created = service.events().insert(calendarId=calendar_id, body=event_body, sendUpdates="all").execute()
-            cita.event_id = created.get("id")
-            cita.save(update_fields=["event_id"])
-            creados += 1
-        except Exception as exc:  # noqa: BLE001
-            logger.warning("No se pudo resync cita %s: %s", cita.id, exc)
+WATERMARK_CALENDAR = "calendar_sync"
+# Transacciones que guardaron antes de leer la marca pero confirmaron después
+WATERMARK_MARGEN = timedelta(minutes=2)
+
+
+def sync_calendar_incremental(
+    limit: int = 500,
+    service=None,
+    calendar_id: str | None = None,
+    batch_size: int = BATCH_MAX,
+    workers: int = RESYNC_WORKERS,
+) -> tuple[int, int]:
+    """
+    Sincroniza solo citas futuras modificadas desde la última marca de agua y cuyo
+    cuerpo de evento cambió desde el último envío (huella en `calendar_hash`).
+    Pensado para correr cada minuto: sin cambios no hace llamadas a la API.
+
+    La marca es el keyset (actualizado_en, pk): con más de `limit` citas con el
+    mismo `actualizado_en` (marcar_citas_para_calendar, backfill de la
+    migración 0010) cada corrida avanza por pk en vez de releer el mismo lote.
+
+    Devuelve (creados, actualizados).
+    """
+    inicio = timezone.now()
+    marca = SyncWatermark.objects.filter(nombre=WATERMARK_CALENDAR).values_list("valor", "ultimo_pk").first()
+    qs = Cita.objects.filter(fecha__gte=timezone.localdate())
+    if marca:
+        valor, ultimo_pk = marca
+        qs = qs.filter(Q(actualizado_en__gt=valor) | Q(actualizado_en=valor, pk__gt=ultimo_pk))
+    candidatas = list(qs.select_related("cliente", "servicio").order_by("actualizado_en", "pk")[:limit])
+
+    particiones, no_disponibles = _particionar(candidatas, service, calendar_id)
+    if candidatas and not particiones:
+        # Sin credenciales (o sin token) no se avanza la marca: se retoma desde aquí
+        return 0, 0
+
+    pendientes = []
+    for service_p, calendar_p, creds_p, citas in particiones:
+        citas = [
+            cita
+            for cita in citas
+            if not cita.event_id or cita.calendar_hash != _calendar_hash(_build_event_body(cita), calendar_p)
+        ]
+        if citas:
+            pendientes.append((service_p, calendar_p, creds_p, citas))
+
+    creados = actualizados = 0
+    fallidas = list(no_disponibles)
+    if pendientes:
+        creados, actualizados, fallidas_push = _push_citas(pendientes, batch_size, workers)
+        fallidas += fallidas_push
+
+    # Lo guardado antes de inicio - MARGEN ya era visible al leer; lo posterior puede
+    # confirmarse tarde con un actualizado_en anterior al de la última fila leída
+    nueva_marca = (inicio - WATERMARK_MARGEN, 0)
+    if len(candidatas) == limit:
+        # Quedan más: la próxima corrida sigue después de la última procesada, sin pasar el margen
+        nueva_marca = min(nueva_marca, (candidatas[-1].actualizado_en, candidatas[-1].pk))
+    if fallidas:
+        # Quedarse justo antes de la primera cita fallida para reintentarla en la próxima corrida
+        nueva_marca = min([nueva_marca] + [(cita.actualizado_en, cita.pk - 1) for cita in fallidas])
+    valor, ultimo_pk = nueva_marca
+    if not SyncWatermark.objects.filter(nombre=WATERMARK_CALENDAR).update(valor=valor, ultimo_pk=ultimo_pk):
+        SyncWatermark.objects.create(nombre=WATERMARK_CALENDAR, valor=valor, ultimo_pk=ultimo_pk)
 
     return creados, actualizados
 
 
-def calendar_status() -> dict:
+def calendar_status(negocio_id=None) -> dict:
     """
-    Devuelve estado básico de la integración con Calendar.
+    Devuelve estado básico de la integración con Calendar (del negocio si se indica).
     """
-    cred_obj = CalendarCredential.objects.first()
-    creds = _get_credentials()
+    meta = _credencial_para(negocio_id)
+    try:
+        creds = _get_credentials(negocio_id)
+        refresco_fallido = False
+    except CalendarNoDisponible:
+        creds, refresco_fallido = None, True
 
     status = {
         "authorized": bool(creds),
-        "calendar_id": (cred_obj.calendar_id if cred_obj else None) or settings.GOOGLE_CALENDAR_ID,
-        "updated_at": cred_obj.actualizado_en if cred_obj else None,
+        "refresh_failed": refresco_fallido,
+        "calendar_id": (meta["calendar_id"] if meta else None) or settings.GOOGLE_CALENDAR_ID,
+        "credential": meta["nombre"] if meta else None,
+        "updated_at": meta["actualizado_en"] if meta else None,
     }
 
     if creds:
@@ -0,0 +1,123 @@
+"""
+Horario de atención por negocio: semanal (HorarioSemanal), días especiales y
+cierres (DiaEspecial) y, para lo que no esté configurado, el horario por defecto
+(13:00–23:00, jueves cerrado).
+
+Se compila a una estructura inmutable en memoria (tupla de 7 intervalos más un
+dict por fecha desde hoy) y se guarda por negocio en el proceso: consultar un
+día es O(1) y no toca la BD. Cada copia lleva la versión del horario del cache
+compartido (reservas.cache.version_horario) y el día local en que se compiló;
+las señales de HorarioSemanal/DiaEspecial suben esa versión y cada worker
+recompila en su siguiente lectura, igual que al cambiar de día. Que la versión
+sea de verdad compartida depende de un cache redis/memcached (core/settings.py
+rechaza locmem fuera de DEBUG).
+"""
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from datetime import date, time
+from typing import Optional
+
+from django.utils import timezone
+
+from . import cache as availability_cache
+from .models import DiaEspecial, HorarioSemanal
+
+APERTURA_DEFAULT = time(13, 0)
+CIERRE_DEFAULT = time(23, 0)
+DIAS_CERRADOS_DEFAULT = (3,)  # 0=Lunes ... 3=Jueves
+
+Intervalo = Optional[tuple[int, int]]  # (apertura, cierre) en minutos; None = cerrado
+
+
+def _minutos(t: time) -> int:
+    return t.hour * 60 + t.minute
+
+
+def _intervalo(cerrado: bool, apertura: Optional[time], cierre: Optional[time]) -> Intervalo:
+    if cerrado or apertura is None or cierre is None or cierre <= apertura:
+        return None
+    return _minutos(apertura), _minutos(cierre)
+
+
+_SEMANA_DEFAULT: tuple[Intervalo, ...] = tuple(
+    None if dia in DIAS_CERRADOS_DEFAULT else (_minutos(APERTURA_DEFAULT), _minutos(CIERRE_DEFAULT))
+    for dia in range(7)
+)
+
+
+@dataclass(frozen=True)
+class Horario:
+    semana: tuple[Intervalo, ...] = _SEMANA_DEFAULT
+    especiales: dict[date, Intervalo] = field(default_factory=dict)
+    # Versión compartida con que se compiló; va en las claves de slots cacheados
+    version: int = field(default=0, compare=False)
+    # Día local de la compilación: `especiales` solo trae fechas desde ese día
+    compilado_para: Optional[date] = field(default=None, compare=False)
+
+    def intervalo(self, fecha: date) -> Intervalo:
+        """(apertura, cierre) en minutos del día, o None si está cerrado."""
+        if fecha in self.especiales:
+            return self.especiales[fecha]
+        return self.semana[fecha.weekday()]
+
+    def cerrado(self, fecha: date) -> bool:
+        return self.intervalo(fecha) is None
+
+    def horas(self, fecha: date) -> Optional[tuple[time, time]]:
+        intervalo = self.intervalo(fecha)
+        if intervalo is None:
+            return None
+        apertura, cierre = intervalo
+        return time(apertura // 60, apertura % 60), time(cierre // 60, cierre % 60)
+
+
+HORARIO_DEFAULT = Horario()
+
+_lock = threading.Lock()
+_cache: dict[int, Horario] = {}
+
+
+def _compilar(negocio_id: int, version: int, hoy: date) -> Horario:
+    semana = list(_SEMANA_DEFAULT)
+    for dia, apertura, cierre, cerrado in HorarioSemanal.objects.filter(negocio_id=negocio_id).values_list(
+        "dia_semana", "apertura", "cierre", "cerrado"
+    ):
+        semana[dia] = _intervalo(cerrado, apertura, cierre)
+    especiales = {
+        fecha: _intervalo(cerrado, apertura, cierre)
+        for fecha, apertura, cierre, cerrado in DiaEspecial.objects.filter(
+            negocio_id=negocio_id, fecha__gte=hoy
+        ).values_list("fecha", "apertura", "cierre", "cerrado")
+    }
+    return Horario(tuple(semana), especiales, version, hoy)
+
+
+def horario_de(negocio_id: Optional[int]) -> Horario:
+    """
+    Horario compilado del negocio: una lectura del cache compartido para validar
+    la versión y, solo si cambió o cambió el día, dos consultas para recompilarlo.
+    """
+    if negocio_id is None:
+        return HORARIO_DEFAULT
+    # La versión se lee antes que la BD: si cambia mientras compilamos, la próxima lectura recompila
+    version = availability_cache.version_horario(negocio_id)
+    hoy = timezone.localdate()
+    with _lock:
+        horario = _cache.get(negocio_id)
+    if horario is not None and horario.version == version and horario.compilado_para == hoy:
+        return horario
+    horario = _compilar(negocio_id, version, hoy)
+    with _lock:
+        _cache[negocio_id] = horario
+    return horario
+
+
+def invalidar_horario(negocio_id: Optional[int] = None) -> None:
+    """Olvida el horario compilado en este proceso (los demás siguen la versión compartida)."""
+    with _lock:
+        if negocio_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(negocio_id, None)
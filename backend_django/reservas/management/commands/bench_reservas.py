@@ -0,0 +1,279 @@
+import json
+import statistics
+import subprocess
+import time as _time
+from datetime import date, timedelta
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Q
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from reservas import cache as availability_cache
+from reservas import google_sync
+from reservas import metricas
+from reservas.horarios import horario_de, invalidar_horario
+from reservas.models import Cita, Cliente, Mesa, Servicio
+from reservas.serializers import CitaSerializer
+from reservas.utils import ACTIVE_STATES, available_slots, available_slots_range, suggest_slot
+from reservas.views import AgendaAvailabilityRangeView, CitaViewSet, PublicMesaAvailabilityView
+
+
+def _git_commit():
+    try:
+        salida = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return salida.stdout.strip() or None
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p * (len(ordenados) - 1))))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide los caminos calientes de reservas (slots, sugerencia, validación de citas, "
+        "disponibilidad de mesas y listado de citas): tiempos y número de consultas en JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--servicio",
+            type=int,
+            default=None,
+            help="Servicio a medir (default el que tiene más mesas activas).",
+        )
+        parser.add_argument(
+            "--fecha",
+            type=str,
+            default=None,
+            help="Día a medir en formato YYYY-MM-DD (default el próximo día abierto desde mañana).",
+        )
+        parser.add_argument("--repeticiones", type=int, default=5, help="Corridas por caso (default 5).")
+        parser.add_argument("--output", type=str, default=None, help="Archivo JSON de salida (default stdout).")
+        parser.add_argument(
+            "--comparar",
+            type=str,
+            default=None,
+            help="JSON de una corrida anterior; imprime la diferencia de mediana y consultas por caso.",
+        )
+
+    def handle(self, *args, **options):
+        servicio = self._servicio(options["servicio"])
+        fecha = self._fecha(options["fecha"], servicio)
+        repeticiones = max(1, options["repeticiones"])
+        self.servicio, self.fecha = servicio, fecha
+
+        resultados = {}
+        for nombre, preparar, ejecutar in self._casos():
+            resultados[nombre] = self._medir(preparar, ejecutar, repeticiones)
+
+        informe = {
+            "meta": {
+                "generado_en": timezone.now().isoformat(timespec="seconds"),
+                "commit": _git_commit(),
+                "django": django.get_version(),
+                "db": connection.vendor,
+                "servicio": servicio.id,
+                "fecha": fecha.isoformat(),
+                "repeticiones": repeticiones,
+                "volumen": {
+                    "citas": Cita.objects.count(),
+                    "citas_servicio": Cita.objects.filter(servicio=servicio).count(),
+                    "mesas_servicio": Mesa.objects.filter(servicio=servicio, activa=True).count(),
+                    "clientes": Cliente.objects.count(),
+                },
+            },
+            "resultados": resultados,
+        }
+
+        texto = json.dumps(informe, indent=2, ensure_ascii=False)
+        if options["output"]:
+            Path(options["output"]).write_text(texto + "\n", encoding="utf-8")
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['output']}"))
+        else:
+            self.stdout.write(texto)
+
+        if options["comparar"]:
+            self._comparar(options["comparar"], resultados)
+
+    # --- selección de datos ---
+
+    def _servicio(self, servicio_id):
+        servicios = Servicio.objects.annotate(n_mesas=Count("mesas", filter=Q(mesas__activa=True)))
+        if servicio_id:
+            servicio = servicios.filter(pk=servicio_id).first()
+        else:
+            servicio = servicios.filter(n_mesas__gt=0).order_by("-n_mesas", "id").first()
+        if servicio is None:
+            raise CommandError("No hay servicio con mesas activas; corre antes `manage.py generar_carga`.")
+        return servicio
+
+    def _fecha(self, fecha_str, servicio):
+        if fecha_str:
+            try:
+                return date.fromisoformat(fecha_str)
+            except ValueError:
+                raise CommandError("Fecha inválida. Usa YYYY-MM-DD.")
+        horario = horario_de(servicio.negocio_id)
+        fecha = timezone.localdate() + timedelta(days=1)
+        for _ in range(14):
+            if not horario.cerrado(fecha):
+                return fecha
+            fecha += timedelta(days=1)
+        raise CommandError("El negocio no abre en las próximas dos semanas; indica --fecha.")
+
+    def _cliente_libre(self):
+        # La validación rechaza clientes con otra cita activa futura
+        con_cita = Cita.objects.filter(
+            fecha__gte=timezone.localdate(), estado__in=ACTIVE_STATES
+        ).values("cliente_id")
+        return (
+            Cliente.objects.filter(negocio_id=self.servicio.negocio_id)
+            .exclude(pk__in=con_cita)
+            .order_by("id")
+            .first()
+        )
+
+    # --- casos ---
+
+    def _frio(self):
+        """Invalida la disponibilidad cacheada del servicio y el horario compilado."""
+        availability_cache.bump_servicio(self.servicio.id)
+        invalidar_horario(self.servicio.negocio_id)
+
+    def _casos(self):
+        servicio, fecha = self.servicio, self.fecha
+        # Host válido para build_absolute_uri (la paginación arma los enlaces next/previous)
+        hosts = [h.lstrip(".") for h in settings.ALLOWED_HOSTS if h != "*"]
+        factory = APIRequestFactory(HTTP_HOST=hosts[0] if hosts else "localhost")
+        nada = lambda: None  # noqa: E731
+
+        slots = available_slots(servicio, fecha)
+        hora_inicio, hora_fin = slots[0] if slots else (None, None)
+        cliente = self._cliente_libre()
+        data_cita = {
+            "negocio": servicio.negocio_id,
+            "servicio": servicio.id,
+            "cliente": cliente.id if cliente else None,
+            "fecha": fecha,
+            "hora_inicio": hora_inicio,
+            "hora_fin": hora_fin,
+            "estado": "confirmada",
+            "personas": 2,
+        }
+
+        mesas_view = PublicMesaAvailabilityView.as_view()
+        params_mesas = {"servicio": servicio.id, "fecha": fecha.isoformat()}
+        if hora_inicio:
+            params_mesas.update(hora_inicio=hora_inicio.strftime("%H:%M"), hora_fin=hora_fin.strftime("%H:%M"))
+
+        rango_view = AgendaAvailabilityRangeView.as_view()
+        params_rango = {
+            "servicio": servicio.id,
+            "desde": fecha.isoformat(),
+            "hasta": (fecha + timedelta(days=29)).isoformat(),
+        }
+
+        def rango(formato=None):
+            params = dict(params_rango, format=formato) if formato else params_rango
+            respuesta = rango_view(factory.get("/api/agenda/disponibilidad/rango/", params))
+            respuesta.render()
+            return respuesta
+
+        listado_view = CitaViewSet.as_view({"get": "list"})
+        usuario = servicio.negocio.propietario
+
+        def listar_citas():
+            request = factory.get("/api/citas/", {"page_size": 50})
+            force_authenticate(request, user=usuario)
+            respuesta = listado_view(request)
+            respuesta.render()
+            return respuesta
+
+        def observar_metricas():
+            # 1000 requests simulados: el costo que MetricasMiddleware agrega a cada uno
+            for i in range(1000):
+                metricas.observar("bench", "GET", 200, i / 10000, i % 30, 0.001)
+
+        def mesas_disponibles():
+            respuesta = mesas_view(factory.get("/api/mesas/disponibilidad/", params_mesas))
+            respuesta.render()
+            return respuesta
+
+        casos = [
+            ("available_slots", self._frio, lambda: available_slots(servicio, fecha)),
+            ("available_slots_cache", nada, lambda: available_slots(servicio, fecha)),
+            (
+                "available_slots_range_30d",
+                self._frio,
+                lambda: available_slots_range(servicio, fecha, fecha + timedelta(days=29)),
+            ),
+            # Slots ya cacheados: mide sobre todo la serialización del JSON de 30 días
+            ("disponibilidad_rango", nada, rango),
+            ("disponibilidad_rango_compacto", nada, lambda: rango("compact")),
+            ("suggest_slot", self._frio, lambda: suggest_slot(servicio, fecha_desde=fecha)),
+            ("cita_validate", self._frio, lambda: CitaSerializer(data=data_cita).is_valid()),
+            ("mesas_disponibilidad", self._frio, mesas_disponibles),
+            ("citas_listado", nada, listar_citas),
+            ("metricas_observar_1000", metricas.reiniciar, observar_metricas),
+        ]
+
+        # Service de Calendar: construcción en frío vs. cache por credencial (solo si hay credencial)
+        if google_sync._credencial_para(servicio.negocio_id):
+            negocio_id = servicio.negocio_id
+            casos += [
+                ("calendar_service_frio", google_sync.invalidar_service_cache, lambda: google_sync._get_service(negocio_id)),
+                ("calendar_service", nada, lambda: google_sync._get_service(negocio_id)),
+            ]
+        return casos
+
+    def _medir(self, preparar, ejecutar, repeticiones):
+        tiempos, consultas = [], []
+        for _ in range(repeticiones):
+            preparar()
+            with CaptureQueriesContext(connection) as ctx:
+                inicio = _time.perf_counter()
+                ejecutar()
+                tiempos.append((_time.perf_counter() - inicio) * 1000)
+            consultas.append(len(ctx.captured_queries))
+        return {
+            "ms": {
+                "min": round(min(tiempos), 3),
+                "mediana": round(statistics.median(tiempos), 3),
+                "p95": round(_percentil(tiempos, 0.95), 3),
+                "max": round(max(tiempos), 3),
+            },
+            "consultas": max(consultas),
+        }
+
+    def _comparar(self, ruta, resultados):
+        try:
+            base = json.loads(Path(ruta).read_text(encoding="utf-8"))["resultados"]
+        except (OSError, ValueError, KeyError) as exc:
+            raise CommandError(f"No se pudo leer {ruta}: {exc}")
+        self.stdout.write(f"\nComparación contra {ruta} (mediana ms, consultas):")
+        for nombre, actual in resultados.items():
+            anterior = base.get(nombre)
+            if anterior is None:
+                self.stdout.write(f"  {nombre}: nuevo")
+                continue
+            antes, ahora = anterior["ms"]["mediana"], actual["ms"]["mediana"]
+            cambio = (ahora - antes) / antes * 100 if antes else 0.0
+            self.stdout.write(
+                f"  {nombre}: {antes:.3f} → {ahora:.3f} ms ({cambio:+.1f}%), "
+                f"consultas {anterior['consultas']} → {actual['consultas']}"
+            )
@@ -1,10 +1,30 @@
+import time
 from datetime import timedelta
 
+from django.core.mail import EmailMessage, get_connection
 from django.core.management.base import BaseCommand
-from django.core.mail import send_mail
+from django.db.models import Q
 from django.utils import timezone
 
 from reservas.models import Cita
+from reservas.utils import ACTIVE_STATES
+
+
+def _build_message(cita: Cita, connection) -> EmailMessage:
+    return EmailMessage(
+        subject=f"Recordatorio: cita en {cita.negocio.nombre}",
+        body=(
+            f"Hola {cita.cliente.nombre},\n\n"
+            f"Te recordamos tu cita:\n"
+            f"- Negocio: {cita.negocio.nombre}\n"
+            f"- Servicio: {cita.servicio.nombre}\n"
+            f"- Fecha: {cita.fecha}\n"
+            f"- Hora: {cita.hora_inicio.strftime('%H:%M')} - {cita.hora_fin.strftime('%H:%M')}\n\n"
+            "Si necesitas reprogramar o cancelar, responde a este correo o usa el panel."
+        ),
+        to=[cita.cliente.email],
+        connection=connection,
+    )
 
 
 class Command(BaseCommand):
@@ -17,43 +37,75 @@ class Command(BaseCommand):
             default=24,
             help="Ventana de horas hacia adelante para enviar recordatorios (default 24).",
         )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="Correos por lote; cada lote usa una sola conexión SMTP y un solo UPDATE de los entregados (default 200).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Solo cuenta los recordatorios que se enviarían; no envía ni marca citas.",
+        )
 
     def handle(self, *args, **options):
         ahora = timezone.localtime()
         limite = ahora + timedelta(hours=options["horas"])
+        batch_size = max(1, options["batch_size"])
+        dry_run = options["dry_run"]
 
-        citas = Cita.objects.filter(
-            estado__in=("pendiente", "confirmada"),
-            fecha__gte=ahora.date(),
-            fecha__lte=limite.date(),
-            recordatorio_enviado=False,
-            cliente__email__isnull=False,
-        ).select_related("cliente", "servicio", "negocio")
-
-        enviados = 0
-        for cita in citas:
-            # Si la cita es hoy, validamos la hora inicio en ventana
-            if cita.fecha == ahora.date():
-                if cita.hora_inicio <= ahora.time():
-                    continue
-
-            send_mail(
-                subject=f"Recordatorio: cita en {cita.negocio.nombre}",
-                message=(
-                    f"Hola {cita.cliente.nombre},\n\n"
-                    f"Te recordamos tu cita:\n"
-                    f"- Negocio: {cita.negocio.nombre}\n"
-                    f"- Servicio: {cita.servicio.nombre}\n"
-                    f"- Fecha: {cita.fecha}\n"
-                    f"- Hora: {cita.hora_inicio.strftime('%H:%M')} - {cita.hora_fin.strftime('%H:%M')}\n\n"
-                    "Si necesitas reprogramar o cancelar, responde a este correo o usa el panel."
-                ),
-                from_email=None,
-                recipient_list=[cita.cliente.email],
-                fail_silently=True,
+        citas = (
+            Cita.objects.filter(
+                estado__in=ACTIVE_STATES,
+                fecha__lte=limite.date(),
+                recordatorio_enviado=False,
+                cliente__email__isnull=False,
             )
-            cita.recordatorio_enviado = True
-            cita.save(update_fields=["recordatorio_enviado"])
-            enviados += 1
+            # Si la cita es hoy, solo las que aún no empiezan
+            .filter(Q(fecha__gt=ahora.date()) | Q(fecha=ahora.date(), hora_inicio__gt=ahora.time()))
+            .exclude(cliente__email="")
+            .select_related("cliente", "servicio", "negocio")
+            .order_by("pk")
+        )
+
+        inicio = time.perf_counter()
+        enviados = fallidos = lotes = 0
+        ultimo_pk = 0
+        while True:
+            # Paginación por pk: no depende de que el lote anterior se haya marcado
+            lote = list(citas.filter(pk__gt=ultimo_pk)[:batch_size])
+            if not lote:
+                break
+            ultimo_pk = lote[-1].pk
+            lotes += 1
+
+            if dry_run:
+                enviados += len(lote)
+                continue
+
+            # Una conexión por lote, un mensaje por send_messages: si el SMTP falla a
+            # mitad solo se marcan los que el backend confirmó y no se duplican al reintentar
+            entregadas = []
+            try:
+                with get_connection() as connection:
+                    for cita in lote:
+                        if connection.send_messages([_build_message(cita, connection)]):
+                            entregadas.append(cita.pk)
+            except Exception as exc:  # noqa: BLE001
+                # El resto del lote queda sin marcar y se reintenta en la próxima ejecución
+                self.stderr.write(f"Lote {lotes} interrumpido ({len(lote) - len(entregadas)} sin enviar): {exc}")
+
+            if entregadas:
+                Cita.objects.filter(pk__in=entregadas).update(recordatorio_enviado=True)
+            enviados += len(entregadas)
+            fallidos += len(lote) - len(entregadas)
 
-        self.stdout.write(self.style.SUCCESS(f"Recordatorios enviados: {enviados}"))
+        duracion = time.perf_counter() - inicio
+        prefijo = "[dry-run] Recordatorios a enviar" if dry_run else "Recordatorios enviados"
+        resumen = f"{prefijo}: {enviados} en {lotes} lote(s), {duracion:.2f}s"
+        if enviados and duracion > 0:
+            resumen += f" ({enviados / duracion:.0f}/s)"
+        if fallidos:
+            resumen += f". Sin enviar: {fallidos}"
+        self.stdout.write(self.style.SUCCESS(resumen))
@@ -0,0 +1,227 @@
+import random
+import time as _time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from reservas import cache as availability_cache
+from reservas.asignacion import PlanMesas
+from reservas.horarios import horario_de
+from reservas.models import Cita, Cliente, Mesa, Negocio, Servicio
+from reservas.utils import _to_time
+
+# (capacidad_min, capacidad_max, tipo, peso): mayoría de mesas chicas, pocas grandes
+MESAS = [
+    (1, 2, "normal_2", 40),
+    (1, 4, "normal_4", 40),
+    (3, 6, "vip_grande", 12),
+    (6, 10, "cumple_10", 8),
+]
+# Tamaño de grupo: sobre todo parejas y mesas de 4
+PERSONAS = [(1, 6), (2, 40), (3, 14), (4, 22), (5, 6), (6, 6), (8, 4), (10, 2)]
+# (servicio, duración en minutos, fracción de las mesas)
+SERVICIOS = [("Mesa salón", 90, 0.8), ("Terraza", 60, 0.2)]
+# Estados según la cita ya pasó o no
+ESTADOS_PASADOS = [("completada", 80), ("cancelada", 13), ("no_asistio", 7)]
+ESTADOS_FUTUROS = [("confirmada", 70), ("pendiente", 20), ("cancelada", 10)]
+PREFIJO = "Carga"
+
+
+def _elegir(rnd: random.Random, opciones):
+    valores, pesos = zip(*opciones)
+    return rnd.choices(valores, weights=pesos)[0]
+
+
+def _peso_hora(minuto: int) -> float:
+    """Demanda relativa por hora de inicio: picos de comida (14-15h) y cena (20-21h)."""
+    hora = minuto / 60
+    return 0.3 + 2.0 * max(0.0, 1 - abs(hora - 14.5)) + 2.5 * max(0.0, 1 - abs(hora - 20.5))
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera datos sintéticos de volumen (negocios, mesas, clientes y meses de citas) con "
+        "bulk_create para medir los caminos calientes con bench_reservas. Usa una BD de pruebas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--negocios", type=int, default=2, help="Negocios a crear (default 2).")
+        parser.add_argument("--mesas", type=int, default=40, help="Mesas por negocio (default 40).")
+        parser.add_argument("--clientes", type=int, default=2000, help="Clientes por negocio (default 2000).")
+        parser.add_argument(
+            "--meses", type=int, default=6, help="Meses de historial hacia atrás desde hoy (default 6)."
+        )
+        parser.add_argument(
+            "--dias-futuros", type=int, default=30, help="Días de reservas futuras (default 30)."
+        )
+        parser.add_argument(
+            "--ocupacion",
+            type=float,
+            default=0.6,
+            help="Fracción media de la capacidad mesa-tiempo que se intenta reservar (default 0.6).",
+        )
+        parser.add_argument("--seed", type=int, default=42, help="Semilla; misma semilla, mismos datos (default 42).")
+        parser.add_argument("--batch-size", type=int, default=2000, help="Filas por bulk_create (default 2000).")
+        parser.add_argument(
+            "--permitir-bd",
+            action="store_true",
+            help="Confirma que la BD es desechable (tests, staging) para correr con DEBUG apagado.",
+        )
+
+    def handle(self, *args, **options):
+        # Sin adivinar por el nombre de la BD: con DEBUG apagado hace falta confirmarlo
+        if not (settings.DEBUG or options["permitir_bd"]):
+            raise CommandError(
+                f"generar_carga escribe miles de filas en la BD '{connection.settings_dict.get('NAME')}'. "
+                "Solo corre con DEBUG=true o con --permitir-bd."
+            )
+        if options["negocios"] < 1 or options["mesas"] < 1 or options["clientes"] < 1:
+            raise CommandError("--negocios, --mesas y --clientes deben ser al menos 1.")
+        if not 0 < options["ocupacion"] <= 1:
+            raise CommandError("--ocupacion debe estar entre 0 y 1.")
+
+        rnd = random.Random(options["seed"])
+        self.batch_size = max(1, options["batch_size"])
+        hoy = timezone.localdate()
+        desde = hoy - timedelta(days=30 * max(0, options["meses"]))
+        hasta = hoy + timedelta(days=max(0, options["dias_futuros"]))
+        propietario, _ = get_user_model().objects.get_or_create(
+            username="carga", defaults={"email": "carga@ejemplo.com"}
+        )
+        existentes = Negocio.objects.filter(nombre__startswith=PREFIJO).count()
+
+        inicio = _time.perf_counter()
+        totales = {"negocios": 0, "servicios": 0, "mesas": 0, "clientes": 0, "citas": 0}
+        for n in range(options["negocios"]):
+            with transaction.atomic():
+                negocio = Negocio.objects.create(
+                    nombre=f"{PREFIJO} {existentes + n + 1}", propietario=propietario
+                )
+                servicios = self._servicios(negocio, options["mesas"], rnd, totales)
+                clientes = self._clientes(negocio, options["clientes"], totales)
+                for servicio, mesas in servicios:
+                    totales["citas"] += self._citas(
+                        negocio, servicio, mesas, clientes, desde, hasta, hoy, options["ocupacion"], rnd
+                    )
+            totales["negocios"] += 1
+            self.stdout.write(f"  {negocio.nombre}: {totales['citas']} citas acumuladas")
+
+        # bulk_create no dispara señales: invalidar la disponibilidad cacheada
+        for servicio in Servicio.objects.filter(negocio__nombre__startswith=PREFIJO).values_list("id", flat=True):
+            availability_cache.bump_servicio(servicio)
+
+        segundos = _time.perf_counter() - inicio
+        resumen = ", ".join(f"{valor} {clave}" for clave, valor in totales.items())
+        self.stdout.write(self.style.SUCCESS(f"Carga generada ({desde}..{hasta}): {resumen} en {segundos:.1f}s"))
+
+    def _servicios(self, negocio, total_mesas, rnd, totales):
+        resultado = []
+        restantes = total_mesas
+        numero = 1
+        for i, (nombre, duracion, fraccion) in enumerate(SERVICIOS):
+            cantidad = restantes if i == len(SERVICIOS) - 1 else max(1, round(total_mesas * fraccion))
+            cantidad = min(cantidad, restantes)
+            if cantidad <= 0:
+                break
+            restantes -= cantidad
+            servicio = Servicio.objects.create(
+                negocio=negocio, nombre=nombre, duracion_minutos=duracion, precio=0
+            )
+            mesas = []
+            for _ in range(cantidad):
+                cap_min, cap_max, tipo, _peso = _elegir(rnd, [(m, m[3]) for m in MESAS])
+                mesas.append(
+                    Mesa(
+                        negocio=negocio,
+                        servicio=servicio,
+                        nombre=f"Mesa {numero}",
+                        tipo=tipo,
+                        capacidad_min=cap_min,
+                        capacidad_max=cap_max,
+                    )
+                )
+                numero += 1
+            mesas = Mesa.objects.bulk_create(mesas, batch_size=self.batch_size)
+            resultado.append((servicio, mesas))
+            totales["servicios"] += 1
+            totales["mesas"] += len(mesas)
+        return resultado
+
+    def _clientes(self, negocio, cantidad, totales):
+        clientes = Cliente.objects.bulk_create(
+            (
+                Cliente(
+                    negocio=negocio,
+                    nombre=f"Cliente {i}",
+                    email=f"cliente{i}@negocio{negocio.id}.test",
+                    telefono=f"55{negocio.id:03d}{i:05d}"[-10:],
+                )
+                for i in range(1, cantidad + 1)
+            ),
+            batch_size=self.batch_size,
+        )
+        totales["clientes"] += len(clientes)
+        return [cliente.id for cliente in clientes]
+
+    def _citas(self, negocio, servicio, mesas, clientes, desde, hasta, hoy, ocupacion, rnd) -> int:
+        horario = horario_de(negocio.id)
+        duracion = servicio.duracion_minutos
+        creadas = 0
+        pendientes = []
+        fecha = desde
+        while fecha <= hasta:
+            intervalo = horario.intervalo(fecha)
+            if intervalo is None:
+                fecha += timedelta(days=1)
+                continue
+            apertura, cierre = intervalo
+            inicios = list(range(apertura, cierre - duracion + 1, 15))
+            if not inicios:
+                fecha += timedelta(days=1)
+                continue
+            pesos = [_peso_hora(m) for m in inicios]
+            # Fines de semana llenan más; el día a día varía ±30%
+            factor = (1.3 if fecha.weekday() >= 4 else 1.0) * rnd.uniform(0.7, 1.3)
+            intentos = int(len(mesas) * (cierre - apertura) / duracion * ocupacion * factor)
+
+            plan = PlanMesas(mesas, intervalo=intervalo)
+            usados = set()
+            estados = ESTADOS_PASADOS if fecha < hoy else ESTADOS_FUTUROS
+            for _ in range(intentos):
+                inicio = rnd.choices(inicios, weights=pesos)[0]
+                personas = _elegir(rnd, PERSONAS)
+                cliente_id = rnd.choice(clientes)
+                if (cliente_id, inicio) in usados:
+                    continue
+                estado = _elegir(rnd, estados)
+                mesa = None
+                if estado != "cancelada":
+                    mesa = plan.asignar(inicio, inicio + duracion, personas)
+                    if mesa is None:
+                        continue
+                usados.add((cliente_id, inicio))
+                pendientes.append(
+                    Cita(
+                        negocio=negocio,
+                        servicio=servicio,
+                        cliente_id=cliente_id,
+                        mesa=mesa,
+                        personas=personas,
+                        fecha=fecha,
+                        hora_inicio=_to_time(inicio),
+                        hora_fin=_to_time(inicio + duracion),
+                        estado=estado,
+                        recordatorio_enviado=fecha < hoy,
+                    )
+                )
+            if len(pendientes) >= self.batch_size:
+                creadas += len(Cita.objects.bulk_create(pendientes, batch_size=self.batch_size))
+                pendientes = []
+            fecha += timedelta(days=1)
+        if pendientes:
+            creadas += len(Cita.objects.bulk_create(pendientes, batch_size=self.batch_size))
+        return creadas
@@ -1,26 +1,61 @@
 from datetime import timedelta
 
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 
 from reservas.models import Cita
-
-
-TOLERANCIA_MINUTOS = 15
+from reservas.signals import citas_no_show
+from reservas.utils import ACTIVE_STATES, TOLERANCIA_LLEGADA_MINUTOS
 
 
 class Command(BaseCommand):
     help = "Marca como no_asistio las citas confirmadas/pendientes que excedieron la tolerancia de llegada."
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Citas a marcar por lote; cada lote es un UPDATE y un evento citas_no_show (default 500).",
+        )
+
     def handle(self, *args, **options):
         ahora = timezone.localtime()
-        limite = (ahora - timedelta(minutes=TOLERANCIA_MINUTOS)).time()
+        limite = ahora - timedelta(minutes=TOLERANCIA_LLEGADA_MINUTOS)
+        batch_size = max(1, options["batch_size"])
 
+        # Ventana como fecha+hora: días anteriores completos, o el día del límite
+        # antes de la hora límite (cruza bien la medianoche).
         qs = Cita.objects.filter(
-            estado__in=("pendiente", "confirmada"),
-            fecha__lte=ahora.date(),
-            hora_inicio__lt=limite,
+            Q(fecha__lt=limite.date()) | Q(fecha=limite.date(), hora_inicio__lt=limite.time()),
+            estado__in=ACTIVE_STATES,
+        ).order_by("pk")
+
+        actualizadas = lotes = 0
+        ultimo_pk = 0
+        while True:
+            filas = list(qs.filter(pk__gt=ultimo_pk).values_list("pk", "servicio_id", "fecha")[:batch_size])
+            if not filas:
+                break
+            ultimo_pk = filas[-1][0]
+            ids = [pk for pk, _, _ in filas]
+
+            with transaction.atomic():
+                # Repite el filtro de estado por si alguna cita cambió entre el SELECT y el UPDATE
+                n = Cita.objects.filter(pk__in=ids, estado__in=ACTIVE_STATES).update(
+                    estado="no_asistio", actualizado_en=timezone.now()
+                )
+                # Un evento por lote en lugar de un post_save por fila
+                citas_no_show.send(
+                    sender=Cita,
+                    cita_ids=ids,
+                    dias={(servicio_id, fecha) for _, servicio_id, fecha in filas},
+                )
+            actualizadas += n
+            lotes += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Citas marcadas como no_asistio: {actualizadas} (lotes: {lotes})")
         )
-
-        actualizadas = qs.update(estado="no_asistio")
-        self.stdout.write(self.style.SUCCESS(f"Citas marcadas como no_asistio: {actualizadas}"))
@@ -0,0 +1,61 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from reservas.asignacion import optimizar_dia
+from reservas.models import Servicio
+
+
+class Command(BaseCommand):
+    help = (
+        "Reasigna las mesas de un día para compactar el plan tras cancelaciones. "
+        "No mueve citas completadas ni ya empezadas; reporta los minutos liberados y el tiempo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fecha",
+            type=str,
+            default=None,
+            help="Día a optimizar en formato YYYY-MM-DD (default hoy).",
+        )
+        parser.add_argument(
+            "--servicio",
+            type=int,
+            default=None,
+            help="Solo este servicio (default todos los que tengan mesas activas).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Calcula el plan nuevo y reporta la mejora sin guardar cambios.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            fecha = date.fromisoformat(options["fecha"]) if options["fecha"] else timezone.localdate()
+        except ValueError:
+            raise CommandError("Fecha inválida. Usa YYYY-MM-DD.")
+
+        servicios = Servicio.objects.filter(mesas__activa=True).distinct().order_by("id")
+        if options["servicio"]:
+            servicios = servicios.filter(pk=options["servicio"])
+
+        movidas = liberados = 0
+        segundos = 0.0
+        for servicio in servicios:
+            resultado = optimizar_dia(servicio, fecha, aplicar=not options["dry_run"])
+            self.stdout.write(resultado.resumen())
+            if resultado.aplicado or options["dry_run"]:
+                movidas += resultado.movidas
+                liberados += max(resultado.minutos_liberados, 0)
+            segundos += resultado.segundos
+
+        prefijo = "[dry-run] " if options["dry_run"] else ""
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{prefijo}Mesas optimizadas para {fecha}: {movidas} citas movidas, "
+                f"{liberados} min de huecos útiles liberados en {segundos:.2f}s"
+            )
+        )
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from reservas.outbox import purgar_procesados
+
+
+class Command(BaseCommand):
+    help = "Borra los eventos de la outbox ya procesados con más antigüedad que la retención."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dias",
+            type=int,
+            default=None,
+            help="Días de retención de eventos procesados (default OUTBOX_RETENCION_DIAS).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Eventos a borrar por DELETE (default 1000).",
+        )
+
+    def handle(self, *args, **options):
+        dias = options["dias"] if options["dias"] is not None else settings.OUTBOX_RETENCION_DIAS
+        borrados = purgar_procesados(max(0, dias), max(1, options["batch_size"]))
+        self.stdout.write(self.style.SUCCESS(f"Eventos de outbox purgados: {borrados} (procesados hace más de {dias} días)"))
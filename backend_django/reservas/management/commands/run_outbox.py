@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from reservas.outbox import procesar_lote
+
+
+class Command(BaseCommand):
+    help = "Procesa la outbox (correos y Google Calendar) en lotes con reintentos y backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="Eventos a procesar por lote (default 50).",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=5.0,
+            help="Segundos de espera cuando la cola está vacía (default 5).",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drena la cola una vez y termina (útil para cron o tests).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        total_ok = total_errores = 0
+
+        try:
+            while True:
+                close_old_connections()
+                ok, errores = procesar_lote(batch_size)
+                total_ok += ok
+                total_errores += errores
+                if ok or errores:
+                    self.stdout.write(f"Lote procesado: {ok} ok, {errores} con error.")
+
+                if ok + errores < batch_size:
+                    if options["once"]:
+                        break
+                    time.sleep(options["intervalo"])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Outbox procesada. Eventos ok: {total_ok}. Con error: {total_errores}.")
+        )
@@ -0,0 +1,68 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from reservas.scheduler import Job, adquirir_lease, ejecutar_vencidos, identificador_proceso, liberar_lease
+
+
+class Command(BaseCommand):
+    help = (
+        "Ejecuta en un solo proceso los comandos periódicos (recordatorios, no-shows, sync con Calendar) "
+        "según SCHEDULER_JOBS. Con varias réplicas solo corre la que tiene el lease de líder."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tick",
+            type=float,
+            default=5.0,
+            help="Segundos entre revisiones de jobs vencidos (default 5).",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Ejecuta una vez los jobs habilitados (si es líder) y termina.",
+        )
+
+    def handle(self, *args, **options):
+        jobs = [Job(comando, intervalo) for comando, intervalo in settings.SCHEDULER_JOBS.items() if intervalo > 0]
+        if not jobs:
+            self.stdout.write(self.style.WARNING("No hay jobs habilitados en SCHEDULER_JOBS."))
+            return
+
+        titular = identificador_proceso()
+        lease = timedelta(seconds=settings.SCHEDULER_LEASE_SEGUNDOS)
+        era_lider = False
+        self.stdout.write(
+            f"Scheduler {titular}: " + ", ".join(f"{job.comando} cada {job.intervalo}s" for job in jobs)
+        )
+
+        try:
+            while True:
+                close_old_connections()
+                lider = adquirir_lease(titular, lease)
+                if lider != era_lider:
+                    self.stdout.write(f"{'Es' if lider else 'Ya no es'} líder del scheduler.")
+                    if lider:
+                        # Al tomar el liderazgo no sabemos cuándo corrió el líder anterior
+                        for job in jobs:
+                            job.ultima_ejecucion = None
+                    era_lider = lider
+
+                if lider:
+                    renovar = lambda: adquirir_lease(titular, lease)  # noqa: E731
+                    latido = settings.SCHEDULER_LEASE_SEGUNDOS / 3
+                    for comando, duracion, resumen in ejecutar_vencidos(jobs, sigue_lider=renovar, latido=latido):
+                        self.stdout.write(f"[{comando}] {duracion:.2f}s {resumen}")
+
+                if options["once"]:
+                    break
+                time.sleep(options["tick"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if era_lider:
+                liberar_lease(titular)
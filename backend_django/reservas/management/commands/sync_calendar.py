@@ -1,24 +1,48 @@
 from django.core.management.base import BaseCommand
 
-from reservas.google_sync import resync_calendar_events
+from reservas.google_sync import BATCH_MAX, RESYNC_WORKERS, resync_calendar_events, sync_calendar_incremental
 
 
 class Command(BaseCommand):
-    help = "Resincroniza citas futuras con Google Calendar (crea las que falten y actualiza cambios)."
+    help = (
+        "Sincroniza con Google Calendar las citas futuras modificadas desde la última corrida "
+        "(usa --full para reenviar todas)."
+    )
 
     def add_arguments(self, parser):
         parser.add_argument(
             "--limit",
             type=int,
-            default=200,
-            help="Máximo de citas a procesar en esta ejecución (por defecto 200).",
+            default=None,
+            help="Máximo de citas a procesar en esta ejecución (por defecto 500; 200 con --full).",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Reenvía todas las citas futuras aunque no hayan cambiado.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_MAX,
+            help=f"Peticiones por lote HTTP a Calendar (máx. y por defecto {BATCH_MAX}).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=RESYNC_WORKERS,
+            help=f"Lotes en paralelo (por defecto {RESYNC_WORKERS}).",
         )
 
     def handle(self, *args, **options):
-        creados, actualizados = resync_calendar_events(limit=options["limit"])
+        sync = resync_calendar_events if options["full"] else sync_calendar_incremental
+        kwargs = {"batch_size": options["batch_size"], "workers": options["workers"]}
+        if options["limit"] is not None:
+            kwargs["limit"] = options["limit"]
+        creados, actualizados = sync(**kwargs)
 
         if creados == actualizados == 0:
-            self.stdout.write(self.style.WARNING("Sin acciones realizadas (¿faltan credenciales?)."))
+            self.stdout.write(self.style.WARNING("Sin cambios que sincronizar (o faltan credenciales)."))
             return
 
         self.stdout.write(
@@ -0,0 +1,133 @@
+"""
+Métricas HTTP en memoria del proceso, en formato de texto de Prometheus.
+
+MetricasMiddleware (reservas.middleware) registra por request la latencia,
+el número de consultas SQL y el tiempo en BD, agrupados por (vista, método,
+status). Cada observación es un bisect sobre los límites de los buckets y
+unas sumas bajo un lock, así que el costo por request es de microsegundos.
+
+Los valores son del worker que atiende el scrape (como los contadores de
+reservas.cache): con varios workers de gunicorn cada uno expone los suyos.
+"""
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left
+from dataclasses import dataclass, field
+
+# Límites superiores (le) de los buckets; el +Inf es implícito
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_CONSULTAS = (1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+# El método viene del cliente: fuera de estos se etiqueta "other" para no crear
+# una serie por cada verbo inventado
+METODOS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+
+PREFIJO = "sir_http_request"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@dataclass
+class Histograma:
+    limites: tuple
+    cuentas: list = field(default_factory=list)
+    suma: float = 0.0
+    total: int = 0
+
+    def __post_init__(self):
+        if not self.cuentas:
+            self.cuentas = [0] * (len(self.limites) + 1)
+
+    def observar(self, valor: float) -> None:
+        self.cuentas[bisect_left(self.limites, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+    def acumulado(self):
+        """(le, cuenta acumulada) incluyendo +Inf, como lo espera Prometheus."""
+        acumulado = 0
+        for limite, cuenta in zip(self.limites + ("+Inf",), self.cuentas):
+            acumulado += cuenta
+            yield limite, acumulado
+
+
+@dataclass
+class SerieRuta:
+    duracion: Histograma = field(default_factory=lambda: Histograma(BUCKETS_SEGUNDOS))
+    consultas: Histograma = field(default_factory=lambda: Histograma(BUCKETS_CONSULTAS))
+    segundos_bd: float = 0.0
+
+
+_lock = threading.Lock()
+_series: dict[tuple[str, str, str], SerieRuta] = {}
+
+
+def observar(vista: str, metodo: str, status: int, segundos: float, consultas: int, segundos_bd: float) -> None:
+    clave = (vista, metodo if metodo in METODOS else "other", str(status))
+    with _lock:
+        serie = _series.get(clave)
+        if serie is None:
+            serie = _series[clave] = SerieRuta()
+        serie.duracion.observar(segundos)
+        serie.consultas.observar(consultas)
+        serie.segundos_bd += segundos_bd
+
+
+def reiniciar() -> None:
+    with _lock:
+        _series.clear()
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _etiquetas(clave: tuple[str, str, str], **extra) -> str:
+    vista, metodo, status = clave
+    pares = [("view", vista), ("method", metodo), ("status", status), *extra.items()]
+    return ",".join(f'{nombre}="{_escapar(str(valor))}"' for nombre, valor in pares)
+
+
+def _numero(valor) -> str:
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def _histograma(lineas: list[str], nombre: str, series: dict, atributo: str) -> None:
+    for clave, serie in series.items():
+        histograma = getattr(serie, atributo)
+        for limite, acumulado in histograma.acumulado():
+            lineas.append(f"{nombre}_bucket{{{_etiquetas(clave, le=_numero(limite))}}} {acumulado}")
+        lineas.append(f"{nombre}_sum{{{_etiquetas(clave)}}} {_numero(histograma.suma)}")
+        lineas.append(f"{nombre}_count{{{_etiquetas(clave)}}} {histograma.total}")
+
+
+def exportar() -> str:
+    """Todas las series en formato de exposición de texto de Prometheus."""
+    with _lock:
+        # Copia consistente; el formateo ocurre fuera del lock
+        series = {
+            clave: SerieRuta(
+                duracion=Histograma(BUCKETS_SEGUNDOS, list(s.duracion.cuentas), s.duracion.suma, s.duracion.total),
+                consultas=Histograma(BUCKETS_CONSULTAS, list(s.consultas.cuentas), s.consultas.suma, s.consultas.total),
+                segundos_bd=s.segundos_bd,
+            )
+            for clave, s in sorted(_series.items())
+        }
+
+    lineas = [
+        f"# HELP {PREFIJO}_duration_seconds Latencia de la request por vista.",
+        f"# TYPE {PREFIJO}_duration_seconds histogram",
+    ]
+    _histograma(lineas, f"{PREFIJO}_duration_seconds", series, "duracion")
+    lineas += [
+        f"# HELP {PREFIJO}_db_queries Consultas SQL por request.",
+        f"# TYPE {PREFIJO}_db_queries histogram",
+    ]
+    _histograma(lineas, f"{PREFIJO}_db_queries", series, "consultas")
+    lineas += [
+        f"# HELP {PREFIJO}_db_seconds_total Tiempo acumulado en la BD por vista.",
+        f"# TYPE {PREFIJO}_db_seconds_total counter",
+    ]
+    for clave, serie in series.items():
+        lineas.append(f"{PREFIJO}_db_seconds_total{{{_etiquetas(clave)}}} {_numero(serie.segundos_bd)}")
+    return "\n".join(lineas) + "\n"
@@ -0,0 +1,60 @@
+import time as _time
+
+from django.db import connection
+
+from . import metricas
+
+SIN_RUTA = "<sin_ruta>"
+
+
+class _ContadorConsultas:
+    """execute_wrapper que cuenta consultas y tiempo en BD de una request."""
+
+    __slots__ = ("consultas", "segundos")
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = _time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.segundos += _time.perf_counter() - inicio
+            self.consultas += 1
+
+
+class MetricasMiddleware:
+    """
+    Mide latencia, consultas y tiempo en BD por request y los agrega por vista
+    en reservas.metricas (expuestos en /api/metrics/). Se activa con
+    METRICAS_HABILITADAS=true; va primero en MIDDLEWARE para medir todo el stack.
+
+    La etiqueta es el nombre de la vista resuelta (p. ej. "cita-list"), no la
+    URL, para que la cardinalidad no crezca con los ids.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        contador = _ContadorConsultas()
+        inicio = _time.perf_counter()
+        status = 500
+        try:
+            with connection.execute_wrapper(contador):
+                response = self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            match = getattr(request, "resolver_match", None)
+            vista = (match.view_name or match.route) if match else SIN_RUTA
+            metricas.observar(
+                vista,
+                request.method,
+                status,
+                _time.perf_counter() - inicio,
+                contador.consultas,
+                contador.segundos,
+            )
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 04:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0005_alter_mesa_tipo'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['servicio', 'fecha', 'estado', 'hora_inicio'], name='cita_servicio_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['estado', 'fecha', 'recordatorio_enviado'], name='cita_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['negocio', 'email'], name='cliente_negocio_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['negocio', 'telefono'], name='cliente_negocio_tel_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mesa',
+            index=models.Index(fields=['servicio', 'activa'], name='mesa_servicio_activa_idx'),
+        ),
+    ]
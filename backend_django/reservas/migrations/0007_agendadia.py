@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-18 05:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0006_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgendaDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('servicio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='agenda_dias', to='reservas.servicio')),
+            ],
+            options={
+                'unique_together': {('servicio', 'fecha')},
+            },
+        ),
+    ]
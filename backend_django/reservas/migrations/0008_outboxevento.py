@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-18 05:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0007_agendadia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('email', 'Correo'), ('calendar_sync', 'Sincronizar con Calendar'), ('calendar_delete', 'Eliminar de Calendar')], max_length=30)),
+                ('payload', models.JSONField(default=dict)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesado', 'Procesado'), ('fallido', 'Fallido')], default='pendiente', max_length=20)),
+                ('intentos', models.PositiveIntegerField(default=0)),
+                ('disponible_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ultimo_error', models.TextField(blank=True)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('procesado_en', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['estado', 'disponible_en'], name='outbox_estado_disp_idx')],
+            },
+        ),
+    ]
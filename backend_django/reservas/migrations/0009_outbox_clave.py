@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0008_outboxevento'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxevento',
+            name='clave',
+            field=models.CharField(blank=True, max_length=150, null=True, unique=True),
+        ),
+    ]
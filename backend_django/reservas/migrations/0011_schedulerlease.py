@@ -0,0 +1,22 @@
+# Generated by Django 6.0 on 2026-10-18 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0010_calendar_sync_incremental'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SchedulerLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100, unique=True)),
+                ('titular', models.CharField(max_length=150)),
+                ('expira_en', models.DateTimeField()),
+            ],
+        ),
+    ]
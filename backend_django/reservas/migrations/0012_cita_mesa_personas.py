@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-18 11:20
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0011_schedulerlease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cita',
+            name='mesa',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='citas', to='reservas.mesa'),
+        ),
+        migrations.AddField(
+            model_name='cita',
+            name='personas',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['mesa', 'fecha'], name='cita_mesa_fecha_idx'),
+        ),
+    ]
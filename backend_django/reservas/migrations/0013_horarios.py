@@ -0,0 +1,45 @@
+# Generated by Django 6.0 on 2026-10-18 12:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0012_cita_mesa_personas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiaEspecial',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('cerrado', models.BooleanField(default=True)),
+                ('apertura', models.TimeField(blank=True, null=True)),
+                ('cierre', models.TimeField(blank=True, null=True)),
+                ('motivo', models.CharField(blank=True, max_length=150)),
+                ('negocio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dias_especiales', to='reservas.negocio')),
+            ],
+            options={
+                'ordering': ['negocio', 'fecha'],
+                'unique_together': {('negocio', 'fecha')},
+            },
+        ),
+        migrations.CreateModel(
+            name='HorarioSemanal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia_semana', models.PositiveSmallIntegerField(choices=[(0, 'Lunes'), (1, 'Martes'), (2, 'Miércoles'), (3, 'Jueves'), (4, 'Viernes'), (5, 'Sábado'), (6, 'Domingo')])),
+                ('apertura', models.TimeField(blank=True, null=True)),
+                ('cierre', models.TimeField(blank=True, null=True)),
+                ('cerrado', models.BooleanField(default=False)),
+                ('negocio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='horarios', to='reservas.negocio')),
+            ],
+            options={
+                'ordering': ['negocio', 'dia_semana'],
+                'unique_together': {('negocio', 'dia_semana')},
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-18 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0013_horarios'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['fecha', 'hora_inicio', 'id'], name='cita_fecha_hora_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['creado_en', 'id'], name='cliente_creado_id_idx'),
+        ),
+    ]
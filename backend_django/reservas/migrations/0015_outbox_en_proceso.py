@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 14:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0014_indices_paginacion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='outboxevento',
+            name='estado',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('en_proceso', 'En proceso'), ('procesado', 'Procesado'), ('fallido', 'Fallido')], default='pendiente', max_length=20),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-18 14:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0015_outbox_en_proceso'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='cita',
+            name='cita_actualizado_idx',
+        ),
+        migrations.AddField(
+            model_name='syncwatermark',
+            name='ultimo_pk',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['actualizado_en', 'id'], name='cita_actualizado_id_idx'),
+        ),
+    ]
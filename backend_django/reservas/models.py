@@ -1,5 +1,8 @@
 from django.db import models
+from django.core.exceptions import ValidationError
+from django.core.validators import MinValueValidator
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 
 class Negocio(models.Model):
@@ -34,8 +37,82 @@ class Cliente(models.Model):
     telefono = models.CharField(max_length=20, blank=True)
     creado_en = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Búsqueda de cliente existente en la reserva pública (por email o teléfono)
+            models.Index(fields=["negocio", "email"], name="cliente_negocio_email_idx"),
+            models.Index(fields=["negocio", "telefono"], name="cliente_negocio_tel_idx"),
+            # Paginación por cursor del listado de clientes
+            models.Index(fields=["creado_en", "id"], name="cliente_creado_id_idx"),
+        ]
+
     def __str__(self):
         return f"{self.nombre} - {self.negocio.nombre}"
+
+
+class HorarioSemanal(models.Model):
+    """
+    Horario de un día de la semana para un negocio. Los días sin fila usan el
+    horario por defecto (13:00–23:00, jueves cerrado); ver reservas.horarios.
+    """
+    DIA_CHOICES = [
+        (0, "Lunes"),
+        (1, "Martes"),
+        (2, "Miércoles"),
+        (3, "Jueves"),
+        (4, "Viernes"),
+        (5, "Sábado"),
+        (6, "Domingo"),
+    ]
+
+    negocio = models.ForeignKey(Negocio, on_delete=models.CASCADE, related_name="horarios")
+    dia_semana = models.PositiveSmallIntegerField(choices=DIA_CHOICES)
+    apertura = models.TimeField(null=True, blank=True)
+    cierre = models.TimeField(null=True, blank=True)
+    cerrado = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ("negocio", "dia_semana")
+        ordering = ["negocio", "dia_semana"]
+
+    def clean(self):
+        _validar_intervalo(self.cerrado, self.apertura, self.cierre)
+
+    def __str__(self):
+        horas = "cerrado" if self.cerrado else f"{self.apertura:%H:%M}-{self.cierre:%H:%M}"
+        return f"{self.negocio.nombre} {self.get_dia_semana_display()}: {horas}"
+
+
+class DiaEspecial(models.Model):
+    """Fecha con horario distinto al semanal (festivo, evento) o cerrada."""
+    negocio = models.ForeignKey(Negocio, on_delete=models.CASCADE, related_name="dias_especiales")
+    fecha = models.DateField()
+    cerrado = models.BooleanField(default=True)
+    apertura = models.TimeField(null=True, blank=True)
+    cierre = models.TimeField(null=True, blank=True)
+    motivo = models.CharField(max_length=150, blank=True)
+
+    class Meta:
+        unique_together = ("negocio", "fecha")
+        ordering = ["negocio", "fecha"]
+
+    def clean(self):
+        _validar_intervalo(self.cerrado, self.apertura, self.cierre)
+
+    def __str__(self):
+        horas = "cerrado" if self.cerrado else f"{self.apertura:%H:%M}-{self.cierre:%H:%M}"
+        return f"{self.negocio.nombre} {self.fecha}: {horas}"
+
+
+def _validar_intervalo(cerrado, apertura, cierre):
+    if cerrado:
+        return
+    if apertura is None or cierre is None:
+        raise ValidationError("Indica apertura y cierre, o marca el día como cerrado.")
+    if cierre <= apertura:
+        raise ValidationError("El cierre debe ser posterior a la apertura.")
+
+
 class Mesa(models.Model):
     TIPO_CHOICES = [
         ("normal_2", "Normal 2 personas"),
@@ -56,6 +133,17 @@ class Mesa(models.Model):
     class Meta:
         unique_together = ("negocio", "nombre")
         ordering = ["negocio", "nombre"]
+        indexes = [
+            # Conteo de mesas activas por servicio (capacidad)
+            models.Index(fields=["servicio", "activa"], name="mesa_servicio_activa_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Valores originales para detectar cambios en señales (p.ej. activa/servicio)
+        instance._valores_cargados = dict(zip(field_names, values))
+        return instance
 
     def __str__(self):
         return f"{self.nombre} ({self.negocio.nombre})"
@@ -73,6 +161,9 @@ class Cita(models.Model):
     negocio = models.ForeignKey(Negocio, on_delete=models.CASCADE, related_name='citas')
     servicio = models.ForeignKey(Servicio, on_delete=models.PROTECT, related_name='citas')
     cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='citas')
+    # Mesa concreta asignada por reservas.asignacion (vacía en citas anteriores al motor)
+    mesa = models.ForeignKey(Mesa, on_delete=models.SET_NULL, null=True, blank=True, related_name='citas')
+    personas = models.PositiveSmallIntegerField(null=True, blank=True, validators=[MinValueValidator(1)])
     fecha = models.DateField()
     hora_inicio = models.TimeField()
     hora_fin = models.TimeField()
@@ -81,14 +172,54 @@ class Cita(models.Model):
     creado_en = models.DateTimeField(auto_now_add=True)
     recordatorio_enviado = models.BooleanField(default=False)
     event_id = models.CharField(max_length=150, blank=True, null=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+    # Huella del último cuerpo enviado a Calendar: si no cambia, no se vuelve a enviar
+    calendar_hash = models.CharField(max_length=64, blank=True, default="")
+    calendar_synced_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         unique_together = ('negocio', 'fecha', 'hora_inicio', 'servicio', 'cliente')
+        indexes = [
+            # Disponibilidad, solapes en CitaSerializer.validate y disponibilidad de mesas
+            models.Index(fields=["servicio", "fecha", "estado", "hora_inicio"], name="cita_servicio_fecha_idx"),
+            # Comandos de recordatorios y no-show
+            models.Index(fields=["estado", "fecha", "recordatorio_enviado"], name="cita_estado_fecha_idx"),
+            # Sync incremental con Calendar (citas modificadas desde la marca de agua)
+            models.Index(fields=["actualizado_en", "id"], name="cita_actualizado_id_idx"),
+            # Intervalos ocupados por (mesa, fecha) para el motor de asignación
+            models.Index(fields=["mesa", "fecha"], name="cita_mesa_fecha_idx"),
+            # Paginación por cursor del listado de citas
+            models.Index(fields=["fecha", "hora_inicio", "id"], name="cita_fecha_hora_id_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Valores originales para invalidar también el día/servicio previo al mover una cita
+        instance._valores_cargados = dict(zip(field_names, values))
+        return instance
 
     def __str__(self):
         return f"{self.cliente.nombre} - {self.servicio.nombre} ({self.fecha} {self.hora_inicio})"
 
 
+class AgendaDia(models.Model):
+    """
+    Fila de control por (servicio, fecha). Las reservas que compiten por el mismo
+    día la bloquean con select_for_update para validar capacidad y escribir en serie.
+    La capacidad se valida contra las citas activas, no contra un contador aquí.
+    """
+    servicio = models.ForeignKey(Servicio, on_delete=models.CASCADE, related_name="agenda_dias")
+    fecha = models.DateField()
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("servicio", "fecha")
+
+    def __str__(self):
+        return f"{self.servicio.nombre} {self.fecha}"
+
+
 class CalendarCredential(models.Model):
     nombre = models.CharField(max_length=150, default="default")
     calendar_id = models.CharField(max_length=255, default="primary")
@@ -98,3 +229,68 @@ class CalendarCredential(models.Model):
 
     def __str__(self):
         return f"Calendar {self.calendar_id} ({self.nombre})"
+
+
+class SyncWatermark(models.Model):
+    """
+    Marca de agua de procesos incrementales (p. ej. sync con Calendar): hasta
+    qué (`actualizado_en`, pk) ya se procesó. El pk desempata filas con el mismo
+    `actualizado_en` (updates masivos, backfills).
+    """
+    nombre = models.CharField(max_length=100, unique=True)
+    valor = models.DateTimeField()
+    ultimo_pk = models.BigIntegerField(default=0)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.nombre}: {self.valor} (pk {self.ultimo_pk})"
+
+
+class SchedulerLease(models.Model):
+    """
+    Lease de liderazgo para `run_scheduler`: solo la réplica titular con el lease
+    vigente ejecuta los jobs; se renueva con un UPDATE condicional.
+    """
+    nombre = models.CharField(max_length=100, unique=True)
+    titular = models.CharField(max_length=150)
+    expira_en = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.nombre} → {self.titular} (hasta {self.expira_en})"
+
+
+class OutboxEvento(models.Model):
+    """
+    Trabajo pendiente fuera del request (correo, Google Calendar).
+    Se escribe en la misma transacción que la cita y lo drena `manage.py run_outbox`.
+    """
+    TIPO_CHOICES = [
+        ("email", "Correo"),
+        ("calendar_sync", "Sincronizar con Calendar"),
+        ("calendar_delete", "Eliminar de Calendar"),
+    ]
+    ESTADO_CHOICES = [
+        ("pendiente", "Pendiente"),
+        ("en_proceso", "En proceso"),
+        ("procesado", "Procesado"),
+        ("fallido", "Fallido"),
+    ]
+
+    tipo = models.CharField(max_length=30, choices=TIPO_CHOICES)
+    # Clave de idempotencia opcional (p. ej. una notificación por cita y cambio)
+    clave = models.CharField(max_length=150, unique=True, null=True, blank=True)
+    payload = models.JSONField(default=dict)
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default="pendiente")
+    intentos = models.PositiveIntegerField(default=0)
+    disponible_en = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    procesado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["estado", "disponible_en"], name="outbox_estado_disp_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} #{self.pk} ({self.estado})"
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Optional
+
+
+class OccupancyProfile:
+    """
+    Perfil de ocupación de un día para un servicio.
+
+    Ordena las citas una sola vez y precalcula sumas prefijas por minuto para
+    responder en O(1) cuántas citas se solapan con un intervalo, y con bisect
+    el fin de la cita anterior / inicio de la siguiente. Construcción en
+    O(n log n + minutos del día) en lugar de recorrer todas las citas por slot.
+
+    Todas las horas se expresan en minutos desde medianoche; los intervalos
+    son semiabiertos [inicio, fin).
+    """
+
+    def __init__(self, bookings: Iterable[tuple[int, int]], open_min: int, close_min: int):
+        bookings = list(bookings)
+        self.open_min = open_min
+        self.close_min = close_min
+        self.starts = sorted(h_ini for h_ini, _ in bookings)
+        self.ends = sorted(h_fin for _, h_fin in bookings)
+
+        # Ventana cubierta por las sumas prefijas (incluye citas fuera de horario)
+        self._lo = min(open_min, self.starts[0]) if self.starts else open_min
+        self._hi = max(close_min, self.ends[-1]) if self.ends else close_min
+        size = self._hi - self._lo + 1
+
+        # starts_lt[i] = citas con inicio < lo + i ; ends_le[i] = citas con fin <= lo + i
+        starts_hist = [0] * (size + 1)
+        ends_hist = [0] * size
+        for h_ini in self.starts:
+            starts_hist[h_ini - self._lo + 1] += 1
+        for h_fin in self.ends:
+            ends_hist[h_fin - self._lo] += 1
+
+        self._starts_lt = [0] * size
+        self._ends_le = [0] * size
+        acc_starts = acc_ends = 0
+        for i in range(size):
+            acc_starts += starts_hist[i]
+            acc_ends += ends_hist[i]
+            self._starts_lt[i] = acc_starts
+            self._ends_le[i] = acc_ends
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def overlapping(self, start: int, end: int) -> int:
+        """
+        Número de citas que se solapan con [start, end).
+        Es la regla de capacidad vigente: se compara contra las mesas activas.
+        """
+        if start < self._lo or end > self._hi:
+            # Fuera de la ventana precalculada: bisect sigue siendo O(log n)
+            return bisect_left(self.starts, end) - bisect_right(self.ends, start)
+        return self._starts_lt[end - self._lo] - self._ends_le[start - self._lo]
+
+    def concurrency_at(self, minute: int) -> int:
+        """Citas activas en el minuto indicado."""
+        if minute < self._lo or minute >= self._hi:
+            return 0
+        i = minute - self._lo
+        return self._starts_lt[i + 1] - self._ends_le[i]
+
+    def max_concurrency(self, start: int, end: int) -> int:
+        """Pico de citas simultáneas dentro de [start, end)."""
+        return max((self.concurrency_at(m) for m in range(start, end)), default=0)
+
+    def prev_end(self, start: int, default: int) -> int:
+        """Fin más tardío de una cita que termina en o antes de start."""
+        idx = bisect_right(self.ends, start)
+        return self.ends[idx - 1] if idx else default
+
+    def next_start(self, end: int, default: int) -> int:
+        """Inicio más temprano de una cita que empieza en o después de end."""
+        idx = bisect_left(self.starts, end)
+        return self.starts[idx] if idx < len(self.starts) else default
+
+    def free_slots(self, duracion: int, capacidad: int, step: int) -> list[tuple[int, int]]:
+        """
+        Slots [inicio, fin) cada `step` minutos dentro del horario cuyo número
+        de citas solapadas no alcanza la capacidad.
+        """
+        last_start = self.close_min - duracion
+        if capacidad <= 0 or last_start < self.open_min:
+            return []
+        return [
+            (start, start + duracion)
+            for start in range(self.open_min, last_start + 1, step)
+            if self.overlapping(start, start + duracion) < capacidad
+        ]
+
+    def best_gap(
+        self,
+        duracion: int,
+        capacidad: int,
+        step: int,
+        prefer_min: Optional[int] = None,
+        start_min: Optional[int] = None,
+    ) -> Optional[tuple[int, int]]:
+        """
+        Mejor slot libre minimizando tiempos muertos (hueco antes + hueco después)
+        y, si hay preferencia, la distancia a la hora preferida.
+        """
+        last_start = self.close_min - duracion
+        if capacidad <= 0 or last_start < self.open_min:
+            return None
+
+        first = self.open_min if start_min is None else start_min
+        best_score = None
+        best_slot = None
+        for start in range(first, last_start + 1, step):
+            end = start + duracion
+            if self.overlapping(start, end) >= capacidad:
+                continue
+
+            idle_before = start - self.prev_end(start, self.open_min)
+            idle_after = self.next_start(end, self.close_min) - end
+            score = idle_before + idle_after
+            if prefer_min is not None:
+                score += abs(start - prefer_min) * 0.5
+
+            if best_score is None or score < best_score:
+                best_score = score
+                best_slot = (start, end)
+
+        return best_slot
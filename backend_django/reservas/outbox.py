@@ -0,0 +1,178 @@
+"""
+Outbox en BD para el trabajo lento que no debe bloquear un worker de gunicorn
+(SMTP, Google Calendar). Las vistas/señales solo insertan filas OutboxEvento
+dentro de su transacción; `manage.py run_outbox` las procesa en lotes con
+reintentos y backoff exponencial.
+
+Cada lote se reclama en una transacción corta (estado "en_proceso" con un lease
+en `disponible_en`) y los handlers corren fuera de ella: no se sostienen locks
+de fila durante SMTP/Calendar, y cada resultado se guarda por separado, así un
+error de un evento no deshace lo ya registrado de los demás. Si el worker muere
+a mitad del lote, los eventos vuelven a tomarse al vencer el lease.
+"""
+import logging
+from datetime import timedelta
+
+from django.core.mail import send_mail
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Cita, OutboxEvento
+
+logger = logging.getLogger(__name__)
+
+MAX_INTENTOS = 8
+BACKOFF_BASE_SEGUNDOS = 30
+BACKOFF_MAX_SEGUNDOS = 3600
+LEASE_SEGUNDOS = 300
+
+
+class ReintentarMasTarde(Exception):
+    """El handler no pudo completar el trabajo y debe reintentarse."""
+
+
+def encolar(tipo: str, payload: dict, clave: str | None = None) -> OutboxEvento:
+    """
+    Registra un evento. Con `clave` es idempotente: si ya existe un evento con esa
+    clave no se crea otro (el índice único lo garantiza también entre procesos).
+    """
+    if clave is None:
+        return OutboxEvento.objects.create(tipo=tipo, payload=payload)
+    evento, _ = OutboxEvento.objects.get_or_create(clave=clave, defaults={"tipo": tipo, "payload": payload})
+    return evento
+
+
+def encolar_correo(
+    subject: str, body: str, destinatarios: list[str], clave: str | None = None
+) -> OutboxEvento | None:
+    destinatarios = list(dict.fromkeys(d for d in destinatarios if d))  # evita duplicados
+    if not destinatarios:
+        return None
+    return encolar("email", {"subject": subject, "body": body, "to": destinatarios}, clave=clave)
+
+
+def _enviar_correo(payload: dict) -> None:
+    send_mail(
+        subject=payload["subject"],
+        message=payload["body"],
+        from_email=None,  # usa DEFAULT_FROM_EMAIL
+        recipient_list=payload["to"],
+        fail_silently=False,
+    )
+
+
+def _sincronizar_calendar(payload: dict) -> None:
+    from .google_sync import sync_cita_to_calendar
+
+    cita = Cita.objects.select_related("cliente", "servicio").filter(pk=payload["cita_id"]).first()
+    if cita is None:
+        return  # la cita se borró después de encolar; no hay nada que sincronizar
+    if not sync_cita_to_calendar(cita):
+        raise ReintentarMasTarde(f"Calendar no sincronizó la cita {cita.pk}")
+
+
+def _eliminar_calendar(payload: dict) -> None:
+    from .google_sync import delete_event_from_calendar
+
+    if not delete_event_from_calendar(payload.get("event_id"), payload.get("negocio_id")):
+        raise ReintentarMasTarde(f"Calendar no eliminó el evento {payload.get('event_id')}")
+
+
+HANDLERS = {
+    "email": _enviar_correo,
+    "calendar_sync": _sincronizar_calendar,
+    "calendar_delete": _eliminar_calendar,
+}
+
+
+def _backoff(intentos: int) -> timedelta:
+    return timedelta(seconds=min(BACKOFF_BASE_SEGUNDOS * 2 ** (intentos - 1), BACKOFF_MAX_SEGUNDOS))
+
+
+def _reclamar(batch_size: int) -> list[OutboxEvento]:
+    """
+    Toma hasta `batch_size` eventos vencidos (pendientes o con lease vencido) y
+    los marca "en_proceso" con un lease, contando ya el intento. La transacción
+    solo dura el SELECT + UPDATE; con skip_locked varios workers pueden
+    reclamar a la vez sin pisarse (en SQLite se asume un solo worker).
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        qs = OutboxEvento.objects.filter(
+            estado__in=("pendiente", "en_proceso"), disponible_en__lte=ahora
+        ).order_by("id")
+        if connection.features.has_select_for_update_skip_locked:
+            qs = qs.select_for_update(skip_locked=True)
+        ids = list(qs.values_list("id", flat=True)[:batch_size])
+        OutboxEvento.objects.filter(pk__in=ids).update(
+            estado="en_proceso",
+            disponible_en=ahora + timedelta(seconds=LEASE_SEGUNDOS),
+            intentos=F("intentos") + 1,
+        )
+    return list(OutboxEvento.objects.filter(pk__in=ids).order_by("id"))
+
+
+def _procesar(evento: OutboxEvento) -> bool:
+    try:
+        # Sin transacción: el handler hace SMTP/HTTP y sus escrituras se confirman solas
+        HANDLERS[evento.tipo](evento.payload)
+    except Exception as exc:  # noqa: BLE001
+        evento.ultimo_error = str(exc)[:2000]
+        if evento.intentos >= MAX_INTENTOS:
+            evento.estado = "fallido"
+            logger.error("Outbox %s descartado tras %s intentos: %s", evento.pk, evento.intentos, exc)
+        else:
+            evento.estado = "pendiente"
+            evento.disponible_en = timezone.now() + _backoff(evento.intentos)
+            logger.warning("Outbox %s falló (intento %s): %s", evento.pk, evento.intentos, exc)
+        evento.save(update_fields=["ultimo_error", "estado", "disponible_en"])
+        return False
+
+    evento.estado = "procesado"
+    evento.procesado_en = timezone.now()
+    evento.ultimo_error = ""
+    evento.save(update_fields=["ultimo_error", "estado", "procesado_en"])
+    return True
+
+
+def procesar_lote(batch_size: int = 50) -> tuple[int, int]:
+    """
+    Procesa hasta `batch_size` eventos vencidos. Devuelve (ok, con_error).
+    Los handlers corren fuera de la transacción que reclama el lote y cada
+    resultado se guarda en la suya.
+    """
+    ok = errores = 0
+    for evento in _reclamar(batch_size):
+        if _procesar(evento):
+            ok += 1
+        else:
+            errores += 1
+    return ok, errores
+
+
+def procesar_pendientes(batch_size: int = 50) -> tuple[int, int]:
+    """Drena la cola completa (útil en tests y en el worker tras un atraso)."""
+    total_ok = total_errores = 0
+    while True:
+        ok, errores = procesar_lote(batch_size)
+        total_ok += ok
+        total_errores += errores
+        if ok + errores < batch_size:
+            return total_ok, total_errores
+
+
+def purgar_procesados(dias: int, batch_size: int = 1000) -> int:
+    """
+    Borra por lotes los eventos procesados hace más de `dias` días. Los fallidos
+    se conservan para revisarlos. Devuelve cuántos se borraron.
+    """
+    limite = timezone.now() - timedelta(days=dias)
+    qs = OutboxEvento.objects.filter(estado="procesado", procesado_en__lt=limite).order_by("pk")
+    total = 0
+    while True:
+        # DELETE por pk en lotes: sin transacciones largas sobre la tabla que escribe cada reserva
+        ids = list(qs.values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return total
+        total += OutboxEvento.objects.filter(pk__in=ids).delete()[0]
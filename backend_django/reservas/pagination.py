@@ -0,0 +1,167 @@
+"""
+Paginación por cursor (keyset) para listados grandes.
+
+La posición del cursor guarda los valores de *todas* las columnas del orden del
+queryset (más ``id`` como desempate), así que cada página es un
+``WHERE (a, b, id) < (x, y, z) ORDER BY a, b, id LIMIT n`` que usa el índice
+compuesto: el costo no depende de cuántas filas haya antes de la página, a
+diferencia de ``OFFSET`` o del cursor de DRF (que solo guarda la primera
+columna y salta empates con offset).
+
+Respeta ``?ordering=`` de ``OrderingFilter``: el orden se lee del queryset ya
+filtrado, por lo que siempre es determinista gracias al ``id``.
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from typing import Any, Optional
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = "cursor"
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+    # Orden por defecto si el queryset no trae order_by
+    ordering: tuple[str, ...] = ("-id",)
+    invalid_cursor_message = "Cursor inválido."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self._ordering(queryset)
+        model = queryset.model
+
+        cursor = self._decode_cursor(request, model)
+        atras = cursor is not None and cursor[0] == "p"
+        orden = [self._invertir(campo) for campo in self.ordering] if atras else list(self.ordering)
+        queryset = queryset.order_by(*orden)
+        if cursor is not None:
+            queryset = queryset.filter(self._despues_de(orden, cursor[1]))
+
+        filas = list(queryset[: self.page_size + 1])
+        hay_mas = len(filas) > self.page_size
+        self.page = filas[: self.page_size]
+        if atras:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, hay_mas
+        else:
+            self.has_next, self.has_previous = hay_mas, cursor is not None
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_page_size(self, request) -> int:
+        valor = request.query_params.get(self.page_size_query_param)
+        try:
+            tamano = int(valor) if valor else self.page_size
+        except ValueError:
+            return self.page_size
+        return max(1, min(tamano, self.max_page_size))
+
+    def get_next_link(self) -> Optional[str]:
+        if not self.has_next or not self.page:
+            return None
+        return self._link("n", self.page[-1])
+
+    def get_previous_link(self) -> Optional[str]:
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self._link("p", self.page[0])
+
+    # --- internos ---
+
+    def _ordering(self, queryset) -> tuple[str, ...]:
+        campos = [campo for campo in queryset.query.order_by if isinstance(campo, str)]
+        if not campos:
+            campos = list(self.ordering)
+        nombres = {campo.lstrip("-") for campo in campos}
+        if not nombres & {"id", "pk"}:
+            # Desempate estable en la misma dirección que la primera columna
+            campos.append("-id" if campos[0].startswith("-") else "id")
+        return tuple(campos)
+
+    @staticmethod
+    def _invertir(campo: str) -> str:
+        return campo[1:] if campo.startswith("-") else f"-{campo}"
+
+    @staticmethod
+    def _despues_de(orden: list[str], valores: list[Any]) -> Q:
+        """(a, b, c) estrictamente después de (x, y, z) según el orden de cada columna."""
+        condicion = Q()
+        iguales = Q()
+        for campo, valor in zip(orden, valores):
+            nombre = campo.lstrip("-")
+            operador = "lt" if campo.startswith("-") else "gt"
+            condicion |= iguales & Q(**{f"{nombre}__{operador}": valor})
+            iguales &= Q(**{nombre: valor})
+        return condicion
+
+    def _link(self, direccion: str, instancia) -> str:
+        valores = []
+        for campo in self.ordering:
+            valor = getattr(instancia, "pk" if campo.lstrip("-") == "pk" else campo.lstrip("-"))
+            valores.append(valor.isoformat() if hasattr(valor, "isoformat") else valor)
+        token = json.dumps([direccion, valores], separators=(",", ":"), default=str)
+        cursor = base64.urlsafe_b64encode(token.encode()).decode().rstrip("=")
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def _decode_cursor(self, request, model) -> Optional[tuple[str, list[Any]]]:
+        crudo = request.query_params.get(self.cursor_query_param)
+        if not crudo:
+            return None
+        try:
+            token = base64.urlsafe_b64decode(crudo + "=" * (-len(crudo) % 4)).decode()
+            direccion, valores = json.loads(token)
+            if direccion not in ("n", "p") or len(valores) != len(self.ordering):
+                raise ValueError
+            valores = [
+                model._meta.pk.to_python(valor)
+                if campo.lstrip("-") == "pk"
+                else model._meta.get_field(campo.lstrip("-")).to_python(valor)
+                for campo, valor in zip(self.ordering, valores)
+            ]
+        except (TypeError, ValueError, UnicodeDecodeError, binascii.Error, FieldDoesNotExist, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return direccion, valores
+
+
+class CitaPagination(KeysetPagination):
+    ordering = ("-fecha", "-hora_inicio", "-id")
+
+
+class ClientePagination(KeysetPagination):
+    ordering = ("-creado_en", "-id")
@@ -0,0 +1,75 @@
+"""
+Render rápido de slots de disponibilidad.
+
+Las vistas de agenda arman el JSON de los slots directamente como texto,
+usando una tabla precalculada de "HH:MM" para los 1440 minutos del día (sin
+``strftime`` ni dicts intermedios), y lo entregan como bytes: el renderer los
+deja pasar sin volver a codificarlos. La salida es idéntica byte a byte a la
+de ``JSONRenderer`` (compacto, sin espacios).
+
+Con ``?format=compact`` (override de formato de DRF) los slots se devuelven
+como pares ``[inicio, fin]`` en minutos desde medianoche.
+"""
+from __future__ import annotations
+
+from datetime import date, time
+from typing import Iterable
+
+from rest_framework.renderers import JSONRenderer
+
+_HHMM = tuple(f"{m // 60:02d}:{m % 60:02d}" for m in range(24 * 60))
+
+
+class JSONPrecalculadoRenderer(JSONRenderer):
+    """JSONRenderer que entrega tal cual el contenido ya serializado (bytes)."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, (bytes, bytearray)):
+            return bytes(data)
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+class SlotsCompactosRenderer(JSONPrecalculadoRenderer):
+    """Seleccionado con ?format=compact; la vista arma los slots como pares de minutos."""
+
+    format = "compact"
+
+
+def es_compacto(request) -> bool:
+    renderer = getattr(request, "accepted_renderer", None)
+    return renderer is not None and renderer.format == SlotsCompactosRenderer.format
+
+
+def _minutos(t: time) -> int:
+    return t.hour * 60 + t.minute
+
+
+def _slots_texto(slots: Iterable[tuple[time, time]], compacto: bool) -> str:
+    if compacto:
+        partes = [f"[{_minutos(ini)},{_minutos(fin)}]" for ini, fin in slots]
+    else:
+        hhmm = _HHMM
+        partes = [
+            f'{{"hora_inicio":"{hhmm[_minutos(ini)]}","hora_fin":"{hhmm[_minutos(fin)]}"}}' for ini, fin in slots
+        ]
+    return "[" + ",".join(partes) + "]"
+
+
+def slots_json(slots: Iterable[tuple[time, time]], compacto: bool = False) -> bytes:
+    """``[{"hora_inicio": "HH:MM", "hora_fin": "HH:MM"}, ...]`` o ``[[inicio, fin], ...]``."""
+    return _slots_texto(slots, compacto).encode()
+
+
+def dias_json(dias: Iterable[tuple[date, bool, list]], con_slots: bool, compacto: bool = False) -> bytes:
+    """Lista de días ``{"fecha", "cerrado", "disponibles"[, "slots"]}`` de la vista de rango."""
+    partes = []
+    for fecha, cerrado, slots in dias:
+        cabecera = (
+            f'{{"fecha":"{fecha.isoformat()}","cerrado":{"true" if cerrado else "false"},'
+            f'"disponibles":{len(slots)}'
+        )
+        if con_slots:
+            partes.append(f'{cabecera},"slots":{_slots_texto(slots, compacto)}}}')
+        else:
+            partes.append(cabecera + "}")
+    return ("[" + ",".join(partes) + "]").encode()
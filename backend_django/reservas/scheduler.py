@@ -0,0 +1,153 @@
+"""
+Scheduler en proceso para los comandos periódicos (recordatorios, no-shows, sync
+con Calendar). Un solo proceso largo evita arrancar Django en cada tick de cron;
+con varias réplicas solo ejecuta la que tiene el lease de líder en BD.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import IntegrityError, close_old_connections, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import SchedulerLease
+
+logger = logging.getLogger(__name__)
+
+LEASE_NOMBRE = "run_scheduler"
+
+
+def identificador_proceso() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def adquirir_lease(titular: str, duracion: timedelta, nombre: str = LEASE_NOMBRE) -> bool:
+    """
+    Toma o renueva el lease con un UPDATE condicional: solo gana si ya es el
+    titular o si el lease anterior expiró. Devuelve True si `titular` es líder.
+    """
+    ahora = timezone.now()
+    renovado = (
+        SchedulerLease.objects.filter(nombre=nombre)
+        .filter(Q(titular=titular) | Q(expira_en__lt=ahora))
+        .update(titular=titular, expira_en=ahora + duracion)
+    )
+    if renovado:
+        return True
+    try:
+        with transaction.atomic():
+            SchedulerLease.objects.create(nombre=nombre, titular=titular, expira_en=ahora + duracion)
+    except IntegrityError:
+        return False  # otra réplica tiene el lease vigente
+    return True
+
+
+def liberar_lease(titular: str, nombre: str = LEASE_NOMBRE) -> None:
+    SchedulerLease.objects.filter(nombre=nombre, titular=titular).delete()
+
+
+class LatidoLease:
+    """
+    Renueva el lease en un hilo cada `intervalo` segundos mientras corre un job,
+    así un job más largo que el lease no deja que otra réplica tome el liderazgo.
+    Si una renovación devuelve False, `perdido` queda en True (el job en curso no
+    se puede interrumpir; la ronda se detiene al terminarlo).
+    """
+
+    def __init__(self, renovar, intervalo: float):
+        self.renovar = renovar
+        self.intervalo = intervalo
+        self.perdido = False
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._latir, name="scheduler-lease", daemon=True)
+
+    def _latir(self) -> None:
+        try:
+            while not self._parar.wait(self.intervalo):
+                try:
+                    if not self.renovar():
+                        self.perdido = True
+                        logger.error("Se perdió el lease del scheduler con un job en curso.")
+                        return
+                except Exception:  # noqa: BLE001
+                    # Error de BD puntual: el lease sigue vigente hasta expirar, se reintenta
+                    logger.exception("No se pudo renovar el lease del scheduler")
+        finally:
+            # Conexión propia del hilo
+            connections.close_all()
+
+    def __enter__(self):
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._parar.set()
+        self._hilo.join()
+
+
+@dataclass
+class Job:
+    comando: str
+    intervalo: int
+    ultima_ejecucion: float | None = field(default=None)
+
+    def vencido(self, ahora: float) -> bool:
+        return self.ultima_ejecucion is None or ahora - self.ultima_ejecucion >= self.intervalo
+
+
+def ejecutar_job(job: Job) -> tuple[float, str]:
+    """Ejecuta el comando del job; devuelve (segundos, última línea de su salida)."""
+    salida = StringIO()
+    inicio = time.perf_counter()
+    close_old_connections()
+    try:
+        call_command(job.comando, stdout=salida, stderr=salida)
+    finally:
+        job.ultima_ejecucion = time.monotonic()
+        close_old_connections()
+    duracion = time.perf_counter() - inicio
+    lineas = [linea for linea in salida.getvalue().splitlines() if linea.strip()]
+    return duracion, lineas[-1] if lineas else ""
+
+
+def ejecutar_vencidos(
+    jobs: list[Job], sigue_lider=None, latido: float | None = None
+) -> list[tuple[str, float, str]]:
+    """
+    Ejecuta los jobs vencidos; un job que falla se registra y no detiene a los demás.
+    `sigue_lider()` renueva el lease antes de cada job y, con `latido`, cada
+    `latido` segundos mientras el job corre (ver `LatidoLease`).
+    """
+    resultados = []
+    for job in jobs:
+        if not job.vencido(time.monotonic()):
+            continue
+        if sigue_lider is not None and not sigue_lider():
+            logger.warning("Se perdió el lease del scheduler; se detiene la ronda.")
+            break
+        latido_lease = LatidoLease(sigue_lider, latido) if sigue_lider is not None and latido else None
+        try:
+            if latido_lease is None:
+                duracion, resumen = ejecutar_job(job)
+            else:
+                with latido_lease:
+                    duracion, resumen = ejecutar_job(job)
+        except Exception:  # noqa: BLE001
+            logger.exception("Job %s falló", job.comando)
+            duracion = None
+        if duracion is not None:
+            # Los comandos terminan con su resumen (filas enviadas/marcadas/sincronizadas)
+            logger.info("Job %s en %.2fs: %s", job.comando, duracion, resumen)
+            resultados.append((job.comando, duracion, resumen))
+        if latido_lease is not None and latido_lease.perdido:
+            logger.warning("Se perdió el lease del scheduler; se detiene la ronda.")
+            break
+    return resultados
@@ -1,8 +1,35 @@
 # reservas/serializers.py
-from datetime import date, time
+from datetime import date
 
 from rest_framework import serializers
 from .models import Negocio, Servicio, Cliente, Cita, Mesa
+from .asignacion import asignar_mesa
+from .horarios import APERTURA_DEFAULT, CIERRE_DEFAULT, horario_de
+
+
+def campos_solicitados(request):
+    """
+    Campos pedidos con ``?fields=id,fecha,...`` en una lectura, o None si no se
+    pidió selección (o la petición escribe: ahí se validan todos los campos).
+    """
+    if request is None or request.method not in ("GET", "HEAD"):
+        return None
+    crudo = request.query_params.get("fields")
+    if not crudo:
+        return None
+    return {campo.strip() for campo in crudo.split(",") if campo.strip()}
+
+
+class CamposSeleccionablesMixin:
+    """Sparse fieldsets: con ``?fields=`` solo se serializan esos campos (los desconocidos se ignoran)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        campos = campos_solicitados(self.context.get("request"))
+        if campos is None:
+            return
+        for nombre in set(self.fields) - campos:
+            self.fields.pop(nombre)
 
 
 class NegocioSerializer(serializers.ModelSerializer):
@@ -39,7 +66,7 @@ class ServicioSerializer(serializers.ModelSerializer):
         read_only_fields = ["id"]
 
 
-class ClienteSerializer(serializers.ModelSerializer):
+class ClienteSerializer(CamposSeleccionablesMixin, serializers.ModelSerializer):
     negocio_nombre = serializers.CharField(source="negocio.nombre", read_only=True)
 
     class Meta:
@@ -86,10 +113,11 @@ class MesaSerializer(serializers.ModelSerializer):
         return attrs
 
 
-class CitaSerializer(serializers.ModelSerializer):
+class CitaSerializer(CamposSeleccionablesMixin, serializers.ModelSerializer):
     negocio_nombre = serializers.CharField(source="negocio.nombre", read_only=True)
     servicio_nombre = serializers.CharField(source="servicio.nombre", read_only=True)
     cliente_nombre = serializers.CharField(source="cliente.nombre", read_only=True)
+    mesa_nombre = serializers.CharField(source="mesa.nombre", read_only=True, default=None)
 
     class Meta:
         model = Cita
@@ -101,6 +129,9 @@ class CitaSerializer(serializers.ModelSerializer):
             "servicio_nombre",
             "cliente",
             "cliente_nombre",
+            "mesa",
+            "mesa_nombre",
+            "personas",
             "fecha",
             "hora_inicio",
             "hora_fin",
@@ -108,15 +139,17 @@ class CitaSerializer(serializers.ModelSerializer):
             "notas",
             "creado_en",
         ]
-        read_only_fields = ["id", "creado_en"]
+        # La mesa la elige el motor de asignación en validate()
+        read_only_fields = ["id", "creado_en", "mesa"]
 
     def validate(self, attrs):
         """
         Reglas de negocio para las citas:
         - fecha >= hoy
         - hora_fin > hora_inicio
-        - horario dentro de apertura/cierre
+        - horario dentro de apertura/cierre del negocio y día abierto
         - un cliente no puede tener más de UNA cita activa futura
+        - las citas activas reciben una mesa concreta que admita a las personas
         """
 
         instancia = self.instance
@@ -128,6 +161,7 @@ class CitaSerializer(serializers.ModelSerializer):
         hora_fin = attrs.get("hora_fin") or (instancia.hora_fin if instancia else None)
         cliente = attrs.get("cliente") or (instancia.cliente if instancia else None)
         estado = attrs.get("estado") or (instancia.estado if instancia else None)
+        personas = attrs["personas"] if "personas" in attrs else (instancia.personas if instancia else None)
         estados_activos = ("pendiente", "confirmada")
 
         # Consistencia negocio/servicio/cliente
@@ -152,16 +186,23 @@ class CitaSerializer(serializers.ModelSerializer):
                 "La hora de fin debe ser mayor que la hora de inicio."
             )
 
-        # 3) Horario permitido del restaurante
-        apertura = time(13, 0)  # 13:00
-        cierre = time(23, 0)    # 23:00
+        # 3) Horario permitido del restaurante (semanal, días especiales y cierres del negocio)
+        #    Solo aplica a citas activas: cancelar una cita de un día que después se
+        #    cerró o cambió de horario sigue permitido.
+        cita_activa = (estado or "pendiente") in estados_activos
+        horas = horario_de(negocio.id if negocio else None).horas(fecha) if fecha else None
+        if cita_activa and fecha and horas is None:
+            raise serializers.ValidationError(
+                "El restaurante está cerrado en la fecha seleccionada."
+            )
+        apertura, cierre = horas or (APERTURA_DEFAULT, CIERRE_DEFAULT)
 
-        if hora_inicio and not (apertura <= hora_inicio < cierre):
+        if cita_activa and hora_inicio and not (apertura <= hora_inicio < cierre):
             raise serializers.ValidationError(
                 f"La hora de inicio debe estar entre {apertura.strftime('%H:%M')} y {cierre.strftime('%H:%M')}."
             )
 
-        if hora_fin and not (apertura < hora_fin <= cierre):
+        if cita_activa and hora_fin and not (apertura < hora_fin <= cierre):
             raise serializers.ValidationError(
                 f"La hora de fin debe estar entre {apertura.strftime('%H:%M')} y {cierre.strftime('%H:%M')}."
             )
@@ -190,6 +231,27 @@ class CitaSerializer(serializers.ModelSerializer):
                         "No hay mesas disponibles para ese horario en este servicio."
                     )
 
+            # 3.6) Mesa concreta: la de menor capacidad que admite a las personas y está libre
+            if fecha and hora_inicio and hora_fin and cita_activa:
+                mesa, plan = asignar_mesa(
+                    servicio,
+                    fecha,
+                    hora_inicio,
+                    hora_fin,
+                    personas=personas,
+                    excluir_pk=instancia.pk if instancia else None,
+                    preferida_id=instancia.mesa_id if instancia else None,
+                )
+                if mesa is None:
+                    if not plan.hay_mesa_para(personas):
+                        raise serializers.ValidationError(
+                            f"No hay mesas para {personas} personas en este servicio."
+                        )
+                    raise serializers.ValidationError(
+                        "No hay mesas disponibles para ese horario en este servicio."
+                    )
+                attrs["mesa"] = mesa
+
         # 4) Un cliente no puede tener más de UNA cita activa futura
         #    (pendiente / confirmada y con fecha hoy o mayor)
         if cliente and fecha and estado in estados_activos and fecha >= date.today():
@@ -1,17 +1,43 @@
+import hashlib
 from datetime import datetime
 
-from django.core.mail import send_mail
 from django.db import transaction
-from django.db.models.signals import post_delete, post_save
-from django.dispatch import receiver
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
 
-from .models import Cita
-from .google_sync import delete_cita_from_calendar, sync_cita_to_calendar
+from . import cache as availability_cache
+from . import outbox
+from .google_sync import (
+    WATERMARK_CALENDAR,
+    calendar_configurado,
+    invalidar_credenciales_configuradas,
+    invalidar_service_cache,
+)
+from .models import (
+    CalendarCredential,
+    Cita,
+    Cliente,
+    DiaEspecial,
+    HorarioSemanal,
+    Mesa,
+    Negocio,
+    Servicio,
+    SyncWatermark,
+)
 
+# marcar_no_show actualiza por lotes (sin post_save por fila) y emite una señal por lote.
+# Argumentos: cita_ids (lista de pk) y dias ({(servicio_id, fecha)} afectados).
+citas_no_show = Signal()
 
-def _build_subject(cita: Cita, created: bool) -> str:
-    accion = "Confirmación" if created else "Actualización"
-    return f"{accion} de cita – {cita.negocio.nombre}"
+_ASUNTOS = {
+    "creada": "Confirmación",
+    "estado": "Cambio de estado",
+    "actualizada": "Actualización",
+}
+
+def _build_subject(cita: Cita, evento: str) -> str:
+    return f"{_ASUNTOS[evento]} de cita – {cita.negocio.nombre}"
 
 
 def _build_body(cita: Cita) -> str:
@@ -28,6 +54,58 @@ def _build_body(cita: Cita) -> str:
     )
 
 
+def _destinatarios(cita: Cita) -> list[str]:
+    negocio = cita.negocio
+    return [
+        cita.cliente.email,
+        negocio.propietario.email if negocio.propietario_id else "",
+        negocio.email_contacto,
+    ]
+
+
+# Campos que ve el cliente en el correo; cambios en otros no se notifican
+_CAMPOS_NOTIFICABLES = ("servicio_id", "fecha", "hora_inicio", "hora_fin", "estado", "notas")
+
+
+@receiver(pre_save, sender=Cita)
+def capturar_valores_previos(sender, instance: Cita, **kwargs):
+    """
+    Fija en `_valores_previos` los valores de la cita antes de este save (los de
+    from_db o del save anterior). Los receptores de post_save leen de ahí, así
+    no dependen del orden en que refrescan `_valores_cargados`.
+    """
+    instance._valores_previos = getattr(instance, "_valores_cargados", None)
+
+
+def _tipo_evento(cita: Cita, created: bool) -> str | None:
+    if created:
+        return "creada"
+    previos = getattr(cita, "_valores_previos", None)
+    if not previos:
+        return "actualizada"
+    if previos.get("estado") != cita.estado:
+        return "estado"
+    if all(previos.get(campo) == getattr(cita, campo) for campo in _CAMPOS_NOTIFICABLES):
+        return None
+    return "actualizada"
+
+
+def _clave_notificacion(cita: Cita, evento: str) -> str:
+    """
+    Clave de idempotencia por cambio visible: (cita, evento, estado de partida y
+    de llegada de los campos notificables). El estado de partida incluye el
+    `actualizado_en` con que se cargó la cita, así dos instancias cargadas de la
+    misma fila que guardan el mismo cambio (o saves repetidos de una instancia
+    desactualizada) encolan un solo correo, y volver a un estado u horario
+    anterior (confirmada→cancelada→confirmada) parte de otra versión y se notifica.
+    """
+    previos = getattr(cita, "_valores_previos", None) or {}
+    partida = [str(previos.get("actualizado_en"))] + [str(previos.get(campo)) for campo in _CAMPOS_NOTIFICABLES]
+    llegada = [str(getattr(cita, campo)) for campo in _CAMPOS_NOTIFICABLES]
+    huella = hashlib.sha1("|".join(partida + llegada).encode()).hexdigest()[:24]
+    return f"cita:{cita.pk}:{evento}:{huella}"
+
+
 def _should_skip_for_internal_update(update_fields) -> bool:
     """
     Si el save fue solo para campos internos, no mandamos correo ni resincronizamos.
@@ -35,14 +113,15 @@ def _should_skip_for_internal_update(update_fields) -> bool:
     if not update_fields:
         return False
     update_fields = set(update_fields)
-    internal_only = {"event_id", "recordatorio_enviado"}
+    internal_only = {"event_id", "recordatorio_enviado", "calendar_hash", "calendar_synced_at"}
     return update_fields.issubset(internal_only)
 
 
 @receiver(post_save, sender=Cita)
 def enviar_notificacion_cita(sender, instance: Cita, created: bool, **kwargs):
     """
-    Envía correo a cliente/propietario (si tienen email) y sincroniza con Google Calendar.
+    Encola correo a cliente/propietario/negocio (si tienen email) y sincronización con Google Calendar.
+    La outbox se escribe en la misma transacción; el envío real lo hace `run_outbox`.
     """
     if kwargs.get("raw"):
         return
@@ -50,33 +129,141 @@ def enviar_notificacion_cita(sender, instance: Cita, created: bool, **kwargs):
     if _should_skip_for_internal_update(kwargs.get("update_fields")):
         return
 
-    def _after_commit():
-        # 1) Correo (si hay destinatarios)
-        destinatarios = []
-        if instance.cliente.email:
-            destinatarios.append(instance.cliente.email)
-        if instance.negocio.propietario.email:
-            destinatarios.append(instance.negocio.propietario.email)
+    # 1) Correo (único punto de notificación, también para reservas públicas)
+    evento = _tipo_evento(instance, created)
+    if evento:
+        outbox.encolar_correo(
+            _build_subject(instance, evento),
+            _build_body(instance),
+            _destinatarios(instance),
+            clave=_clave_notificacion(instance, evento),
+        )
 
-        if destinatarios:
-            send_mail(
-                subject=_build_subject(instance, created),
-                message=_build_body(instance),
-                from_email=None,  # usa DEFAULT_FROM_EMAIL
-                recipient_list=destinatarios,
-                fail_silently=True,
-            )
+    # 2) Calendar sync, solo si el negocio tiene credencial. Si se configura después,
+    # el sync incremental recorre todas las citas (ver invalidar_service_calendar)
+    if calendar_configurado(instance.negocio_id):
+        outbox.encolar("calendar_sync", {"cita_id": instance.pk})
+
+
+@receiver(post_delete, sender=Cita)
+def eliminar_evento_calendar(sender, instance: Cita, **kwargs):
+    """
+    Encola el borrado del evento remoto cuando se elimina la cita.
+    """
+    if instance.event_id:
+        outbox.encolar(
+            "calendar_delete",
+            {"cita_id": instance.pk, "event_id": instance.event_id, "negocio_id": instance.negocio_id},
+        )
 
-        # 2) Calendar sync (si hay credenciales guardadas)
-        sync_cita_to_calendar(instance)
 
-    # Ejecutar después de confirmar commit DB
-    transaction.on_commit(_after_commit)
+def _bump_now_and_on_commit(fn, *args):
+    # Inmediato para lecturas dentro de la misma transacción y otra vez al confirmar,
+    # por si otro worker cacheó el estado previo mientras la transacción seguía abierta.
+    fn(*args)
+    transaction.on_commit(lambda: fn(*args))
 
 
+@receiver(post_save, sender=Cita)
 @receiver(post_delete, sender=Cita)
-def eliminar_evento_calendar(sender, instance: Cita, **kwargs):
+def invalidar_disponibilidad_cita(sender, instance: Cita, **kwargs):
+    """
+    Sube la versión de disponibilidad del (servicio, fecha) de la cita y, si se movió,
+    también la del día/servicio anterior.
+    """
+    dias = {(instance.servicio_id, instance.fecha)}
+    # Al guardar, los valores de antes del save; al borrar, los cargados de la BD
+    previos = getattr(instance, "_valores_previos" if kwargs["signal"] is post_save else "_valores_cargados", None)
+    if previos and previos.get("fecha") and previos.get("servicio_id"):
+        dias.add((previos["servicio_id"], previos["fecha"]))
+    for servicio_id, fecha in dias:
+        _bump_now_and_on_commit(availability_cache.bump_fecha, servicio_id, fecha)
+    instance._valores_cargados = {f.attname: getattr(instance, f.attname) for f in instance._meta.concrete_fields}
+
+
+@receiver(citas_no_show)
+def invalidar_disponibilidad_no_show(sender, dias, **kwargs):
+    for servicio_id, fecha in dias:
+        _bump_now_and_on_commit(availability_cache.bump_fecha, servicio_id, fecha)
+
+
+@receiver(post_save, sender=Mesa)
+def invalidar_disponibilidad_mesa(sender, instance: Mesa, created: bool, **kwargs):
+    """
+    La capacidad depende de las mesas activas: al crear una mesa o cambiar su
+    estado/servicio se invalida toda la disponibilidad de los servicios afectados.
+    """
+    servicios = {instance.servicio_id}
+    previos = getattr(instance, "_valores_cargados", None)
+    if previos and not created:
+        if (previos.get("activa"), previos.get("servicio_id")) == (instance.activa, instance.servicio_id):
+            return
+        servicios.add(previos.get("servicio_id"))
+    for servicio_id in servicios - {None}:
+        _bump_now_and_on_commit(availability_cache.bump_servicio, servicio_id)
+    instance._valores_cargados = {"servicio_id": instance.servicio_id, "activa": instance.activa}
+
+
+@receiver(post_delete, sender=Mesa)
+def invalidar_disponibilidad_mesa_borrada(sender, instance: Mesa, **kwargs):
+    _bump_now_and_on_commit(availability_cache.bump_servicio, instance.servicio_id)
+
+
+@receiver(post_save, sender=Servicio)
+def invalidar_disponibilidad_servicio(sender, instance: Servicio, created: bool, **kwargs):
+    # Precio y estado activo aparecen en la disponibilidad agregada de mesas
+    if not created:
+        _bump_now_and_on_commit(availability_cache.bump_servicio, instance.pk)
+
+
+@receiver(post_save, sender=Servicio)
+@receiver(post_delete, sender=Servicio)
+@receiver(post_save, sender=Negocio)
+@receiver(post_delete, sender=Negocio)
+def invalidar_catalogo(sender, **kwargs):
+    # /api/servicios/ muestra servicios y el nombre de su negocio
+    _bump_now_and_on_commit(availability_cache.bump_catalogo)
+
+
+@receiver(post_save, sender=HorarioSemanal)
+@receiver(post_delete, sender=HorarioSemanal)
+@receiver(post_save, sender=DiaEspecial)
+@receiver(post_delete, sender=DiaEspecial)
+def invalidar_horario_negocio(sender, instance, **kwargs):
+    """
+    Cambió el horario del negocio: sube su versión compartida (todos los workers
+    recompilan en su siguiente lectura) y luego invalida la disponibilidad
+    cacheada de sus servicios.
+    """
+    _bump_now_and_on_commit(availability_cache.bump_horario, instance.negocio_id)
+    for servicio_id in Servicio.objects.filter(negocio_id=instance.negocio_id).values_list("pk", flat=True):
+        _bump_now_and_on_commit(availability_cache.bump_servicio, servicio_id)
+
+
+@receiver(post_save, sender=Cliente)
+@receiver(post_save, sender=Servicio)
+def marcar_citas_para_calendar(sender, instance, created: bool, **kwargs):
+    """
+    El evento de Calendar incluye nombre/email del cliente y nombre del servicio:
+    al cambiarlos se marcan sus citas futuras como modificadas para que el sync
+    incremental las revise (la huella decide si de verdad hay que reenviarlas).
+    """
+    if created or kwargs.get("raw"):
+        return
+    filtro = {"cliente": instance} if sender is Cliente else {"servicio": instance}
+    Cita.objects.filter(fecha__gte=timezone.localdate(), **filtro).update(actualizado_en=timezone.now())
+
+
+@receiver(post_save, sender=CalendarCredential)
+@receiver(post_delete, sender=CalendarCredential)
+def invalidar_service_calendar(sender, instance: CalendarCredential, **kwargs):
     """
-    Borra el evento remoto cuando se elimina la cita.
+    Credencial nueva/actualizada/borrada: el próximo sync reconstruye el service
+    de esa credencial (los de otros negocios siguen cacheados).
+    Una credencial nueva (p. ej. de un negocio) puede cambiar el calendario destino
+    de citas ya sincronizadas, así que el sync incremental vuelve a revisar todas.
     """
-    delete_cita_from_calendar(instance)
+    invalidar_service_cache(instance.pk)
+    invalidar_credenciales_configuradas()
+    if kwargs.get("created"):
+        SyncWatermark.objects.filter(nombre=WATERMARK_CALENDAR).delete()
@@ -0,0 +1,174 @@
+import itertools
+import threading
+from collections import Counter
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+
+from googleapiclient.errors import HttpError
+
+from ..deteccion import DetectorConsultasMixin
+from ..horarios import HORARIO_DEFAULT, invalidar_horario
+from ..models import Cliente, Mesa, Negocio, Servicio
+
+
+def proximo_dia_abierto(dias: int = 1) -> date:
+    """Primera fecha desde hoy + `dias` que abre con el horario por defecto (jueves cerrado)."""
+    fecha = date.today() + timedelta(days=dias)
+    while HORARIO_DEFAULT.cerrado(fecha):
+        fecha += timedelta(days=1)
+    return fecha
+
+
+class BaseTestData(DetectorConsultasMixin, TestCase):
+    """Datos mínimos; cada request de los tests corre bajo el detector de N+1."""
+
+    # Los fixtures tienen pocas filas por listado: con el umbral de producción (5) un
+    # N+1 casi nunca se repetiría lo suficiente para saltar. Con 2 saltan consultas
+    # legítimas (dos eventos de outbox por cita, credencial del negocio y la default)
+    detector_umbral = 3
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        invalidar_horario()
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            username="tester",
+            email="tester@example.com",
+            password="pass1234",
+        )
+        self.negocio = Negocio.objects.create(
+            nombre="Restaurante Prueba",
+            propietario=self.user,
+            direccion="Calle 1",
+            telefono="1234567890",
+        )
+        self.servicio = Servicio.objects.create(
+            negocio=self.negocio,
+            nombre="Mesa 2 personas",
+            duracion_minutos=60,
+            precio=0,
+        )
+        self.cliente = Cliente.objects.create(
+            negocio=self.negocio,
+            nombre="Cliente Uno",
+            email="cliente@ejemplo.com",
+        )
+        # Solo una mesa activa para probar saturación
+        self.mesa = Mesa.objects.create(
+            negocio=self.negocio,
+            servicio=self.servicio,
+            nombre="Mesa 1",
+            tipo="normal_2",
+            capacidad_min=1,
+            capacidad_max=2,
+            activa=True,
+        )
+
+
+class _FakeResponse:
+    def __init__(self, status, reason=""):
+        self.status = status
+        self.reason = reason
+
+
+class _FakeRequest:
+    def __init__(self, payload=None, exception=None):
+        self.payload = payload
+        self.exception = exception
+
+    def execute(self):
+        if self.exception:
+            raise self.exception
+        return self.payload
+
+
+class _FakeLazyRequest(_FakeRequest):
+    """Como las peticiones reales: el efecto ocurre al ejecutar, no al construir."""
+
+    def __init__(self, fn):
+        super().__init__()
+        self.fn = fn
+
+    def execute(self):
+        return self.fn()
+
+
+class _FakeEventsService:
+    def __init__(self):
+        self.store = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.calls = Counter()
+
+    def insert(self, calendarId, body, sendUpdates=None):
+        def _run():
+            with self._lock:
+                self.calls["insert"] += 1
+                event_id = f"evt_{next(self._ids)}"
+                while event_id in self.store:
+                    event_id = f"evt_{next(self._ids)}"
+                payload = {"id": event_id, **body}
+                self.store[event_id] = payload
+            return payload
+
+        return _FakeLazyRequest(_run)
+
+    def update(self, calendarId, eventId, body):
+        def _run():
+            with self._lock:
+                self.calls["update"] += 1
+                if eventId not in self.store:
+                    raise HttpError(_FakeResponse(404), b"")
+                self.store[eventId].update(body)
+                return self.store[eventId]
+
+        return _FakeLazyRequest(_run)
+
+    def delete(self, calendarId, eventId):
+        if eventId not in self.store:
+            return _FakeRequest(exception=HttpError(_FakeResponse(404), b""))
+        self.store.pop(eventId, None)
+        return _FakeRequest({})
+
+    def get(self, calendarId, eventId):
+        self.calls["get"] += 1
+        if eventId not in self.store:
+            return _FakeRequest(exception=HttpError(_FakeResponse(404), b""))
+        return _FakeRequest(self.store[eventId])
+
+
+class _FakeBatch:
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id=None):
+        self.requests.append((request_id, request))
+
+    def execute(self, http=None):
+        assert len(self.requests) <= 50, "Calendar admite hasta 50 peticiones por lote"
+        with self.service.lock:
+            self.service.batches.append(len(self.requests))
+        for request_id, request in self.requests:
+            try:
+                self.callback(request_id, request.execute(), None)
+            except HttpError as exc:
+                self.callback(request_id, None, exc)
+
+
+class _FakeCalendarService:
+    def __init__(self):
+        self.events_service = _FakeEventsService()
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def events(self):
+        return self.events_service
+
+    def new_batch_http_request(self, callback=None):
+        return _FakeBatch(self, callback)
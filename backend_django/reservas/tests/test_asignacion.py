@@ -0,0 +1,154 @@
+import random
+import time as _time
+from datetime import date, time, timedelta
+
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from ..asignacion import AgendaMesa, PlanMesas
+from ..models import Cita, Cliente, Mesa
+from ..serializers import CitaSerializer
+from ..utils import CLOSE_TIME, OPEN_TIME, _to_minutes
+from .base import BaseTestData
+
+
+def _proximo_viernes() -> date:
+    hoy = date.today()
+    return hoy + timedelta(days=(4 - hoy.weekday()) % 7 + 7)
+
+
+def _mesa(id_, capacidad_max, capacidad_min=1):
+    return Mesa(id=id_, nombre=f"M{id_}", tipo="normal_4", capacidad_min=capacidad_min, capacidad_max=capacidad_max)
+
+
+class PlanMesasTests(SimpleTestCase):
+    def test_conflictos_con_bisect(self):
+        agenda = AgendaMesa(_mesa(1, 4))
+        agenda.ocupar(840, 900)   # 14:00-15:00
+        agenda.ocupar(960, 1020)  # 16:00-17:00
+        self.assertTrue(agenda.libre(900, 960))   # justo entre ambas
+        self.assertTrue(agenda.libre(780, 840))
+        self.assertTrue(agenda.libre(1020, 1080))
+        self.assertFalse(agenda.libre(870, 930))
+        self.assertFalse(agenda.libre(800, 1100))
+        self.assertFalse(agenda.libre(970, 980))
+
+    def test_mejor_ajuste_por_capacidad_y_holgura(self):
+        plan = PlanMesas([_mesa(1, 8), _mesa(2, 4), _mesa(3, 4), _mesa(4, 2)], [(3, 780, 840)])
+        # Para 2 personas gana la mesa de 2
+        self.assertEqual(plan.mejor_mesa(840, 900, personas=2).id, 4)
+        # Para 3: mesas de 4; la 3 termina una cita a las 14:00, así que deja menos hueco
+        self.assertEqual(plan.mejor_mesa(840, 900, personas=3).id, 3)
+        self.assertEqual(plan.mejor_mesa(840, 900, personas=6).id, 1)
+        self.assertIsNone(plan.mejor_mesa(840, 900, personas=10))
+        self.assertFalse(plan.hay_mesa_para(10))
+
+    def test_respeta_capacidad_minima_y_preferida(self):
+        plan = PlanMesas([_mesa(1, 12, capacidad_min=5), _mesa(2, 4)])
+        self.assertEqual(plan.mejor_mesa(840, 900, personas=2).id, 2)
+        plan.asignar(840, 900, personas=2)
+        self.assertIsNone(plan.mejor_mesa(840, 900, personas=2))
+        # Sin personas cualquier mesa libre sirve; la preferida se conserva si sigue libre
+        self.assertEqual(plan.mejor_mesa(900, 960, preferida_id=1).id, 1)
+
+    def test_benchmark_dia_sintetico(self):
+        rnd = random.Random(17)
+        capacidades = [2] * 40 + [4] * 40 + [6] * 12 + [10] * 8
+        mesas = [_mesa(i + 1, cap, capacidad_min=1 if cap <= 4 else 3) for i, cap in enumerate(capacidades)]
+        apertura, cierre = _to_minutes(OPEN_TIME), _to_minutes(CLOSE_TIME)
+        reservas = []
+        for _ in range(2000):
+            duracion = rnd.choice((60, 90, 120))
+            inicio = rnd.randrange(apertura, cierre - duracion + 1, 15)
+            reservas.append((inicio, inicio + duracion, rnd.choice((1, 2, 2, 3, 4, 4, 5, 6, 8))))
+
+        plan = PlanMesas(mesas)
+        inicio_bench = _time.perf_counter()
+        asignadas = [(plan.asignar(ini, fin, personas), ini, fin, personas) for ini, fin, personas in reservas]
+        duracion = _time.perf_counter() - inicio_bench
+
+        por_mesa = {}
+        for mesa, ini, fin, personas in asignadas:
+            if mesa is None:
+                continue
+            self.assertTrue(mesa.capacidad_min <= personas <= mesa.capacidad_max)
+            por_mesa.setdefault(mesa.id, []).append((ini, fin))
+        for intervalos in por_mesa.values():
+            intervalos.sort()
+            self.assertTrue(all(a[1] <= b[0] for a, b in zip(intervalos, intervalos[1:])))
+        self.assertGreater(sum(len(v) for v in por_mesa.values()), 500)
+        # 2,000 reservas × 100 mesas en memoria: O(mesas · log n) por reserva
+        self.assertLess(duracion, 2.0, f"{len(reservas) / duracion:.0f} asignaciones/s")
+
+
+class AsignacionCitaTests(BaseTestData):
+    def setUp(self):
+        super().setUp()
+        self.fecha = _proximo_viernes()
+        self.mesa_4 = Mesa.objects.create(
+            negocio=self.negocio, servicio=self.servicio, nombre="Mesa 4", tipo="normal_4", capacidad_max=4
+        )
+
+    def _data(self, cliente, inicio=time(14, 0), fin=time(15, 0), **extra):
+        return {
+            "negocio": self.negocio.id,
+            "servicio": self.servicio.id,
+            "cliente": cliente.id,
+            "fecha": self.fecha,
+            "hora_inicio": inicio,
+            "hora_fin": fin,
+            "estado": "confirmada",
+            **extra,
+        }
+
+    def _crear(self, cliente, **extra):
+        serializer = CitaSerializer(data=self._data(cliente, **extra))
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        return serializer.save()
+
+    def test_asigna_mesa_segun_personas(self):
+        otro = Cliente.objects.create(negocio=self.negocio, nombre="Otro", email="otro@ejemplo.com")
+        grande = self._crear(self.cliente, personas=3)
+        pareja = self._crear(otro, personas=2)
+        self.assertEqual(grande.mesa, self.mesa_4)
+        self.assertEqual(pareja.mesa, self.mesa)
+        self.assertEqual(CitaSerializer(grande).data["mesa_nombre"], "Mesa 4")
+
+    def test_sin_mesa_del_tamano(self):
+        serializer = CitaSerializer(data=self._data(self.cliente, personas=9))
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("No hay mesas para 9 personas", str(serializer.errors))
+
+    def test_grupo_grande_no_cabe_si_su_mesa_esta_ocupada(self):
+        otro = Cliente.objects.create(negocio=self.negocio, nombre="Otro", email="otro@ejemplo.com")
+        self._crear(self.cliente, personas=4)
+        serializer = CitaSerializer(data=self._data(otro, inicio=time(14, 30), fin=time(15, 30), personas=4))
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("No hay mesas disponibles", str(serializer.errors))
+
+    def test_editar_conserva_la_mesa(self):
+        cita = self._crear(self.cliente)
+        mesa = cita.mesa
+        serializer = CitaSerializer(cita, data={"notas": "Ventana"}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(serializer.save().mesa, mesa)
+
+    def test_endpoint_publico_acepta_personas(self):
+        response = APIClient().post(
+            reverse("crear-cita-publica"),
+            {
+                "negocio": self.negocio.id,
+                "servicio": self.servicio.id,
+                "nombre": "Grupo",
+                "email": "grupo@ejemplo.com",
+                "fecha": self.fecha.isoformat(),
+                "hora_inicio": "19:00",
+                "hora_fin": "20:00",
+                "personas": 4,
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data["mesa"], self.mesa_4.id)
+        self.assertEqual(Cita.objects.get(pk=response.data["cita_id"]).personas, 4)
@@ -0,0 +1,135 @@
+from datetime import date, time, timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .. import cache as availability_cache
+from ..models import Cita, Cliente
+from ..utils import available_slots, available_slots_range, suggest_slot
+from .base import BaseTestData
+
+
+def _proximo_viernes() -> date:
+    hoy = date.today()
+    return hoy + timedelta(days=(4 - hoy.weekday()) % 7 + 7)
+
+
+class AvailabilityCacheTests(BaseTestData):
+    def setUp(self):
+        super().setUp()
+        self.fecha = _proximo_viernes()
+
+    def _crear_cita(self, fecha=None, inicio=time(14, 0), fin=time(15, 0), **extra):
+        return Cita.objects.create(
+            negocio=self.negocio,
+            servicio=self.servicio,
+            cliente=extra.pop("cliente", self.cliente),
+            fecha=fecha or self.fecha,
+            hora_inicio=inicio,
+            hora_fin=fin,
+            estado="confirmada",
+            **extra,
+        )
+
+    def test_segunda_consulta_no_toca_la_bd(self):
+        primera = available_slots(self.servicio, self.fecha)
+        with self.assertNumQueries(0):
+            segunda = available_slots(self.servicio, self.fecha)
+        self.assertEqual(primera, segunda)
+
+    def test_nueva_cita_invalida_solo_su_dia(self):
+        otro_dia = self.fecha + timedelta(days=1)
+        antes = available_slots(self.servicio, self.fecha)
+        available_slots(self.servicio, otro_dia)
+
+        self._crear_cita()
+
+        despues = available_slots(self.servicio, self.fecha)
+        self.assertNotIn((time(14, 0), time(15, 0)), despues)
+        self.assertLess(len(despues), len(antes))
+        with self.assertNumQueries(0):
+            available_slots(self.servicio, otro_dia)
+
+    def test_mover_cita_invalida_el_dia_anterior(self):
+        cita = self._crear_cita()
+        self.assertNotIn((time(14, 0), time(15, 0)), available_slots(self.servicio, self.fecha))
+
+        cita = Cita.objects.get(pk=cita.pk)
+        cita.fecha = self.fecha + timedelta(days=1)
+        cita.save()
+
+        self.assertIn((time(14, 0), time(15, 0)), available_slots(self.servicio, self.fecha))
+
+    def test_cambio_de_mesas_invalida_el_servicio(self):
+        self.assertTrue(available_slots(self.servicio, self.fecha))
+        self.mesa.activa = False
+        self.mesa.save()
+        self.assertEqual(available_slots(self.servicio, self.fecha), [])
+
+        self.mesa.activa = True
+        self.mesa.save()
+        self.assertTrue(available_slots(self.servicio, self.fecha))
+
+    def test_rango_reutiliza_dias_cacheados(self):
+        fin = self.fecha + timedelta(days=6)
+        primera = available_slots_range(self.servicio, self.fecha, fin)
+        with self.assertNumQueries(0):
+            self.assertEqual(available_slots_range(self.servicio, self.fecha, fin), primera)
+
+        self._crear_cita(fecha=self.fecha + timedelta(days=2))
+        # Solo el día modificado se recalcula (mesas + citas)
+        with self.assertNumQueries(2):
+            tercera = available_slots_range(self.servicio, self.fecha, fin)
+        self.assertNotIn((time(14, 0), time(15, 0)), tercera[self.fecha + timedelta(days=2)])
+        self.assertEqual(tercera[self.fecha], primera[self.fecha])
+
+    def test_sugerencia_cacheada_e_invalidada(self):
+        primera = suggest_slot(self.servicio, fecha_desde=self.fecha, duracion_minutos=60, prefer_hora=time(14, 0))
+        self.assertEqual(primera.hora_inicio, time(14, 0))
+        with self.assertNumQueries(0):
+            suggest_slot(self.servicio, fecha_desde=self.fecha, duracion_minutos=60, prefer_hora=time(14, 0))
+
+        otro = Cliente.objects.create(negocio=self.negocio, nombre="Otro")
+        self._crear_cita(cliente=otro)
+        segunda = suggest_slot(self.servicio, fecha_desde=self.fecha, duracion_minutos=60, prefer_hora=time(14, 0))
+        self.assertNotEqual(segunda.hora_inicio, time(14, 0))
+
+    @override_settings(AVAILABILITY_VERSION_TIMEOUT=3600)
+    def test_claves_de_version_expiran_y_se_recrean_distintas(self):
+        with mock.patch.object(availability_cache.cache, "add", wraps=cache.add) as add:
+            available_slots(self.servicio, self.fecha)
+        self.assertTrue(add.call_args_list)
+        self.assertEqual({llamada.kwargs["timeout"] for llamada in add.call_args_list}, {3600})
+
+        key = availability_cache._ver_key(self.servicio.id, self.fecha)
+        anterior = cache.get(key)
+        cache.delete(key)  # como si hubiera expirado
+        misses = availability_cache.stats()["proceso"]["misses"]
+        available_slots(self.servicio, self.fecha)
+        self.assertNotEqual(cache.get(key), anterior)
+        self.assertEqual(availability_cache.stats()["proceso"]["misses"], misses + 1)
+
+    def test_contadores_hit_miss(self):
+        inicial = availability_cache.stats()["proceso"]
+        available_slots(self.servicio, self.fecha)
+        available_slots(self.servicio, self.fecha)
+        final = availability_cache.stats()
+        self.assertEqual(final["proceso"]["misses"] - inicial["misses"], 1)
+        self.assertEqual(final["proceso"]["hits"] - inicial["hits"], 1)
+        self.assertGreaterEqual(final["global"]["hits"], 1)
+
+
+class AgendaCacheStatsViewTests(BaseTestData):
+    def test_requiere_admin(self):
+        client = APIClient()
+        self.assertIn(client.get(reverse("agenda-cache")).status_code, (401, 403))
+
+        admin = get_user_model().objects.create_superuser("admin", "admin@example.com", "pass1234")
+        client.force_authenticate(admin)
+        resp = client.get(reverse("agenda-cache"))
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn("hits", resp.data["proceso"])
@@ -0,0 +1,238 @@
+from datetime import date, time, timedelta
+from unittest import mock
+
+from django.utils import timezone
+from googleapiclient.errors import HttpError
+
+from ..google_sync import (
+    RESERVA_PREFIJO,
+    WATERMARK_MARGEN,
+    resync_calendar_events,
+    sync_calendar_incremental,
+    sync_cita_to_calendar,
+)
+from ..models import Cita, SyncWatermark
+from .base import BaseTestData, _FakeCalendarService, _FakeRequest, _FakeResponse
+
+
+class ResyncPorLotesTests(BaseTestData):
+    TOTAL = 120
+
+    def setUp(self):
+        super().setUp()
+        self.service = _FakeCalendarService()
+        store = self.service.events_service.store
+        citas = []
+        for i in range(self.TOTAL):
+            # Un tercio ya sincronizadas, un tercio con evento borrado en Calendar, el resto nuevas
+            event_id = None
+            if i % 3 == 0:
+                event_id = f"existente_{i}"
+                store[event_id] = {"id": event_id, "summary": "antiguo"}
+            elif i % 3 == 1:
+                event_id = f"fantasma_{i}"
+            citas.append(
+                Cita(
+                    negocio=self.negocio,
+                    servicio=self.servicio,
+                    cliente=self.cliente,
+                    fecha=date.today() + timedelta(days=1 + i // 10),
+                    hora_inicio=time(13 + i % 10, 0),
+                    hora_fin=time(14 + i % 10, 0),
+                    estado="confirmada",
+                    event_id=event_id,
+                )
+            )
+        Cita.objects.bulk_create(citas)
+
+    def test_agrupa_en_lotes_sin_get_y_persiste_event_ids(self):
+        # 1 SELECT de citas, reserva de altas (UPDATE + SELECT) para las nuevas y otra
+        # para las reinserciones, y 1 UPDATE (bulk_update) para todos los event_id
+        with self.assertNumQueries(6):
+            creados, actualizados = resync_calendar_events(
+                limit=self.TOTAL, service=self.service, calendar_id="primary", workers=3
+            )
+
+        self.assertEqual(actualizados, 40)
+        self.assertEqual(creados, 80)
+        calls = self.service.events_service.calls
+        self.assertEqual(calls["get"], 0)
+        self.assertEqual(calls["update"], self.TOTAL - 40)  # 40 existentes + 40 fantasmas
+        self.assertTrue(all(n <= 50 for n in self.service.batches))
+        # 120 peticiones iniciales en 3 lotes + 40 reinserciones en 1 lote
+        self.assertEqual(sorted(self.service.batches), [20, 40, 50, 50])
+
+        store = self.service.events_service.store
+        event_ids = list(Cita.objects.values_list("event_id", flat=True))
+        self.assertEqual(len(set(event_ids)), self.TOTAL)
+        self.assertTrue(all(event_id in store for event_id in event_ids))
+        self.assertFalse(any(event_id.startswith("fantasma_") for event_id in event_ids))
+
+    def test_segunda_pasada_solo_actualiza(self):
+        resync_calendar_events(limit=self.TOTAL, service=self.service, calendar_id="primary")
+        creados, actualizados = resync_calendar_events(limit=self.TOTAL, service=self.service, calendar_id="primary")
+        self.assertEqual((creados, actualizados), (0, self.TOTAL))
+
+
+class SyncIncrementalTests(BaseTestData):
+    def setUp(self):
+        super().setUp()
+        self.service = _FakeCalendarService()
+        self.citas = [
+            Cita.objects.create(
+                negocio=self.negocio,
+                servicio=self.servicio,
+                cliente=self.cliente,
+                fecha=date.today() + timedelta(days=1 + i),
+                hora_inicio=time(14, 0),
+                hora_fin=time(15, 0),
+                estado="confirmada",
+            )
+            for i in range(5)
+        ]
+
+    def _sync(self):
+        return sync_calendar_incremental(service=self.service, calendar_id="primary")
+
+    def _llamadas(self):
+        calls = self.service.events_service.calls
+        return calls["insert"] + calls["update"]
+
+    def test_sin_cambios_no_llama_a_la_api(self):
+        self.assertEqual(self._sync(), (5, 0))
+        self.assertEqual(self._llamadas(), 5)
+        self.assertTrue(SyncWatermark.objects.filter(nombre="calendar_sync").exists())
+
+        # Estado estable: marca de agua + SELECT, sin peticiones
+        with self.assertNumQueries(3):
+            self.assertEqual(self._sync(), (0, 0))
+        self.assertEqual(self._llamadas(), 5)
+
+    def test_solo_envia_citas_modificadas(self):
+        self._sync()
+        cita = self.citas[2]
+        cita.refresh_from_db()
+        cita.hora_inicio, cita.hora_fin = time(18, 0), time(19, 0)
+        cita.save()
+
+        self.assertEqual(self._sync(), (0, 1))
+        self.assertEqual(self.service.events_service.calls["update"], 1)
+        evento = self.service.events_service.store[Cita.objects.get(pk=cita.pk).event_id]
+        self.assertIn("T18:00", evento["start"]["dateTime"])
+
+    def test_cambio_de_cliente_reenvia_sus_citas(self):
+        self._sync()
+        self.cliente.nombre = "Cliente Renombrado"
+        self.cliente.save()
+
+        self.assertEqual(self._sync(), (0, 5))
+        self.assertTrue(
+            all("Cliente Renombrado" in e["summary"] for e in self.service.events_service.store.values())
+        )
+
+    def test_cita_fallida_se_reintenta(self):
+        self._sync()
+        marca_anterior = SyncWatermark.objects.get(nombre="calendar_sync").valor
+        cita = Cita.objects.get(pk=self.citas[0].pk)
+        cita.notas = "Cambio"
+        cita.save()
+        with mock.patch.object(
+            self.service.events_service, "update", return_value=_FakeRequest(exception=HttpError(_FakeResponse(500), b""))
+        ), self.assertLogs("reservas.google_sync", level="WARNING"):
+            self.assertEqual(self._sync(), (0, 0))
+
+        marca = SyncWatermark.objects.get(nombre="calendar_sync").valor
+        self.assertLessEqual(marca, Cita.objects.get(pk=cita.pk).actualizado_en)
+        self.assertGreaterEqual(marca, marca_anterior)
+        self.assertEqual(self._sync(), (0, 1))
+
+    def test_empates_de_actualizado_en_mayores_que_limit(self):
+        # Renombrar el servicio marca todas sus citas con el mismo actualizado_en
+        extra = [
+            Cita(
+                negocio=self.negocio,
+                servicio=self.servicio,
+                cliente=self.cliente,
+                fecha=date.today() + timedelta(days=10 + i),
+                hora_inicio=time(14, 0),
+                hora_fin=time(15, 0),
+                estado="confirmada",
+            )
+            for i in range(7)
+        ]
+        Cita.objects.bulk_create(extra)
+        sync_calendar_incremental(limit=50, service=self.service, calendar_id="primary")
+        self.servicio.nombre = "Servicio Renombrado"
+        self.servicio.save()
+        # El renombrado se confirmó después de la marca de agua y hace más que el margen
+        SyncWatermark.objects.filter(nombre="calendar_sync").update(valor=timezone.now() - WATERMARK_MARGEN * 4)
+        Cita.objects.update(actualizado_en=timezone.now() - WATERMARK_MARGEN * 2)
+        self.assertEqual(Cita.objects.values("actualizado_en").distinct().count(), 1)
+
+        for _ in range(3):
+            sync_calendar_incremental(limit=5, service=self.service, calendar_id="primary")
+
+        store = self.service.events_service.store
+        self.assertEqual(len(store), 12)
+        self.assertTrue(all("Servicio Renombrado" in e["summary"] for e in store.values()))
+        self.assertEqual(self.service.events_service.calls["update"], 12)
+
+    def test_cita_fallida_con_empates_se_reintenta(self):
+        self._sync()
+        Cita.objects.update(notas="Cambio masivo")
+        fallida = self.citas[3]
+        update_original = self.service.events_service.update
+
+        def update(calendarId, eventId, body):
+            if eventId == Cita.objects.get(pk=fallida.pk).event_id:
+                return _FakeRequest(exception=HttpError(_FakeResponse(500), b""))
+            return update_original(calendarId=calendarId, eventId=eventId, body=body)
+
+        with mock.patch.object(self.service.events_service, "update", side_effect=update), self.assertLogs(
+            "reservas.google_sync", level="WARNING"
+        ):
+            self.assertEqual(sync_calendar_incremental(limit=5, service=self.service, calendar_id="primary"), (0, 4))
+        # Solo se reintenta la fallida y las que le siguen en el keyset
+        self.assertEqual(self._sync(), (0, 1))
+
+    @mock.patch("reservas.google_sync._get_service")
+    def test_sync_individual_omite_si_no_cambio(self, mock_get_service):
+        mock_get_service.return_value = (self.service, "primary")
+        cita = Cita.objects.get(pk=self.citas[0].pk)
+        self.assertTrue(sync_cita_to_calendar(cita))
+        self.assertTrue(sync_cita_to_calendar(Cita.objects.get(pk=cita.pk)))
+        self.assertEqual(self._llamadas(), 1)
+        self.assertTrue(Cita.objects.get(pk=cita.pk).calendar_synced_at)
+
+    @mock.patch("reservas.google_sync._get_service")
+    def test_alta_reservada_por_otro_proceso_no_se_duplica(self, mock_get_service):
+        mock_get_service.return_value = (self.service, "primary")
+        cita = Cita.objects.get(pk=self.citas[0].pk)
+        # Otro proceso reservó el alta hace un instante y aún no guardó su event_id
+        marca = f"{RESERVA_PREFIJO}{int(timezone.now().timestamp()):011d}:otro"
+        Cita.objects.filter(pk=cita.pk).update(event_id=marca)
+
+        self.assertFalse(sync_cita_to_calendar(Cita.objects.get(pk=cita.pk)))
+        self.assertEqual(self._sync(), (4, 0))
+        self.assertEqual(Cita.objects.get(pk=cita.pk).event_id, marca)
+        self.assertEqual(len(self.service.events_service.store), 4)
+
+    def test_lote_completo_respeta_el_margen(self):
+        sync_calendar_incremental(limit=5, service=self.service, calendar_id="primary")
+        marca = SyncWatermark.objects.get(nombre="calendar_sync").valor
+        self.assertLessEqual(marca, timezone.now() - WATERMARK_MARGEN)
+
+        # Una fila confirmada tarde con actualizado_en anterior al último lote
+        tardia = Cita.objects.create(
+            negocio=self.negocio,
+            servicio=self.servicio,
+            cliente=self.cliente,
+            fecha=date.today() + timedelta(days=20),
+            hora_inicio=time(14, 0),
+            hora_fin=time(15, 0),
+            estado="confirmada",
+        )
+        Cita.objects.filter(pk=tardia.pk).update(actualizado_en=timezone.now() - WATERMARK_MARGEN / 2)
+
+        self.assertEqual(self._sync(), (1, 0))
+        self.assertTrue(Cita.objects.get(pk=tardia.pk).event_id)
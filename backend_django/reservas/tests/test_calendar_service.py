@@ -0,0 +1,225 @@
+from datetime import date, datetime, time, timedelta
+from datetime import timezone as dt_timezone
+from unittest import mock
+
+from google.auth.exceptions import TransportError
+
+from .. import google_sync
+from ..models import CalendarCredential, Cita, Negocio, Servicio
+from .base import BaseTestData, _FakeCalendarService
+
+
+def _credenciales(expira_en: timedelta, token: str = "x") -> dict:
+    expiry = datetime.now(dt_timezone.utc) + expira_en
+    return {
+        "token": token,
+        "refresh_token": "r",
+        "token_uri": "https://oauth2.googleapis.com/token",
+        "client_id": "cid",
+        "client_secret": "secret",
+        "scopes": google_sync.SCOPES,
+        "expiry": expiry.strftime("%Y-%m-%dT%H:%M:%SZ"),
+    }
+
+
+@mock.patch("reservas.google_sync.build", side_effect=lambda *args, **kwargs: _FakeCalendarService())
+class ServiceCacheTests(BaseTestData):
+    def setUp(self):
+        super().setUp()
+        google_sync.invalidar_service_cache()
+        self.cred = CalendarCredential.objects.create(
+            nombre="default", calendar_id="primary", credentials_json=_credenciales(timedelta(hours=1))
+        )
+
+    def test_reutiliza_service_con_una_consulta(self, mock_build):
+        service, calendar_id = google_sync._get_service()
+        self.assertEqual(calendar_id, "primary")
+        with self.assertNumQueries(1):
+            self.assertIs(google_sync._get_service()[0], service)
+        self.assertEqual(mock_build.call_count, 1)
+
+    def test_guardar_credencial_invalida(self, mock_build):
+        primero, _ = google_sync._get_service()
+        self.cred.calendar_id = "otro"
+        self.cred.save()
+        segundo, calendar_id = google_sync._get_service()
+        self.assertIsNot(primero, segundo)
+        self.assertEqual(calendar_id, "otro")
+        self.assertEqual(mock_build.call_count, 2)
+
+        self.cred.delete()
+        self.assertEqual(google_sync._get_service(), (None, None))
+
+    def test_refresca_antes_de_expirar(self, mock_build):
+        CalendarCredential.objects.filter(pk=self.cred.pk).update(
+            credentials_json=_credenciales(timedelta(minutes=2))
+        )
+
+        def _refresh(creds, request):
+            creds.token = "nuevo"
+            creds.expiry = datetime.now(dt_timezone.utc).replace(tzinfo=None) + timedelta(hours=1)
+
+        with mock.patch("google.oauth2.credentials.Credentials.refresh", autospec=True, side_effect=_refresh) as refresh:
+            google_sync._get_service()
+            google_sync._get_service()
+
+        self.assertEqual(refresh.call_count, 1)
+        self.cred.refresh_from_db()
+        self.assertEqual(self.cred.credentials_json["token"], "nuevo")
+
+    def test_refresco_sin_locks_tomados(self, mock_build):
+        CalendarCredential.objects.filter(pk=self.cred.pk).update(
+            credentials_json=_credenciales(timedelta(minutes=2))
+        )
+        tomados = []
+
+        def _refresh(creds, request):
+            tomados.append(google_sync._service_lock.locked() or google_sync._lock_credencial(self.cred.pk).locked())
+            creds.token = "nuevo"
+            creds.expiry = datetime.now(dt_timezone.utc).replace(tzinfo=None) + timedelta(hours=1)
+
+        with mock.patch("google.oauth2.credentials.Credentials.refresh", autospec=True, side_effect=_refresh):
+            self.assertIsNotNone(google_sync._get_service()[0])
+        self.assertEqual(tomados, [False])
+
+    def test_refresco_fallido_se_reintenta(self, mock_build):
+        CalendarCredential.objects.filter(pk=self.cred.pk).update(credentials_json=_credenciales(-timedelta(minutes=1)))
+        cita = Cita.objects.create(
+            negocio=self.negocio,
+            servicio=self.servicio,
+            cliente=self.cliente,
+            fecha=date.today() + timedelta(days=1),
+            hora_inicio=time(14, 0),
+            hora_fin=time(15, 0),
+        )
+        with mock.patch(
+            "google.oauth2.credentials.Credentials.refresh", side_effect=TransportError("timeout")
+        ), self.assertLogs("reservas.google_sync", level="WARNING"):
+            with self.assertRaises(google_sync.CalendarNoDisponible):
+                google_sync._get_service()
+            # Distinto de "sin credenciales": el outbox debe reintentar
+            self.assertFalse(google_sync.sync_cita_to_calendar(cita))
+            self.assertFalse(google_sync.delete_event_from_calendar("evt_1"))
+            self.assertTrue(google_sync.calendar_status()["refresh_failed"])
+        self.assertEqual(mock_build.call_count, 0)
+
+    def test_sync_por_cita_construye_y_carga_credencial_una_vez(self, mock_build):
+        cita = Cita.objects.create(
+            negocio=self.negocio,
+            servicio=self.servicio,
+            cliente=self.cliente,
+            fecha=date.today() + timedelta(days=1),
+            hora_inicio=time(14, 0),
+            hora_fin=time(15, 0),
+        )
+        with mock.patch(
+            "reservas.google_sync.Credentials.from_authorized_user_info",
+            wraps=google_sync.Credentials.from_authorized_user_info,
+        ) as cargar:
+            for i in range(10):
+                cita.notas = f"cambio {i}"
+                self.assertTrue(google_sync.sync_cita_to_calendar(cita))
+
+        self.assertEqual(mock_build.call_count, 1)
+        self.assertEqual(cargar.call_count, 1)
+
+
+class CredencialesPorNegocioTests(BaseTestData):
+    def setUp(self):
+        super().setUp()
+        google_sync.invalidar_service_cache()
+        self.otro = Negocio.objects.create(nombre="Sucursal Norte", propietario=self.user)
+        self.servicio_otro = Servicio.objects.create(negocio=self.otro, nombre="Mesa", duracion_minutos=60, precio=0)
+        self.cliente_otro = self.otro.clientes.create(nombre="Cliente Norte", email="norte@ejemplo.com")
+        CalendarCredential.objects.create(
+            nombre="default", calendar_id="cal-default", credentials_json=_credenciales(timedelta(hours=1), "tok-default")
+        )
+        CalendarCredential.objects.create(
+            nombre=google_sync.nombre_credencial_negocio(self.otro.id),
+            calendar_id="cal-norte",
+            credentials_json=_credenciales(timedelta(hours=1), "tok-norte"),
+        )
+        # Un service falso por credencial, identificado por su token
+        self.servicios = {}
+
+        def _build(*args, credentials=None, **kwargs):
+            return self.servicios.setdefault(credentials.token, _FakeCalendarService())
+
+        patcher = mock.patch("reservas.google_sync.build", side_effect=_build)
+        self.mock_build = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _cita(self, negocio, servicio, cliente, dias=1):
+        return Cita.objects.create(
+            negocio=negocio,
+            servicio=servicio,
+            cliente=cliente,
+            fecha=date.today() + timedelta(days=dias),
+            hora_inicio=time(14, 0),
+            hora_fin=time(15, 0),
+        )
+
+    def test_resuelve_credencial_del_negocio_o_default(self):
+        _, calendar_propio = google_sync._get_service(self.otro.id)
+        _, calendar_default = google_sync._get_service(self.negocio.id)
+        self.assertEqual(calendar_propio, "cal-norte")
+        self.assertEqual(calendar_default, "cal-default")
+        # Cada credencial tiene su service cacheado
+        self.assertIs(google_sync._get_service(self.otro.id)[0], self.servicios["tok-norte"])
+        self.assertEqual(self.mock_build.call_count, 2)
+
+    def test_sin_default_no_usa_credencial_de_otro_negocio(self):
+        CalendarCredential.objects.filter(nombre="default").delete()
+        self.assertEqual(google_sync._get_service(self.negocio.id), (None, None))
+        self.assertEqual(google_sync._get_service(self.otro.id)[1], "cal-norte")
+
+    def test_resync_particiona_por_negocio(self):
+        for dias in range(1, 4):
+            self._cita(self.negocio, self.servicio, self.cliente, dias)
+            self._cita(self.otro, self.servicio_otro, self.cliente_otro, dias)
+
+        self.assertEqual(google_sync.resync_calendar_events(), (6, 0))
+
+        default = self.servicios["tok-default"].events_service.store
+        norte = self.servicios["tok-norte"].events_service.store
+        self.assertEqual(len(default), 3)
+        self.assertEqual(len(norte), 3)
+        self.assertTrue(all("Cliente Norte" in e["summary"] for e in norte.values()))
+        for cita in Cita.objects.filter(negocio=self.otro):
+            self.assertIn(cita.event_id, norte)
+
+    def test_particionar_carga_cada_negocio_una_vez(self):
+        citas = [self._cita(self.negocio, self.servicio, self.cliente, dias) for dias in range(1, 4)]
+        citas += [self._cita(self.otro, self.servicio_otro, self.cliente_otro, dias) for dias in range(1, 4)]
+
+        with mock.patch("reservas.google_sync._cargar_calendar", wraps=google_sync._cargar_calendar) as cargar:
+            particiones, no_disponibles = google_sync._particionar(citas)
+
+        self.assertEqual(cargar.call_count, 2)
+        self.assertEqual(sorted(p[1] for p in particiones), ["cal-default", "cal-norte"])
+        self.assertEqual(no_disponibles, [])
+        for service, _calendar_id, creds, _citas in particiones:
+            self.assertIs(service, self.servicios[creds.token])
+
+    def test_guardar_credencial_solo_invalida_la_suya(self):
+        google_sync._get_service(self.negocio.id)
+        google_sync._get_service(self.otro.id)
+        self.assertEqual(self.mock_build.call_count, 2)
+
+        # Refresco de token del negocio "norte": el service default sigue en cache
+        norte = CalendarCredential.objects.get(nombre=google_sync.nombre_credencial_negocio(self.otro.id))
+        norte.save()
+        with self.assertNumQueries(1):
+            google_sync._get_service(self.negocio.id)
+        google_sync._get_service(self.otro.id)
+        self.assertEqual(self.mock_build.call_count, 3)
+
+    def test_borrado_va_al_calendario_del_negocio(self):
+        cita = self._cita(self.otro, self.servicio_otro, self.cliente_otro)
+        self.assertTrue(google_sync.sync_cita_to_calendar(cita))
+        cita.refresh_from_db()
+        norte = self.servicios["tok-norte"].events_service.store
+        self.assertIn(cita.event_id, norte)
+
+        self.assertTrue(google_sync.delete_cita_from_calendar(cita))
+        self.assertNotIn(cita.event_id, norte)
@@ -0,0 +1,122 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from .. import google_sync
+from ..models import CalendarCredential, Cita, Cliente, Mesa, Negocio
+
+
+class GenerarCargaTests(TestCase):
+    def _generar(self, **extra):
+        opciones = {
+            "negocios": 1,
+            "mesas": 8,
+            "clientes": 50,
+            "meses": 1,
+            "dias_futuros": 7,
+            "permitir_bd": True,
+            "stdout": StringIO(),
+        }
+        opciones.update(extra)
+        call_command("generar_carga", **opciones)
+
+    def test_genera_volumen_consistente_y_reproducible(self):
+        self._generar()
+        negocio = Negocio.objects.get(nombre="Carga 1")
+        self.assertEqual(Mesa.objects.filter(negocio=negocio).count(), 8)
+        self.assertEqual(Cliente.objects.filter(negocio=negocio).count(), 50)
+        self.assertGreater(Cita.objects.filter(negocio=negocio).count(), 100)
+        self.assertFalse(Cita.objects.filter(negocio=negocio, fecha__week_day=5).exists())  # jueves cerrado
+
+        # Ninguna mesa tiene dos citas activas solapadas y cada grupo cabe en su mesa
+        por_mesa = {}
+        for mesa_id, fecha, inicio, fin, personas, cap_min, cap_max in Cita.objects.filter(
+            negocio=negocio, mesa__isnull=False
+        ).values_list(
+            "mesa_id", "fecha", "hora_inicio", "hora_fin", "personas", "mesa__capacidad_min", "mesa__capacidad_max"
+        ):
+            self.assertTrue(cap_min <= personas <= cap_max)
+            por_mesa.setdefault((mesa_id, fecha), []).append((inicio, fin))
+        for intervalos in por_mesa.values():
+            intervalos.sort()
+            self.assertTrue(all(a[1] <= b[0] for a, b in zip(intervalos, intervalos[1:])))
+
+        # Misma semilla, mismas citas
+        firma = list(Cita.objects.filter(negocio=negocio).order_by("id").values_list("fecha", "hora_inicio", "personas"))
+        self._generar()
+        otro = Negocio.objects.get(nombre="Carga 2")
+        self.assertEqual(
+            list(Cita.objects.filter(negocio=otro).order_by("id").values_list("fecha", "hora_inicio", "personas")),
+            firma,
+        )
+
+    @override_settings(DEBUG=False)
+    def test_sin_debug_exige_confirmar_la_bd(self):
+        # También sobre la BD de pruebas: el nombre no decide nada
+        with self.assertRaisesMessage(CommandError, "--permitir-bd"):
+            self._generar(permitir_bd=False)
+        self.assertFalse(Negocio.objects.exists())
+
+        self._generar()
+        self.assertTrue(Negocio.objects.filter(nombre="Carga 1").exists())
+
+    @override_settings(DEBUG=True)
+    def test_con_debug_no_exige_confirmacion(self):
+        self._generar(permitir_bd=False)
+        self.assertTrue(Negocio.objects.filter(nombre="Carga 1").exists())
+
+    def test_bench_emite_json_con_tiempos_y_consultas(self):
+        self._generar()
+        with tempfile.TemporaryDirectory() as tmp:
+            ruta = os.path.join(tmp, "bench.json")
+            call_command("bench_reservas", "--repeticiones", "2", "--output", ruta, stdout=StringIO())
+            with open(ruta, encoding="utf-8") as fh:
+                informe = json.load(fh)
+
+            out = StringIO()
+            call_command("bench_reservas", "--repeticiones", "1", "--output", ruta + "2", "--comparar", ruta, stdout=out)
+
+        self.assertEqual(informe["meta"]["repeticiones"], 2)
+        self.assertGreater(informe["meta"]["volumen"]["citas"], 0)
+        for caso in ("available_slots", "suggest_slot", "cita_validate", "mesas_disponibilidad", "citas_listado"):
+            self.assertIn(caso, informe["resultados"])
+            self.assertGreaterEqual(informe["resultados"][caso]["ms"]["mediana"], 0)
+        self.assertEqual(informe["resultados"]["available_slots_cache"]["consultas"], 0)
+        self.assertEqual(informe["resultados"]["citas_listado"]["consultas"], 1)
+        self.assertEqual(informe["resultados"]["metricas_observar_1000"]["consultas"], 0)
+        for caso in ("disponibilidad_rango", "disponibilidad_rango_compacto"):
+            self.assertLessEqual(informe["resultados"][caso]["consultas"], 1)
+        self.assertIn("available_slots:", out.getvalue())
+        self.assertNotIn("calendar_service", informe["resultados"])
+
+    def test_bench_mide_service_de_calendar_si_hay_credencial(self):
+        self._generar()
+        CalendarCredential.objects.create(
+            nombre="default",
+            calendar_id="primary",
+            credentials_json={
+                "token": "x",
+                "refresh_token": "r",
+                "token_uri": "https://oauth2.googleapis.com/token",
+                "client_id": "cid",
+                "client_secret": "secret",
+                "expiry": "2999-01-01T00:00:00Z",
+            },
+        )
+        google_sync.invalidar_service_cache()
+        self.addCleanup(google_sync.invalidar_service_cache)
+        out = StringIO()
+        with mock.patch("reservas.google_sync.build", return_value=object()) as build:
+            call_command("bench_reservas", "--repeticiones", "3", stdout=out)
+
+        resultados = json.loads(out.getvalue())["resultados"]
+        # En frío: 1 consulta de metadatos + 1 carga de la credencial; en cache solo la primera
+        self.assertEqual(resultados["calendar_service_frio"]["consultas"], 2)
+        self.assertEqual(resultados["calendar_service"]["consultas"], 1)
+        self.assertEqual(build.call_count, 3)
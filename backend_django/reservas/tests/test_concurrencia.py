@@ -0,0 +1,122 @@
+import threading
+import time as _time
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError, connection, transaction
+from django.test import TransactionTestCase, skipUnlessDBFeature
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from ..agenda_lock import bloquear_agenda
+from ..models import AgendaDia, Cita, Cliente, Mesa, Negocio, Servicio
+
+
+class ReservaConcurrenteTests(TransactionTestCase):
+    """
+    Lanza muchas reservas simultáneas al mismo horario, mitad por el endpoint
+    público y mitad por el CRUD del admin: nunca debe haber más citas activas
+    que mesas, aunque todas pasen la validación al mismo tiempo.
+    """
+
+    HILOS = 12
+    MESAS = 3
+
+    def setUp(self):
+        cache.clear()
+        user = get_user_model().objects.create_user("owner", "owner@example.com", "pass1234")
+        self.user = user
+        self.negocio = Negocio.objects.create(nombre="Concurrencia", propietario=user)
+        self.servicio = Servicio.objects.create(negocio=self.negocio, nombre="Mesa", duracion_minutos=60, precio=0)
+        for i in range(self.MESAS):
+            Mesa.objects.create(negocio=self.negocio, servicio=self.servicio, nombre=f"Mesa {i}", tipo="normal_2")
+        self.clientes = {
+            i: Cliente.objects.create(negocio=self.negocio, nombre=f"Admin {i}") for i in range(1, self.HILOS, 2)
+        }
+        hoy = date.today()
+        self.fecha = hoy + timedelta(days=(4 - hoy.weekday()) % 7 + 7)
+
+    def _reservar(self, i, barrera, resultados):
+        client = APIClient()
+        if i % 2:
+            # Alta desde el admin: cliente ya registrado y usuario autenticado
+            client.force_authenticate(self.user)
+            url = reverse("cita-list")
+            payload = {"negocio": self.negocio.id, "cliente": self.clientes[i].id, "estado": "confirmada"}
+        else:
+            url = reverse("crear-cita-publica")
+            payload = {"negocio": self.negocio.id, "nombre": f"Cliente {i}", "email": f"cliente{i}@example.com"}
+        payload.update(
+            servicio=self.servicio.id, fecha=self.fecha.isoformat(), hora_inicio="20:00", hora_fin="21:00"
+        )
+        barrera.wait()
+        try:
+            resp = client.post(url, payload, format="json")
+            resultados.append(resp.status_code)
+        finally:
+            connection.close()
+
+    def test_no_sobrevende_mesas(self):
+        barrera = threading.Barrier(self.HILOS)
+        resultados = []
+        hilos = [
+            threading.Thread(target=self._reservar, args=(i, barrera, resultados))
+            for i in range(self.HILOS)
+        ]
+        inicio = _time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = _time.perf_counter() - inicio
+
+        activas = Cita.objects.filter(
+            servicio=self.servicio, fecha=self.fecha, estado__in=("pendiente", "confirmada")
+        ).count()
+        self.assertEqual(len(resultados), self.HILOS)
+        self.assertEqual(resultados.count(201), self.MESAS, resultados)
+        self.assertEqual(resultados.count(400), self.HILOS - self.MESAS, resultados)
+        self.assertEqual(activas, self.MESAS)
+        self.assertTrue(AgendaDia.objects.filter(servicio=self.servicio, fecha=self.fecha).exists())
+        # Throughput informativo: el bloqueo por día no debe degradar a segundos por reserva
+        self.assertLess(duracion, 30, f"{self.HILOS / duracion:.1f} reservas/s")
+
+
+@skipUnlessDBFeature("has_select_for_update", "has_select_for_update_nowait")
+class BloqueoFilaTests(TransactionTestCase):
+    """
+    Camino de producción (Postgres/MySQL, DB_ENGINE): el bloqueo es la fila
+    AgendaDia con select_for_update, no el lock de proceso de SQLite.
+    """
+
+    def setUp(self):
+        user = get_user_model().objects.create_user("owner", "owner@example.com", "pass1234")
+        negocio = Negocio.objects.create(nombre="Bloqueo", propietario=user)
+        self.servicio = Servicio.objects.create(negocio=negocio, nombre="Mesa", duracion_minutos=60, precio=0)
+        self.fecha = date.today() + timedelta(days=7)
+
+    def test_fila_bloqueada_hasta_el_commit(self):
+        dentro, soltar = threading.Event(), threading.Event()
+
+        def sostener():
+            try:
+                with bloquear_agenda(self.servicio.id, self.fecha):
+                    dentro.set()
+                    soltar.wait(10)
+            finally:
+                connection.close()
+
+        hilo = threading.Thread(target=sostener)
+        hilo.start()
+        self.assertTrue(dentro.wait(10))
+        try:
+            with self.assertRaises(DatabaseError), transaction.atomic():
+                AgendaDia.objects.select_for_update(nowait=True).get(servicio=self.servicio, fecha=self.fecha)
+        finally:
+            soltar.set()
+            hilo.join()
+
+        # Liberado tras el commit del primero
+        with transaction.atomic():
+            AgendaDia.objects.select_for_update(nowait=True).get(servicio=self.servicio, fecha=self.fecha)
@@ -0,0 +1,120 @@
+from datetime import time
+
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from ..models import Cita, Cliente, Mesa
+from .base import BaseTestData, proximo_dia_abierto
+
+
+@override_settings(GET_CONDICIONAL_HABILITADO=True)
+class GetCondicionalTests(BaseTestData):
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.fecha = proximo_dia_abierto(3)
+
+    def _etag(self, url, params):
+        # La primera lectura crea las versiones; desde la segunda hay ETag
+        self.api.get(url, params)
+        response = self.api.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("ETag", response)
+        return response
+
+    def _reservar(self):
+        otro = Cliente.objects.create(negocio=self.negocio, nombre="Otro", email="otro@ejemplo.com")
+        Cita.objects.create(
+            negocio=self.negocio,
+            servicio=self.servicio,
+            cliente=otro,
+            mesa=self.mesa,
+            fecha=self.fecha,
+            hora_inicio=time(14, 0),
+            hora_fin=time(15, 0),
+            estado="confirmada",
+        )
+
+    def test_disponibilidad_304_sin_consultas_hasta_que_cambia_la_agenda(self):
+        url = reverse("agenda-disponibilidad")
+        params = {"servicio": self.servicio.id, "fecha": self.fecha.isoformat()}
+        response = self._etag(url, params)
+        etag = response["ETag"]
+        self.assertTrue(etag.startswith('"') and not etag.startswith("W/"))
+        self.assertIn("public", response["Cache-Control"])
+        self.assertIn("max-age=5", response["Cache-Control"])
+
+        with self.assertNumQueries(0):
+            no_modificado = self.api.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(no_modificado.status_code, 304)
+        self.assertEqual(no_modificado["ETag"], etag)
+        self.assertIn("max-age=5", no_modificado["Cache-Control"])
+
+        # Otra fecha u otros parámetros no comparten ETag
+        otra = self._etag(url, {**params, "fecha": proximo_dia_abierto(4).isoformat()})
+        self.assertNotEqual(otra["ETag"], etag)
+
+        self._reservar()
+        response = self.api.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertNotIn({"hora_inicio": "14:00", "hora_fin": "15:00"}, response.json())
+
+    def test_rango_y_mesas(self):
+        rango = self._etag(
+            reverse("agenda-disponibilidad-rango"),
+            {"servicio": self.servicio.id, "desde": self.fecha.isoformat(), "hasta": self.fecha.isoformat()},
+        )
+        params_mesas = {"servicio": "all", "fecha": self.fecha.isoformat(), "hora_inicio": "14:00"}
+        mesas = self._etag(reverse("mesas-disponibilidad-publica"), params_mesas)
+
+        self.assertEqual(
+            self.api.get(reverse("mesas-disponibilidad-publica"), params_mesas, HTTP_IF_NONE_MATCH=mesas["ETag"]).status_code,
+            304,
+        )
+        Mesa.objects.create(negocio=self.negocio, servicio=self.servicio, nombre="Mesa 9", tipo="normal_4", capacidad_max=4)
+        for url, params, anterior in (
+            (reverse("mesas-disponibilidad-publica"), params_mesas, mesas),
+            (
+                reverse("agenda-disponibilidad-rango"),
+                {"servicio": self.servicio.id, "desde": self.fecha.isoformat(), "hasta": self.fecha.isoformat()},
+                rango,
+            ),
+        ):
+            self.assertEqual(self.api.get(url, params, HTTP_IF_NONE_MATCH=anterior["ETag"]).status_code, 200)
+
+    def test_catalogo_de_servicios(self):
+        url = reverse("servicio-list")
+        response = self.api.get(url)
+        self.assertIn("ETag", response)
+        self.assertIn("max-age=60", response["Cache-Control"])
+        self.assertEqual(self.api.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+        self.servicio.precio = 150
+        self.servicio.save()
+        cambiado = self.api.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(cambiado.status_code, 200)
+
+        self.negocio.nombre = "Nuevo nombre"
+        self.negocio.save()
+        self.assertEqual(self.api.get(url, HTTP_IF_NONE_MATCH=cambiado["ETag"]).status_code, 200)
+
+    def test_parametros_invalidos_sin_etag(self):
+        response = self.api.get(reverse("agenda-disponibilidad"), {"servicio": self.servicio.id, "fecha": "mañana"})
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn("ETag", response)
+        self.assertNotIn("Cache-Control", response)
+
+
+class GetCondicionalSinCacheCompartidoTests(BaseTestData):
+    @override_settings(GET_CONDICIONAL_HABILITADO=False)
+    def test_sin_cache_compartido_no_hay_etag_ni_304(self):
+        api = APIClient()
+        url = reverse("agenda-disponibilidad")
+        params = {"servicio": self.servicio.id, "fecha": proximo_dia_abierto(3).isoformat()}
+        api.get(url, params)
+        response = api.get(url, params, HTTP_IF_NONE_MATCH="*")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)
+        self.assertIn("max-age=", response["Cache-Control"])
@@ -0,0 +1,85 @@
+from datetime import time, timedelta
+from unittest import mock
+
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from ..deteccion import DetectorConsultas, NMasUnoError, forma_consulta
+from ..models import Cita, Cliente, Mesa, Servicio
+from ..views import ServicioViewSet
+from .base import BaseTestData, proximo_dia_abierto
+
+
+class FormaConsultaTests(BaseTestData):
+    def test_normaliza_literales_y_listas_in(self):
+        self.assertEqual(
+            forma_consulta('SELECT * FROM "t" WHERE "t"."id" IN (%s, %s, %s) AND x = 5 AND y = \'a\' LIMIT 21'),
+            forma_consulta('SELECT * FROM "t" WHERE "t"."id" IN (%s) AND x = 7 AND y = \'bb\' LIMIT 21'),
+        )
+        # Identificadores con dígitos (alias, savepoints) no se tocan
+        self.assertIn('T5."id"', forma_consulta('SELECT T5."id" FROM "t" T5'))
+
+
+class DetectorUmbralDeTestsTests(BaseTestData):
+    def test_n_mas_uno_con_los_pocos_datos_de_los_fixtures_rompe_el_test(self):
+        # Justo el umbral de los tests: un listado de 3 servicios sobre el fixture base
+        for i in range(self.detector_umbral - 1):
+            Servicio.objects.create(negocio=self.negocio, nombre=f"Extra {i}", duracion_minutos=60, precio=0)
+        api = APIClient()
+        api.force_authenticate(self.user)
+
+        with mock.patch.object(ServicioViewSet, "queryset", Servicio.objects.order_by("id")):
+            with self.assertRaisesMessage(NMasUnoError, "Posible N+1 en GET /api/servicios/"):
+                api.get(reverse("servicio-list"))
+        self.assertEqual(api.get(reverse("servicio-list")).status_code, 200)
+
+
+class DetectorListadosTests(BaseTestData):
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+        for i in range(6):
+            servicio = Servicio.objects.create(negocio=self.negocio, nombre=f"S{i}", duracion_minutos=60, precio=0)
+            Mesa.objects.create(negocio=self.negocio, servicio=servicio, nombre=f"M{i}", tipo="normal_2")
+            cliente = Cliente.objects.create(negocio=self.negocio, nombre=f"C{i}", email=f"c{i}@ejemplo.com")
+            Cita.objects.create(
+                negocio=self.negocio,
+                servicio=servicio,
+                cliente=cliente,
+                fecha=proximo_dia_abierto() + timedelta(days=i),
+                hora_inicio=time(14, 0),
+                hora_fin=time(15, 0),
+            )
+
+    def test_listados_sin_n_mas_uno(self):
+        for nombre in ("servicio-list", "cliente-list", "mesa-list", "cita-list", "negocio-list"):
+            with self.subTest(nombre):
+                self.assertEqual(self.api.get(reverse(nombre)).status_code, 200)
+
+    def test_regresion_en_un_viewset_rompe_el_test(self):
+        with mock.patch.object(ServicioViewSet, "queryset", Servicio.objects.order_by("id")):
+            with self.assertRaisesMessage(NMasUnoError, "Posible N+1 en GET /api/servicios/"):
+                self.api.get(reverse("servicio-list"))
+
+    def test_context_manager_y_assert(self):
+        with DetectorConsultas(umbral=3) as detector:
+            nombres = [servicio.negocio.nombre for servicio in Servicio.objects.all()]
+        self.assertEqual(len(nombres), 7)
+        self.assertEqual(detector.repetidas[0].veces, 7)
+        self.assertIn("test_deteccion.py", detector.repetidas[0].origen)
+
+        with self.assertRaises(NMasUnoError):
+            with self.assertSinNMasUno():
+                [servicio.negocio.nombre for servicio in Servicio.objects.all()]
+        with self.assertSinNMasUno():
+            [servicio.negocio.nombre for servicio in Servicio.objects.select_related("negocio")]
+
+    @override_settings(DETECTOR_CONSULTAS="log", DETECTOR_CONSULTAS_LENTAS_MS=0)
+    def test_modo_log_avisa_sin_romper(self):
+        with mock.patch.object(ServicioViewSet, "queryset", Servicio.objects.order_by("id")):
+            with self.assertLogs("reservas.deteccion", level="WARNING") as logs:
+                self.assertEqual(self.api.get(reverse("servicio-list")).status_code, 200)
+        self.assertTrue(any("Posible N+1" in linea for linea in logs.output))
+        self.assertTrue(any("Consulta lenta" in linea for linea in logs.output))
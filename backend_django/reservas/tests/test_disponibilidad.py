@@ -0,0 +1,190 @@
+from datetime import date, time, timedelta
+
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from ..horarios import horario_de
+from ..models import Cita
+from ..renderers import dias_json
+from ..utils import available_slots, suggest_slot
+from .base import BaseTestData, proximo_dia_abierto
+
+
+def _proximo_lunes() -> date:
+    hoy = date.today()
+    return hoy + timedelta(days=7 - hoy.weekday())
+
+
+class AgendaAvailabilityRangeTests(BaseTestData):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.lunes = _proximo_lunes()
+        Cita.objects.create(
+            negocio=self.negocio,
+            servicio=self.servicio,
+            cliente=self.cliente,
+            fecha=self.lunes + timedelta(days=1),
+            hora_inicio=time(14, 0),
+            hora_fin=time(15, 0),
+            estado="confirmada",
+        )
+
+    def _get(self, desde, hasta, **extra):
+        params = {"servicio": self.servicio.id, "desde": desde.isoformat(), "hasta": hasta.isoformat(), **extra}
+        return self.client.get(reverse("agenda-disponibilidad-rango"), params)
+
+    def test_devuelve_slots_por_dia_igual_que_consulta_individual(self):
+        resp = self._get(self.lunes, self.lunes + timedelta(days=6))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.json()), 7)
+        for item in resp.json():
+            esperado = [
+                {"hora_inicio": h_ini.strftime("%H:%M"), "hora_fin": h_fin.strftime("%H:%M")}
+                for h_ini, h_fin in available_slots(self.servicio, date.fromisoformat(item["fecha"]))
+            ]
+            self.assertEqual(item["slots"], esperado)
+            self.assertEqual(item["disponibles"], len(esperado))
+
+    def test_jueves_cerrado(self):
+        resp = self._get(self.lunes, self.lunes + timedelta(days=6))
+        jueves = resp.json()[3]
+        self.assertEqual(date.fromisoformat(jueves["fecha"]).weekday(), 3)
+        self.assertTrue(jueves["cerrado"])
+        self.assertEqual(jueves["slots"], [])
+
+    def test_modo_conteo_omite_slots(self):
+        resp = self._get(self.lunes, self.lunes + timedelta(days=1), conteo="1")
+        self.assertEqual(resp.status_code, 200)
+        dias = resp.json()
+        self.assertNotIn("slots", dias[0])
+        # La cita de 14:00-15:00 bloquea los slots de 60 min que la tocan
+        self.assertLess(dias[1]["disponibles"], dias[0]["disponibles"])
+
+    def test_numero_de_consultas_constante(self):
+        horario_de(self.negocio.id)  # el horario compilado vive en memoria tras la primera carga
+        with self.assertNumQueries(3):
+            self._get(self.lunes, self.lunes + timedelta(days=6))
+        with self.assertNumQueries(3):
+            self._get(self.lunes, self.lunes + timedelta(days=45))
+
+    def test_valida_rango(self):
+        self.assertEqual(self._get(self.lunes, self.lunes - timedelta(days=1)).status_code, 400)
+        self.assertEqual(self._get(self.lunes, self.lunes + timedelta(days=90)).status_code, 400)
+
+
+class SuggestSlotLookaheadTests(BaseTestData):
+    def test_ventana_completa_en_una_sola_consulta(self):
+        inicio = _proximo_lunes()
+        # Días completamente ocupados (1 mesa) para forzar la búsqueda hacia adelante
+        for offset in range(10):
+            Cita.objects.create(
+                negocio=self.negocio,
+                servicio=self.servicio,
+                cliente=self.cliente,
+                fecha=inicio + timedelta(days=offset),
+                hora_inicio=time(13, 0),
+                hora_fin=time(23, 0),
+                estado="confirmada",
+            )
+
+        # 1 consulta de mesas + 1 consulta de citas para toda la ventana (horario ya en memoria)
+        horario_de(self.negocio.id)
+        with self.assertNumQueries(2):
+            slot = suggest_slot(self.servicio, fecha_desde=inicio, duracion_minutos=60)
+        # lunes + 10 es jueves (cerrado): la sugerencia salta al viernes
+        self.assertEqual(slot.fecha, inicio + timedelta(days=11))
+        self.assertEqual(slot.hora_inicio, time(13, 0))
+
+    def test_sin_disponibilidad_en_la_ventana(self):
+        inicio = _proximo_lunes()
+        for offset in range(3):
+            Cita.objects.create(
+                negocio=self.negocio,
+                servicio=self.servicio,
+                cliente=self.cliente,
+                fecha=inicio + timedelta(days=offset),
+                hora_inicio=time(13, 0),
+                hora_fin=time(23, 0),
+                estado="pendiente",
+            )
+        horario_de(self.negocio.id)
+        with self.assertNumQueries(2):
+            self.assertIsNone(suggest_slot(self.servicio, fecha_desde=inicio, dias_hacia_adelante=2))
+
+
+class RenderSlotsTests(BaseTestData):
+    def setUp(self):
+        super().setUp()
+        self.fecha = proximo_dia_abierto(2)
+        Cita.objects.create(
+            negocio=self.negocio,
+            servicio=self.servicio,
+            cliente=self.cliente,
+            fecha=self.fecha,
+            hora_inicio=time(14, 0),
+            hora_fin=time(15, 0),
+            estado="confirmada",
+        )
+
+    def test_json_identico_al_de_drf(self):
+        slots = available_slots(self.servicio, self.fecha)
+        esperado = JSONRenderer().render(
+            [{"hora_inicio": a.strftime("%H:%M"), "hora_fin": b.strftime("%H:%M")} for a, b in slots]
+        )
+        resp = self.client.get(
+            reverse("agenda-disponibilidad"), {"servicio": self.servicio.id, "fecha": self.fecha.isoformat()}
+        )
+        self.assertEqual(resp.content, esperado)
+        self.assertEqual(resp["Content-Type"], "application/json")
+
+    def test_formato_compacto_en_minutos(self):
+        params = {"servicio": self.servicio.id, "fecha": self.fecha.isoformat()}
+        normal = self.client.get(reverse("agenda-disponibilidad"), params)
+        compacto = self.client.get(reverse("agenda-disponibilidad"), {**params, "format": "compact"})
+
+        self.assertEqual(compacto.status_code, 200)
+        pares = compacto.json()
+        self.assertEqual(pares[0], [13 * 60, 14 * 60])
+        self.assertNotIn([14 * 60, 15 * 60], pares)
+        self.assertEqual(
+            pares,
+            [[_a_minutos(s["hora_inicio"]), _a_minutos(s["hora_fin"])] for s in normal.json()],
+        )
+
+        rango = self.client.get(
+            reverse("agenda-disponibilidad-rango"),
+            {"servicio": self.servicio.id, "desde": self.fecha.isoformat(), "hasta": self.fecha.isoformat(), "format": "compact"},
+        ).json()
+        self.assertEqual(rango[0]["slots"], pares)
+        self.assertEqual(rango[0]["disponibles"], len(pares))
+
+        # Los errores siguen saliendo como JSON normal
+        error = self.client.get(reverse("agenda-disponibilidad"), {"servicio": self.servicio.id, "format": "compact"})
+        self.assertEqual(error.status_code, 400)
+        self.assertIn("detail", error.json())
+
+    def test_rango_igual_byte_a_byte_que_jsonrenderer(self):
+        dias = [
+            (self.fecha + timedelta(days=i), False, [(time(13 + m // 60, m % 60), time(14 + m // 60, m % 60)) for m in range(0, 540, 15)])
+            for i in range(62)
+        ]
+        esperado = JSONRenderer().render(
+            [
+                {
+                    "fecha": fecha,
+                    "cerrado": cerrado,
+                    "disponibles": len(slots),
+                    "slots": [{"hora_inicio": a.strftime("%H:%M"), "hora_fin": b.strftime("%H:%M")} for a, b in slots],
+                }
+                for fecha, cerrado, slots in dias
+            ]
+        )
+        # La velocidad frente a strftime + JSONRenderer se mide en bench_reservas
+        self.assertEqual(dias_json(dias, con_slots=True), esperado)
+
+
+def _a_minutos(hhmm: str) -> int:
+    horas, minutos = hhmm.split(":")
+    return int(horas) * 60 + int(minutos)
@@ -0,0 +1,141 @@
+from datetime import date, time, timedelta
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .. import cache as availability_cache
+from ..asignacion import PlanMesas
+from ..horarios import horario_de
+from ..models import DiaEspecial, HorarioSemanal
+from ..serializers import CitaSerializer
+from ..utils import available_slots, available_slots_range, suggest_slot
+from .base import BaseTestData
+
+
+def _proximo(dia_semana: int) -> date:
+    hoy = date.today()
+    return hoy + timedelta(days=(dia_semana - hoy.weekday()) % 7 + 7)
+
+
+class HorarioTests(BaseTestData):
+    def setUp(self):
+        super().setUp()
+        self.lunes = _proximo(0)
+        self.jueves = _proximo(3)
+        self.viernes = _proximo(4)
+
+    def _serializer(self, fecha, inicio, fin):
+        return CitaSerializer(
+            data={
+                "negocio": self.negocio.id,
+                "servicio": self.servicio.id,
+                "cliente": self.cliente.id,
+                "fecha": fecha,
+                "hora_inicio": inicio,
+                "hora_fin": fin,
+                "estado": "confirmada",
+            }
+        )
+
+    def test_horario_por_defecto(self):
+        self.assertEqual(available_slots(self.servicio, self.jueves), [])
+        slots = available_slots(self.servicio, self.viernes)
+        self.assertEqual(slots[0][0], time(13, 0))
+        self.assertEqual(slots[-1][1], time(23, 0))
+        # La sugerencia ya no propone días cerrados
+        self.assertEqual(suggest_slot(self.servicio, fecha_desde=self.jueves).fecha, self.viernes)
+        serializer = self._serializer(self.jueves, time(14, 0), time(15, 0))
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("cerrado", str(serializer.errors))
+
+    def test_horario_semanal_del_negocio(self):
+        HorarioSemanal.objects.create(negocio=self.negocio, dia_semana=0, apertura=time(18, 0), cierre=time(22, 0))
+        HorarioSemanal.objects.create(negocio=self.negocio, dia_semana=3, apertura=time(12, 0), cierre=time(16, 0))
+
+        slots = available_slots(self.servicio, self.lunes)
+        self.assertEqual((slots[0][0], slots[-1][1]), (time(18, 0), time(22, 0)))
+        self.assertEqual(available_slots(self.servicio, self.jueves)[0][0], time(12, 0))
+
+        fuera = self._serializer(self.lunes, time(14, 0), time(15, 0))
+        self.assertFalse(fuera.is_valid())
+        self.assertIn("entre 18:00 y 22:00", str(fuera.errors))
+        self.assertTrue(self._serializer(self.lunes, time(19, 0), time(20, 0)).is_valid())
+
+    def test_dia_especial_cerrado_y_con_horario(self):
+        DiaEspecial.objects.create(negocio=self.negocio, fecha=self.viernes, cerrado=True, motivo="Festivo")
+        DiaEspecial.objects.create(
+            negocio=self.negocio, fecha=self.jueves, cerrado=False, apertura=time(15, 0), cierre=time(18, 0)
+        )
+
+        por_dia = available_slots_range(self.servicio, self.jueves, self.viernes)
+        self.assertEqual(por_dia[self.viernes], [])
+        self.assertEqual((por_dia[self.jueves][0][0], por_dia[self.jueves][-1][1]), (time(15, 0), time(18, 0)))
+        self.assertEqual(suggest_slot(self.servicio, fecha_desde=self.viernes).fecha, self.viernes + timedelta(days=1))
+
+        response = APIClient().get(
+            reverse("agenda-disponibilidad-rango"),
+            {"servicio": self.servicio.id, "desde": self.jueves.isoformat(), "hasta": self.viernes.isoformat()},
+        )
+        self.assertEqual([dia["cerrado"] for dia in response.json()], [False, True])
+
+    def test_horario_compilado_en_memoria_y_invalidado_al_guardar(self):
+        horario_de(self.negocio.id)
+        with self.assertNumQueries(0):
+            for offset in range(60):
+                horario_de(self.negocio.id).intervalo(self.lunes + timedelta(days=offset))
+
+        self.assertNotEqual(available_slots(self.servicio, self.viernes), [])
+        especial = DiaEspecial.objects.create(negocio=self.negocio, fecha=self.viernes)
+        # El cambio de horario invalida también la disponibilidad cacheada
+        self.assertEqual(available_slots(self.servicio, self.viernes), [])
+        especial.delete()
+        self.assertNotEqual(available_slots(self.servicio, self.viernes), [])
+
+    def test_otro_worker_recompila_al_subir_la_version_compartida(self):
+        self.assertNotEqual(available_slots(self.servicio, self.viernes), [])
+        version = horario_de(self.negocio.id).version
+        # Otro worker guardó el cambio: bulk_create no dispara señales aquí, solo
+        # llega el bump de la versión compartida que hizo su señal
+        DiaEspecial.objects.bulk_create([DiaEspecial(negocio=self.negocio, fecha=self.viernes)])
+        self.assertIsNotNone(horario_de(self.negocio.id).intervalo(self.viernes))
+        availability_cache.bump_horario(self.negocio.id)
+
+        horario = horario_de(self.negocio.id)
+        self.assertNotEqual(horario.version, version)
+        self.assertIsNone(horario.intervalo(self.viernes))
+        # La versión del horario va en la clave: los slots viejos ya no se leen
+        self.assertEqual(available_slots(self.servicio, self.viernes), [])
+
+    def test_recompila_al_cambiar_de_dia(self):
+        hoy = timezone.localdate()
+        DiaEspecial.objects.create(negocio=self.negocio, fecha=hoy, cerrado=True)
+        manana = hoy + timedelta(days=1)
+        DiaEspecial.objects.create(negocio=self.negocio, fecha=manana, cerrado=True)
+        self.assertIsNone(horario_de(self.negocio.id).intervalo(manana))
+
+        # El proceso sigue vivo pasada la medianoche: el horario se compila de nuevo para el día nuevo
+        with mock.patch("reservas.horarios.timezone.localdate", return_value=manana):
+            with self.assertNumQueries(2):
+                horario = horario_de(self.negocio.id)
+            self.assertEqual(horario.compilado_para, manana)
+            self.assertIsNone(horario.intervalo(manana))
+            self.assertNotIn(hoy, horario.especiales)
+            with self.assertNumQueries(0):
+                horario_de(self.negocio.id)
+
+    def test_plan_de_mesas_usa_el_horario_del_negocio(self):
+        HorarioSemanal.objects.create(negocio=self.negocio, dia_semana=0, apertura=time(18, 0), cierre=time(22, 0))
+
+        plan = PlanMesas.del_dia(self.servicio, self.lunes)
+        self.assertEqual((plan.apertura, plan.cierre), (18 * 60, 22 * 60))
+        plan = PlanMesas.del_dia(self.servicio, self.viernes)
+        self.assertEqual((plan.apertura, plan.cierre), (13 * 60, 23 * 60))
+
+    def test_valida_intervalo(self):
+        with self.assertRaises(ValidationError):
+            DiaEspecial(negocio=self.negocio, fecha=self.viernes, cerrado=False).full_clean()
+        with self.assertRaises(ValidationError):
+            HorarioSemanal(negocio=self.negocio, dia_semana=1, apertura=time(22, 0), cierre=time(13, 0)).full_clean()
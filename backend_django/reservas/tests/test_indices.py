@@ -0,0 +1,76 @@
+import unittest
+from datetime import date, time, timedelta
+
+from django.db import connection
+
+from ..models import Cita, Cliente, Mesa
+from .base import BaseTestData
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN específico de SQLite")
+class HotPathIndexTests(BaseTestData):
+    """
+    Verifica con EXPLAIN que las consultas calientes usan los índices compuestos
+    (SEARCH ... USING INDEX) en lugar de recorrer la tabla (SCAN).
+    """
+
+    def assertUsaIndice(self, queryset, indice):
+        plan = queryset.explain()
+        self.assertIn(f"USING INDEX {indice}", plan, plan)
+        self.assertNotIn(f"SCAN {queryset.model._meta.db_table}", plan, plan)
+
+    def test_disponibilidad_y_solapes(self):
+        fecha = date.today() + timedelta(days=1)
+        self.assertUsaIndice(
+            Cita.objects.filter(
+                servicio=self.servicio,
+                fecha=fecha,
+                estado__in=("pendiente", "confirmada"),
+            ).values_list("hora_inicio", "hora_fin"),
+            "cita_servicio_fecha_idx",
+        )
+        self.assertUsaIndice(
+            Cita.objects.filter(
+                servicio=self.servicio,
+                fecha=fecha,
+                estado__in=("pendiente", "confirmada"),
+                hora_inicio__lt=time(15, 0),
+                hora_fin__gt=time(14, 0),
+            ),
+            "cita_servicio_fecha_idx",
+        )
+
+    def test_rango_de_fechas(self):
+        self.assertUsaIndice(
+            Cita.objects.filter(
+                servicio=self.servicio,
+                fecha__gte=date.today(),
+                fecha__lte=date.today() + timedelta(days=30),
+                estado__in=("pendiente", "confirmada"),
+            ),
+            "cita_servicio_fecha_idx",
+        )
+
+    def test_recordatorios(self):
+        self.assertUsaIndice(
+            Cita.objects.filter(
+                estado__in=("pendiente", "confirmada"),
+                fecha__gte=date.today(),
+                fecha__lte=date.today() + timedelta(days=1),
+                recordatorio_enviado=False,
+            ),
+            "cita_estado_fecha_idx",
+        )
+
+    def test_mesas_activas(self):
+        self.assertUsaIndice(Mesa.objects.filter(servicio=self.servicio, activa=True), "mesa_servicio_activa_idx")
+
+    def test_cliente_por_email_y_telefono(self):
+        self.assertUsaIndice(
+            Cliente.objects.filter(negocio=self.negocio, email="cliente@ejemplo.com"),
+            "cliente_negocio_email_idx",
+        )
+        self.assertUsaIndice(
+            Cliente.objects.filter(negocio=self.negocio, telefono="3300000000"),
+            "cliente_negocio_tel_idx",
+        )
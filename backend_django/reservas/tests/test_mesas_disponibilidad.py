@@ -0,0 +1,151 @@
+from datetime import date, time, timedelta
+
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from ..models import Cita, Cliente, Mesa, Servicio
+from .base import BaseTestData
+
+
+class PublicMesaAvailabilityTests(BaseTestData):
+    def setUp(self):
+        super().setUp()
+        self.client_api = APIClient()
+        self.url = reverse("mesas-disponibilidad-publica")
+        self.fecha = date.today() + timedelta(days=3)
+        self.vip = Servicio.objects.create(negocio=self.negocio, nombre="Mesa VIP", duracion_minutos=60, precio=500)
+        for i in range(3):
+            Mesa.objects.create(
+                negocio=self.negocio,
+                servicio=self.vip,
+                nombre=f"VIP-{i}",
+                tipo="vip_2",
+                capacidad_min=1,
+                capacidad_max=2 + i,
+            )
+        Mesa.objects.create(negocio=self.negocio, servicio=self.servicio, nombre="Mesa 2", tipo="normal_2")
+
+    def _cita(self, servicio, inicio, fin, estado="confirmada", n=0, personas=None):
+        cliente = Cliente.objects.create(negocio=self.negocio, nombre=f"C{n}", email=f"c{n}@ejemplo.com")
+        return Cita.objects.create(
+            negocio=self.negocio,
+            servicio=servicio,
+            cliente=cliente,
+            fecha=self.fecha,
+            hora_inicio=inicio,
+            hora_fin=fin,
+            estado=estado,
+            personas=personas,
+        )
+
+    def _get(self, **params):
+        params = {"fecha": self.fecha.isoformat(), "hora_inicio": "14:00", "hora_fin": "15:00", **params}
+        response = self.client_api.get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return {fila["id"]: fila for fila in response.data}
+
+    def test_ocupacion_por_tipo_sin_prorrateo(self):
+        self._cita(self.vip, time(14, 0), time(15, 0), n=1)
+        self._cita(self.vip, time(14, 30), time(15, 30), n=2)
+        self._cita(self.vip, time(18, 0), time(19, 0), n=3)  # fuera del horario
+        self._cita(self.vip, time(14, 0), time(15, 0), estado="cancelada", n=4)
+
+        data = self._get(servicio="all")
+
+        self.assertEqual(data["vip_2"]["total"], 3)
+        self.assertEqual(data["vip_2"]["ocupadas"], 2)
+        self.assertEqual(data["vip_2"]["capacidad"], 4)
+        self.assertEqual(data["vip_2"]["precio"], 500.0)
+        self.assertEqual(data["vip_2"]["nombre"], "VIP 2 personas")
+        # Antes se prorrateaba el total entre tipos; las mesas normales siguen libres
+        self.assertEqual(data["normal_2"]["total"], 2)
+        self.assertEqual(data["normal_2"]["ocupadas"], 0)
+
+    def test_ocupadas_no_supera_el_total(self):
+        for n in range(4):
+            self._cita(self.servicio, time(14, 0), time(15, 0), n=n)
+        self.assertEqual(self._get(servicio=self.servicio.id)["normal_2"]["ocupadas"], 2)
+
+    def test_consultas_constantes_y_cache_por_bucket(self):
+        for i in range(20):
+            Mesa.objects.create(negocio=self.negocio, servicio=self.vip, nombre=f"Extra-{i}", tipo="vip_grande")
+        # Miss: versiones de cache aparte, solo dos consultas agregadas
+        with self.assertNumQueries(2):
+            self._get(servicio="all")
+        with self.assertNumQueries(0):
+            self._get(servicio="all")
+        # Otro bucket horario se calcula por separado
+        with self.assertNumQueries(2):
+            self._get(servicio="all", hora_inicio="16:00", hora_fin="17:00")
+
+    def test_cita_nueva_invalida_el_bucket(self):
+        self.assertEqual(self._get(servicio="all")["vip_2"]["ocupadas"], 0)
+        self.assertEqual(self._get(servicio=self.vip.id)["vip_2"]["ocupadas"], 0)
+        self._cita(self.vip, time(14, 0), time(15, 0), n=1)
+        self.assertEqual(self._get(servicio="all")["vip_2"]["ocupadas"], 1)
+        self.assertEqual(self._get(servicio=self.vip.id)["vip_2"]["ocupadas"], 1)
+
+    def test_cambios_de_mesa_o_servicio_invalidan(self):
+        self.assertEqual(self._get(servicio="all")["vip_2"]["total"], 3)
+        mesa = Mesa.objects.get(nombre="VIP-0")
+        mesa.activa = False
+        mesa.save()
+        self.assertEqual(self._get(servicio="all")["vip_2"]["total"], 2)
+
+        self.vip.precio = 650
+        self.vip.save()
+        self.assertEqual(self._get(servicio="all")["vip_2"]["precio"], 650.0)
+
+        self.vip.activo = False
+        self.vip.save()
+        self.assertNotIn("vip_2", self._get(servicio="all"))
+
+    def test_cita_con_mesa_ocupa_solo_el_tipo_de_su_mesa(self):
+        # Servicio con dos tipos de mesa
+        mixto = Servicio.objects.create(negocio=self.negocio, nombre="Terraza", duracion_minutos=60, precio=0)
+        dos = Mesa.objects.create(negocio=self.negocio, servicio=mixto, nombre="T-2", tipo="normal_2")
+        Mesa.objects.create(negocio=self.negocio, servicio=mixto, nombre="T-4", tipo="normal_4", capacidad_max=4)
+        con_mesa = self._cita(mixto, time(14, 0), time(15, 0), n=1)
+        Cita.objects.filter(pk=con_mesa.pk).update(mesa=dos)
+
+        data = self._get(servicio=mixto.id)
+        self.assertEqual(data["normal_2"]["ocupadas"], 1)
+        self.assertEqual(data["normal_4"]["ocupadas"], 0)
+
+        # Una cita antigua sin mesa ocupa una sola mesa: la de 2 ya está tomada
+        self._cita(mixto, time(14, 0), time(15, 0), n=2)
+        data = self._get(servicio=mixto.id)
+        self.assertEqual(data["normal_2"]["ocupadas"], 1)
+        self.assertEqual(data["normal_4"]["ocupadas"], 1)
+
+    def test_cita_sin_mesa_cuenta_una_vez_en_el_tipo_que_mejor_ajusta(self):
+        mixto = Servicio.objects.create(negocio=self.negocio, nombre="Terraza", duracion_minutos=60, precio=0)
+        Mesa.objects.create(negocio=self.negocio, servicio=mixto, nombre="T-2", tipo="normal_2")
+        Mesa.objects.create(
+            negocio=self.negocio, servicio=mixto, nombre="T-4", tipo="normal_4", capacidad_min=3, capacidad_max=4
+        )
+        self._cita(mixto, time(14, 0), time(15, 0), n=1)
+        data = self._get(servicio=mixto.id)
+        self.assertEqual((data["normal_2"]["ocupadas"], data["normal_4"]["ocupadas"]), (1, 0))
+
+        # Con personas va al tipo que las admite, aunque haya uno más chico libre
+        self._cita(mixto, time(14, 0), time(15, 0), n=2, personas=4)
+        data = self._get(servicio=mixto.id)
+        self.assertEqual((data["normal_2"]["ocupadas"], data["normal_4"]["ocupadas"]), (1, 1))
+
+    def test_mesas_sin_tipo_se_agrupan_por_nombre(self):
+        barra = Servicio.objects.create(negocio=self.negocio, nombre="Barra", duracion_minutos=60, precio=0)
+        Mesa.objects.create(negocio=self.negocio, servicio=barra, nombre="Barra alta", tipo="")
+        Mesa.objects.create(negocio=self.negocio, servicio=barra, nombre="Sillón", tipo="")
+        cita = self._cita(barra, time(14, 0), time(15, 0), n=1)
+        Cita.objects.filter(pk=cita.pk).update(mesa=Mesa.objects.get(nombre="Sillón"))
+
+        data = self._get(servicio=barra.id)
+        self.assertEqual(set(data), {"Barra alta", "Sillón"})
+        self.assertEqual(data["Sillón"]["nombre"], "Sillón")
+        self.assertEqual((data["Sillón"]["ocupadas"], data["Barra alta"]["ocupadas"]), (1, 0))
+
+    def test_servicio_inexistente_o_invalido(self):
+        params = {"fecha": self.fecha.isoformat(), "hora_inicio": "14:00"}
+        self.assertEqual(self.client_api.get(self.url, {**params, "servicio": 9999}).status_code, 404)
+        self.assertEqual(self.client_api.get(self.url, {**params, "servicio": "abc"}).status_code, 404)
@@ -0,0 +1,90 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .. import metricas
+from .base import BaseTestData, proximo_dia_abierto
+
+CON_METRICAS = ["reservas.middleware.MetricasMiddleware", *settings.MIDDLEWARE]
+
+
+class HistogramaTests(SimpleTestCase):
+    def setUp(self):
+        metricas.reiniciar()
+        self.addCleanup(metricas.reiniciar)
+
+    def test_formato_prometheus(self):
+        metricas.observar("cita-list", "GET", 200, 0.03, 4, 0.01)
+        metricas.observar("cita-list", "GET", 200, 0.2, 40, 0.1)
+        texto = metricas.exportar()
+
+        etiquetas = 'view="cita-list",method="GET",status="200"'
+        self.assertIn("# TYPE sir_http_request_duration_seconds histogram", texto)
+        self.assertIn(f'sir_http_request_duration_seconds_bucket{{{etiquetas},le="0.025"}} 0', texto)
+        self.assertIn(f'sir_http_request_duration_seconds_bucket{{{etiquetas},le="0.05"}} 1', texto)
+        self.assertIn(f'sir_http_request_duration_seconds_bucket{{{etiquetas},le="+Inf"}} 2', texto)
+        self.assertIn(f"sir_http_request_duration_seconds_count{{{etiquetas}}} 2", texto)
+        self.assertIn(f'sir_http_request_db_queries_bucket{{{etiquetas},le="5"}} 1', texto)
+        self.assertIn(f"sir_http_request_db_queries_sum{{{etiquetas}}} 44", texto)
+        self.assertIn(f"sir_http_request_db_seconds_total{{{etiquetas}}} 0.11", texto)
+
+    def test_observar_solo_acumula_en_buckets_fijos(self):
+        # El costo por request (medido en bench_reservas) depende de que observar no
+        # guarde cada valor: una serie por ruta con cuentas de tamaño fijo
+        for i in range(2000):
+            metricas.observar("cita-list", "GET", 200, i / 10000, i % 30, 0.001)
+
+        self.assertEqual(list(metricas._series), [("cita-list", "GET", "200")])
+        serie = metricas._series[("cita-list", "GET", "200")]
+        self.assertEqual(len(serie.duracion.cuentas), len(metricas.BUCKETS_SEGUNDOS) + 1)
+        self.assertEqual(len(serie.consultas.cuentas), len(metricas.BUCKETS_CONSULTAS) + 1)
+        self.assertEqual(serie.duracion.total, 2000)
+        self.assertEqual(sum(serie.duracion.cuentas), 2000)
+        self.assertEqual(serie.consultas.suma, sum(i % 30 for i in range(2000)))
+        # 0.0 .. 0.1999 s: hasta le=0.005 caen 0..0.005 (51 valores), el resto antes de le=0.25
+        self.assertEqual(serie.duracion.cuentas[0], 51)
+        self.assertEqual(sum(serie.duracion.cuentas[:6]), 2000)
+        self.assertAlmostEqual(serie.segundos_bd, 2.0)
+
+    def test_metodos_desconocidos_comparten_serie(self):
+        for metodo in ("GET", "PROPFIND", "XYZ1", "get"):
+            metricas.observar("cita-list", metodo, 405, 0.01, 0, 0.0)
+        self.assertEqual(
+            sorted(metricas._series), [("cita-list", "GET", "405"), ("cita-list", "other", "405")]
+        )
+        self.assertEqual(metricas._series[("cita-list", "other", "405")].duracion.total, 3)
+
+
+class MetricasMiddlewareTests(BaseTestData):
+    def setUp(self):
+        super().setUp()
+        metricas.reiniciar()
+        self.addCleanup(metricas.reiniciar)
+
+    @override_settings(MIDDLEWARE=CON_METRICAS)
+    def test_mide_requests_y_expone_metricas_a_staff(self):
+        api = APIClient()
+        params = {"servicio": self.servicio.id, "fecha": proximo_dia_abierto().isoformat()}
+        for _ in range(3):
+            self.assertEqual(api.get(reverse("agenda-disponibilidad"), params).status_code, 200)
+        api.get("/api/no-existe/")
+
+        self.assertIn(api.get(reverse("metrics")).status_code, (401, 403))
+        admin = get_user_model().objects.create_superuser("admin", "admin@ejemplo.com", "pass1234")
+        api.force_authenticate(admin)
+        response = api.get(reverse("metrics"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        texto = response.content.decode()
+        etiquetas = 'view="agenda-disponibilidad",method="GET",status="200"'
+        self.assertIn(f"sir_http_request_duration_seconds_count{{{etiquetas}}} 3", texto)
+        self.assertIn(f'sir_http_request_db_queries_bucket{{{etiquetas},le="+Inf"}} 3', texto)
+        self.assertNotIn(f"sir_http_request_db_queries_sum{{{etiquetas}}} 0\n", texto)
+        self.assertIn('view="<sin_ruta>",method="GET",status="404"', texto)
+
+    def test_sin_middleware_no_registra(self):
+        APIClient().get(reverse("agenda-disponibilidad"), {"servicio": self.servicio.id, "fecha": "2030-01-04"})
+        self.assertNotIn("agenda-disponibilidad", metricas.exportar())
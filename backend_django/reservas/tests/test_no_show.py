@@ -0,0 +1,93 @@
+from datetime import date, datetime, time
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from ..models import Cita
+from ..signals import citas_no_show
+from .base import BaseTestData
+
+
+def _congelar(fecha: date, hora: time):
+    ahora = timezone.make_aware(datetime.combine(fecha, hora))
+    return mock.patch("reservas.management.commands.marcar_no_show.timezone.localtime", return_value=ahora)
+
+
+class MarcarNoShowTests(BaseTestData):
+    DIA = date(2031, 3, 12)
+
+    def setUp(self):
+        super().setUp()
+        self.eventos = []
+
+        def _receptor(sender, cita_ids, dias, **kwargs):
+            self.eventos.append((list(cita_ids), set(dias)))
+
+        citas_no_show.connect(_receptor, weak=False, dispatch_uid="test_no_show")
+        self.addCleanup(citas_no_show.disconnect, dispatch_uid="test_no_show")
+
+    def _cita(self, fecha, hora, estado="confirmada"):
+        return Cita.objects.create(
+            negocio=self.negocio,
+            servicio=self.servicio,
+            cliente=self.cliente,
+            fecha=fecha,
+            hora_inicio=hora,
+            hora_fin=time(min(hora.hour + 1, 23), hora.minute),
+            estado=estado,
+        )
+
+    def _run(self, *args):
+        out = StringIO()
+        call_command("marcar_no_show", *args, stdout=out)
+        return out.getvalue()
+
+    def _estado(self, cita):
+        return Cita.objects.values_list("estado", flat=True).get(pk=cita.pk)
+
+    def test_dias_anteriores_con_hora_posterior_al_reloj(self):
+        ayer_tarde = self._cita(date(2031, 3, 11), time(22, 0))
+        hoy_vencida = self._cita(self.DIA, time(13, 0))
+        hoy_en_tolerancia = self._cita(self.DIA, time(14, 0))
+        hoy_futura = self._cita(self.DIA, time(20, 0))
+        cancelada = self._cita(date(2031, 3, 10), time(14, 0), estado="cancelada")
+
+        with _congelar(self.DIA, time(14, 10)):
+            salida = self._run()
+
+        self.assertIn("Citas marcadas como no_asistio: 2", salida)
+        self.assertEqual(self._estado(ayer_tarde), "no_asistio")
+        self.assertEqual(self._estado(hoy_vencida), "no_asistio")
+        self.assertEqual(self._estado(hoy_en_tolerancia), "confirmada")
+        self.assertEqual(self._estado(hoy_futura), "confirmada")
+        self.assertEqual(self._estado(cancelada), "cancelada")
+
+    def test_cruce_de_medianoche(self):
+        # A las 00:05 el límite es 23:50 del día anterior
+        vencida = self._cita(date(2031, 3, 11), time(23, 40))
+        en_tolerancia = self._cita(date(2031, 3, 11), time(23, 55))
+        hoy = self._cita(self.DIA, time(0, 0))
+
+        with _congelar(self.DIA, time(0, 5)):
+            self._run()
+
+        self.assertEqual(self._estado(vencida), "no_asistio")
+        self.assertEqual(self._estado(en_tolerancia), "confirmada")
+        self.assertEqual(self._estado(hoy), "confirmada")
+
+    def test_lotes_y_un_evento_por_lote(self):
+        citas = [self._cita(date(2031, 3, 1 + i), time(15, 0)) for i in range(5)]
+
+        with _congelar(self.DIA, time(12, 0)):
+            salida = self._run("--batch-size", "2")
+
+        self.assertIn("Citas marcadas como no_asistio: 5 (lotes: 3)", salida)
+        self.assertEqual([len(ids) for ids, _ in self.eventos], [2, 2, 1])
+        self.assertEqual(sorted(pk for ids, _ in self.eventos for pk in ids), sorted(c.pk for c in citas))
+        self.assertEqual(self.eventos[0][1], {(self.servicio.id, date(2031, 3, 1)), (self.servicio.id, date(2031, 3, 2))})
+
+        # Idempotente: una segunda corrida no encuentra nada
+        with _congelar(self.DIA, time(12, 0)):
+            self.assertIn("no_asistio: 0", self._run())
@@ -0,0 +1,137 @@
+import random
+from datetime import date, time, timedelta
+
+from django.test import SimpleTestCase
+
+from ..models import Cita, Cliente, Mesa
+from ..occupancy import OccupancyProfile
+from ..utils import CLOSE_TIME, OPEN_TIME, STEP_MINUTES, _to_minutes, _to_time, available_slots, suggest_slot
+from .base import BaseTestData
+
+OPEN_MIN = _to_minutes(OPEN_TIME)
+CLOSE_MIN = _to_minutes(CLOSE_TIME)
+
+
+# Implementaciones originales (O(slots × citas)) usadas como referencia de paridad.
+def _legacy_free_slots(bookings, duracion, mesas_activas):
+    slots = []
+    for start in range(OPEN_MIN, CLOSE_MIN - duracion + 1, STEP_MINUTES):
+        end = start + duracion
+        overlaps = sum(1 for h_ini, h_fin in bookings if not (h_fin <= start or h_ini >= end))
+        if overlaps >= mesas_activas:
+            continue
+        slots.append((start, end))
+    return slots
+
+
+def _legacy_best_gap(bookings, duracion, mesas_activas, prefer_min=None):
+    bookings_start_min = min((h_ini for h_ini, _ in bookings), default=None)
+    start_min = OPEN_MIN if bookings_start_min is None or prefer_min is not None else bookings_start_min
+    best_score = best_slot = None
+    for start in range(start_min, CLOSE_MIN - duracion + 1, STEP_MINUTES):
+        end = start + duracion
+        overlaps = sum(1 for h_ini, h_fin in bookings if not (h_fin <= start or h_ini >= end))
+        if overlaps >= mesas_activas:
+            continue
+        prev_end = max((h_fin for h_ini, h_fin in bookings if h_fin <= start), default=OPEN_MIN)
+        next_start = min((h_ini for h_ini, h_fin in bookings if h_ini >= end), default=CLOSE_MIN)
+        score = (start - prev_end) + (next_start - end)
+        if prefer_min is not None:
+            score += abs(start - prefer_min) * 0.5
+        if best_score is None or score < best_score:
+            best_score = score
+            best_slot = (start, end)
+    return best_slot
+
+
+def _random_bookings(rng, n):
+    bookings = []
+    for _ in range(n):
+        start = rng.randrange(OPEN_MIN - 60, CLOSE_MIN, 5)
+        bookings.append((start, start + rng.choice((30, 45, 60, 90, 120))))
+    return bookings
+
+
+class OccupancyProfileTests(SimpleTestCase):
+    def test_overlapping_y_concurrencia(self):
+        profile = OccupancyProfile([(780, 840), (810, 870), (840, 900)], OPEN_MIN, CLOSE_MIN)
+        self.assertEqual(profile.overlapping(780, 840), 2)
+        self.assertEqual(profile.overlapping(840, 900), 2)
+        self.assertEqual(profile.overlapping(900, 960), 0)
+        self.assertEqual(profile.max_concurrency(780, 900), 2)
+        self.assertEqual(profile.concurrency_at(779), 0)
+        self.assertEqual(profile.prev_end(840, OPEN_MIN), 840)
+        self.assertEqual(profile.next_start(841, CLOSE_MIN), CLOSE_MIN)
+
+    def test_paridad_slots_libres(self):
+        rng = random.Random(20240601)
+        for _ in range(200):
+            bookings = _random_bookings(rng, rng.randrange(0, 40))
+            duracion = rng.choice((30, 60, 90, 120))
+            mesas = rng.randrange(1, 6)
+            profile = OccupancyProfile(bookings, OPEN_MIN, CLOSE_MIN)
+            self.assertEqual(
+                profile.free_slots(duracion, mesas, STEP_MINUTES),
+                _legacy_free_slots(bookings, duracion, mesas),
+            )
+
+    def test_paridad_mejor_hueco(self):
+        rng = random.Random(7)
+        for _ in range(200):
+            bookings = _random_bookings(rng, rng.randrange(0, 40))
+            duracion = rng.choice((30, 60, 90))
+            mesas = rng.randrange(1, 4)
+            prefer_min = rng.choice((None, rng.randrange(OPEN_MIN, CLOSE_MIN, 15)))
+            profile = OccupancyProfile(bookings, OPEN_MIN, CLOSE_MIN)
+            start_min = OPEN_MIN if not bookings or prefer_min is not None else profile.starts[0]
+            self.assertEqual(
+                profile.best_gap(duracion, mesas, STEP_MINUTES, prefer_min=prefer_min, start_min=start_min),
+                _legacy_best_gap(bookings, duracion, mesas, prefer_min),
+            )
+
+
+class OccupancyParityDbTests(BaseTestData):
+    def setUp(self):
+        super().setUp()
+        Mesa.objects.create(
+            negocio=self.negocio,
+            servicio=self.servicio,
+            nombre="Mesa 2",
+            tipo="normal_2",
+            capacidad_min=1,
+            capacidad_max=2,
+        )
+        # Un viernes para no caer en jueves (cerrado)
+        self.fecha = date.today() + timedelta(days=(4 - date.today().weekday()) % 7 + 7)
+        rng = random.Random(99)
+        self.bookings = []
+        for i in range(25):
+            start = rng.randrange(OPEN_MIN, CLOSE_MIN - 60, 15)
+            end = start + rng.choice((30, 60))
+            cliente = Cliente.objects.create(negocio=self.negocio, nombre=f"Cliente {i}")
+            Cita.objects.create(
+                negocio=self.negocio,
+                servicio=self.servicio,
+                cliente=cliente,
+                fecha=self.fecha,
+                hora_inicio=_to_time(start),
+                hora_fin=_to_time(end),
+                estado=rng.choice(("pendiente", "confirmada", "cancelada")),
+            )
+        self.bookings = [
+            (_to_minutes(h_ini), _to_minutes(h_fin))
+            for h_ini, h_fin in Cita.objects.filter(
+                fecha=self.fecha, estado__in=("pendiente", "confirmada")
+            ).values_list("hora_inicio", "hora_fin")
+        ]
+
+    def test_available_slots_igual_a_implementacion_original(self):
+        esperado = [(_to_time(s), _to_time(e)) for s, e in _legacy_free_slots(self.bookings, 60, 2)]
+        self.assertEqual(available_slots(self.servicio, self.fecha), esperado)
+
+    def test_suggest_slot_igual_a_implementacion_original(self):
+        for prefer in (None, time(20, 0)):
+            prefer_min = _to_minutes(prefer) if prefer else None
+            start, end = _legacy_best_gap(self.bookings, 60, 2, prefer_min)
+            slot = suggest_slot(self.servicio, fecha_desde=self.fecha, duracion_minutos=60, prefer_hora=prefer)
+            self.assertEqual((slot.fecha, slot.hora_inicio, slot.hora_fin), (self.fecha, _to_time(start), _to_time(end)))
@@ -0,0 +1,145 @@
+import random
+import time as _time
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..asignacion import PlanMesas, optimizar_dia, resolver
+from ..models import Cita, Cliente, Mesa
+from ..utils import CLOSE_TIME, OPEN_TIME, _to_minutes
+from .base import BaseTestData
+
+
+def _proximo_viernes() -> date:
+    hoy = date.today()
+    return hoy + timedelta(days=(4 - hoy.weekday()) % 7 + 7)
+
+
+class ResolverTests(SimpleTestCase):
+    def test_dia_de_2000_citas_en_menos_de_un_segundo(self):
+        rnd = random.Random(18)
+        capacidades = [2] * 40 + [4] * 40 + [6] * 12 + [10] * 8
+        mesas = [Mesa(id=i + 1, nombre=f"M{i}", capacidad_min=1, capacidad_max=c) for i, c in enumerate(capacidades)]
+        apertura, cierre = _to_minutes(OPEN_TIME), _to_minutes(CLOSE_TIME)
+
+        # Plan fragmentado: cada solicitud va a una mesa libre al azar que admite al grupo
+        actual = PlanMesas(mesas)
+        solicitudes, colocadas, ocupadas = [], [], []
+        for clave in range(2000):
+            duracion = rnd.choice((60, 90, 120))
+            inicio = rnd.randrange(apertura, cierre - duracion + 1, 15)
+            cita = (clave, inicio, inicio + duracion, rnd.choice((1, 2, 2, 3, 4, 6, 8)))
+            solicitudes.append(cita)
+            libres = [a for a in actual.agendas.values() if a.mesa.capacidad_max >= cita[3] and a.libre(*cita[1:3])]
+            if libres:
+                agenda = rnd.choice(libres)
+                agenda.ocupar(*cita[1:3])
+                colocadas.append(cita)
+                ocupadas.append((agenda.mesa.id, *cita[1:3]))
+
+        inicio_bench = _time.perf_counter()
+        resolver(mesas, [], solicitudes)
+        duracion = _time.perf_counter() - inicio_bench
+        self.assertLess(duracion, 1.0, f"{len(solicitudes)} citas en {duracion:.3f}s")
+
+        nuevo, asignacion = resolver(mesas, [], colocadas)
+        self.assertTrue(all(mesa_id is not None for mesa_id in asignacion.values()))
+        self.assertGreater(nuevo.huecos_utiles(60), PlanMesas(mesas, ocupadas).huecos_utiles(60))
+
+    def test_mesa_chica_para_la_cita_que_termina_despues(self):
+        # Por capacidad A iría a la mesa de 2 y C (4 personas) no cabría
+        mesas = [Mesa(id=1, capacidad_min=1, capacidad_max=2), Mesa(id=2, capacidad_min=1, capacidad_max=4)]
+        citas = [("A", 840, 900, 2), ("B", 870, 960, 2), ("C", 900, 960, 4)]
+        _, asignacion = resolver(mesas, [], citas)
+        self.assertEqual(asignacion, {"A": 2, "B": 1, "C": 2})
+
+
+class OptimizarMesasTests(BaseTestData):
+    def setUp(self):
+        super().setUp()
+        self.fecha = _proximo_viernes()
+        self.mesa_b = Mesa.objects.create(negocio=self.negocio, servicio=self.servicio, nombre="Mesa 2", tipo="normal_2")
+        self.mesa_c = Mesa.objects.create(negocio=self.negocio, servicio=self.servicio, nombre="Mesa 3", tipo="normal_2")
+
+    def _cita(self, mesa, inicio, fin, fecha=None, estado="confirmada"):
+        cliente = Cliente.objects.create(
+            negocio=self.negocio, nombre=f"C{inicio}", email=f"c{inicio.hour}{inicio.minute}@ejemplo.com"
+        )
+        return Cita.objects.create(
+            negocio=self.negocio,
+            servicio=self.servicio,
+            cliente=cliente,
+            mesa=mesa,
+            fecha=fecha or self.fecha,
+            hora_inicio=inicio,
+            hora_fin=fin,
+            estado=estado,
+        )
+
+    def _sin_solapes(self, fecha):
+        for mesa in (self.mesa, self.mesa_b, self.mesa_c):
+            intervalos = sorted(
+                Cita.objects.filter(mesa=mesa, fecha=fecha).values_list("hora_inicio", "hora_fin")
+            )
+            self.assertTrue(all(a[1] <= b[0] for a, b in zip(intervalos, intervalos[1:])), intervalos)
+
+    def test_compacta_el_plan_y_libera_mesas(self):
+        self._cita(self.mesa, time(14, 0), time(15, 0))
+        self._cita(self.mesa_b, time(15, 0), time(16, 0))
+        self._cita(self.mesa_c, time(16, 0), time(17, 0))
+
+        out = StringIO()
+        call_command("optimizar_mesas", "--fecha", self.fecha.isoformat(), stdout=out)
+
+        self.assertEqual(set(Cita.objects.filter(fecha=self.fecha).values_list("mesa", flat=True)), {self.mesa.id})
+        self.assertIn("mesas libres 0→2", out.getvalue())
+        self.assertIn("2 citas movidas", out.getvalue())
+        self._sin_solapes(self.fecha)
+
+    def test_no_mueve_citas_empezadas_ni_completadas(self):
+        hoy = timezone.localdate()
+        ahora = timezone.make_aware(datetime.combine(hoy, time(15, 10)))
+        completada = self._cita(self.mesa_c, time(13, 0), time(14, 0), fecha=hoy, estado="completada")
+        empezada = self._cita(self.mesa_b, time(15, 0), time(16, 0), fecha=hoy)
+        pendiente = self._cita(self.mesa_c, time(17, 0), time(18, 0), fecha=hoy)
+
+        resultado = optimizar_dia(self.servicio, hoy, ahora=ahora)
+
+        self.assertEqual(resultado.citas, 1)
+        completada.refresh_from_db()
+        empezada.refresh_from_db()
+        pendiente.refresh_from_db()
+        self.assertEqual(completada.mesa, self.mesa_c)
+        self.assertEqual(empezada.mesa, self.mesa_b)
+        # La pendiente se pega a la mesa que queda libre justo antes
+        self.assertEqual(pendiente.mesa, self.mesa_b)
+        self._sin_solapes(hoy)
+
+    def test_dry_run_no_guarda(self):
+        self._cita(self.mesa_b, time(14, 0), time(15, 0))
+        self._cita(self.mesa_c, time(15, 0), time(16, 0))
+        out = StringIO()
+        call_command("optimizar_mesas", "--fecha", self.fecha.isoformat(), "--dry-run", stdout=out)
+        self.assertIn("(sin aplicar)", out.getvalue())
+        self.assertIn("[dry-run]", out.getvalue())
+        self.assertEqual(Cita.objects.filter(mesa=self.mesa).count(), 0)
+
+    def test_accion_de_admin(self):
+        self._cita(self.mesa_b, time(14, 0), time(15, 0))
+        cita = self._cita(self.mesa_c, time(15, 0), time(16, 0))
+        admin = get_user_model().objects.create_superuser("admin", "admin@ejemplo.com", "pass1234")
+        self.client.force_login(admin)
+
+        response = self.client.post(
+            reverse("admin:reservas_cita_changelist"),
+            {"action": "optimizar_mesas", "_selected_action": [cita.pk]},
+            follow=True,
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(Cita.objects.filter(fecha=self.fecha).values_list("mesa", flat=True)), {self.mesa.id})
@@ -0,0 +1,306 @@
+from datetime import date, time, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core import mail
+from django.core.management import call_command
+from django.db.models.signals import post_save
+from django.test import TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .. import outbox
+from ..models import CalendarCredential, Cita, OutboxEvento
+from ..signals import enviar_notificacion_cita
+from .base import BaseTestData
+
+
+class OutboxTests(BaseTestData):
+    def _crear_cita(self, **extra):
+        datos = dict(
+            negocio=self.negocio,
+            servicio=self.servicio,
+            cliente=self.cliente,
+            fecha=date.today() + timedelta(days=1),
+            hora_inicio=time(14, 0),
+            hora_fin=time(15, 0),
+            estado="pendiente",
+        )
+        datos.update(extra)
+        return Cita.objects.create(**datos)
+
+    def _configurar_calendar(self):
+        CalendarCredential.objects.create(nombre="default", calendar_id="primary", credentials_json={})
+
+    def test_crear_cita_solo_encola(self):
+        self._configurar_calendar()
+        cita = self._crear_cita()
+        self.assertEqual(len(mail.outbox), 0)
+        tipos = sorted(OutboxEvento.objects.values_list("tipo", flat=True))
+        self.assertEqual(tipos, ["calendar_sync", "email"])
+        sync = OutboxEvento.objects.get(tipo="calendar_sync")
+        self.assertEqual(sync.payload, {"cita_id": cita.pk})
+
+    @mock.patch("reservas.google_sync.sync_cita_to_calendar", return_value=True)
+    def test_procesar_envia_correo_y_sincroniza(self, mock_sync):
+        self._configurar_calendar()
+        cita = self._crear_cita()
+        ok, errores = outbox.procesar_pendientes()
+
+        self.assertEqual((ok, errores), (2, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("cliente@ejemplo.com", mail.outbox[0].to)
+        self.assertEqual(mock_sync.call_args.args[0].pk, cita.pk)
+        self.assertFalse(OutboxEvento.objects.exclude(estado="procesado").exists())
+        # Un segundo pase no reenvía nada
+        self.assertEqual(outbox.procesar_pendientes(), (0, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_sin_calendar_no_encola_sync(self):
+        self._crear_cita()
+        self.assertEqual(list(OutboxEvento.objects.values_list("tipo", flat=True)), ["email"])
+
+        # Credencial de otro negocio: tampoco aplica a este
+        CalendarCredential.objects.create(nombre="negocio_999999", calendar_id="otro", credentials_json={})
+        self._crear_cita(hora_inicio=time(16, 0), hora_fin=time(17, 0))
+        self.assertFalse(OutboxEvento.objects.filter(tipo="calendar_sync").exists())
+
+        self._configurar_calendar()
+        self._crear_cita(hora_inicio=time(18, 0), hora_fin=time(19, 0))
+        self.assertEqual(OutboxEvento.objects.filter(tipo="calendar_sync").count(), 1)
+
+    def test_purga_procesados_viejos(self):
+        viejo = outbox.encolar_correo("Asunto", "Cuerpo", ["x@ejemplo.com"])
+        reciente = outbox.encolar_correo("Asunto", "Cuerpo", ["y@ejemplo.com"])
+        fallido = outbox.encolar_correo("Asunto", "Cuerpo", ["z@ejemplo.com"])
+        pendiente = outbox.encolar_correo("Asunto", "Cuerpo", ["w@ejemplo.com"])
+        hace_un_mes = timezone.now() - timedelta(days=30)
+        OutboxEvento.objects.filter(pk=viejo.pk).update(estado="procesado", procesado_en=hace_un_mes)
+        OutboxEvento.objects.filter(pk=reciente.pk).update(estado="procesado", procesado_en=timezone.now())
+        OutboxEvento.objects.filter(pk=fallido.pk).update(estado="fallido", procesado_en=hace_un_mes)
+
+        salida = StringIO()
+        call_command("purgar_outbox", "--dias", "7", "--batch-size", "1", stdout=salida)
+
+        self.assertIn("purgados: 1", salida.getvalue())
+        self.assertEqual(
+            set(OutboxEvento.objects.values_list("pk", flat=True)), {reciente.pk, fallido.pk, pendiente.pk}
+        )
+
+    def test_reintenta_con_backoff_y_marca_fallido(self):
+        evento = outbox.encolar_correo("Asunto", "Cuerpo", ["x@ejemplo.com"])
+        with mock.patch("reservas.outbox.send_mail", side_effect=OSError("smtp caído")), self.assertLogs(
+            "reservas.outbox", level="WARNING"
+        ):
+            self.assertEqual(outbox.procesar_lote(), (0, 1))
+            evento.refresh_from_db()
+            self.assertEqual(evento.estado, "pendiente")
+            self.assertEqual(evento.intentos, 1)
+            self.assertIn("smtp caído", evento.ultimo_error)
+            self.assertGreater(evento.disponible_en, timezone.now() + timedelta(seconds=20))
+
+            # Mientras no venza el backoff no se vuelve a tomar
+            self.assertEqual(outbox.procesar_lote(), (0, 0))
+
+            for _ in range(outbox.MAX_INTENTOS - 1):
+                OutboxEvento.objects.filter(pk=evento.pk).update(disponible_en=timezone.now())
+                outbox.procesar_lote()
+
+        evento.refresh_from_db()
+        self.assertEqual(evento.estado, "fallido")
+        self.assertEqual(evento.intentos, outbox.MAX_INTENTOS)
+
+    def test_handler_corre_fuera_del_reclamo_con_lease(self):
+        evento = outbox.encolar_correo("Asunto", "Cuerpo", ["x@ejemplo.com"])
+        vistos = []
+
+        def handler(_payload):
+            fila = OutboxEvento.objects.get(pk=evento.pk)
+            vistos.append((fila.estado, fila.intentos, fila.disponible_en > timezone.now()))
+            # Otro worker en este momento no toma el evento reclamado
+            vistos.append(outbox.procesar_lote())
+
+        with mock.patch.dict(outbox.HANDLERS, {"email": handler}):
+            self.assertEqual(outbox.procesar_lote(), (1, 0))
+        self.assertEqual(vistos, [("en_proceso", 1, True), (0, 0)])
+
+    def test_lease_vencido_se_vuelve_a_tomar(self):
+        evento = outbox.encolar_correo("Asunto", "Cuerpo", ["x@ejemplo.com"])
+        # Worker que murió a mitad del lote: quedó en_proceso con el lease vencido
+        OutboxEvento.objects.filter(pk=evento.pk).update(
+            estado="en_proceso", intentos=1, disponible_en=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(outbox.procesar_lote(), (1, 0))
+        evento.refresh_from_db()
+        self.assertEqual((evento.estado, evento.intentos), ("procesado", 2))
+        self.assertEqual(len(mail.outbox), 1)
+
+    @mock.patch("reservas.google_sync.delete_event_from_calendar", return_value=True)
+    def test_borrar_cita_encola_eliminacion_de_evento(self, mock_delete):
+        cita = self._crear_cita()
+        Cita.objects.filter(pk=cita.pk).update(event_id="evt-1")
+        cita.refresh_from_db()
+        cita.delete()
+
+        evento = OutboxEvento.objects.get(tipo="calendar_delete")
+        self.assertEqual(evento.payload["event_id"], "evt-1")
+        outbox.procesar_pendientes()
+        mock_delete.assert_called_once_with("evt-1", self.negocio.id)
+
+    @mock.patch("reservas.google_sync.sync_cita_to_calendar", return_value=True)
+    def test_comando_run_outbox_once(self, _mock_sync):
+        self._crear_cita()
+        call_command("run_outbox", "--once", stdout=mock.MagicMock())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(OutboxEvento.objects.filter(estado="pendiente").count(), 0)
+
+
+@mock.patch("reservas.google_sync.sync_cita_to_calendar", return_value=True)
+class NotificacionUnicaTests(BaseTestData):
+    """Cada cambio de una cita produce exactamente un correo, también en reservas públicas."""
+
+    def setUp(self):
+        super().setUp()
+        self.negocio.email_contacto = "contacto@ejemplo.com"
+        self.negocio.save()
+        hoy = date.today()
+        # Próximo lunes: nunca es pasado ni jueves (cerrado)
+        self.fecha = hoy + timedelta(days=7 - hoy.weekday())
+
+    def _reservar_publico(self):
+        resp = APIClient().post(
+            reverse("crear-cita-publica"),
+            {
+                "negocio": self.negocio.id,
+                "servicio": self.servicio.id,
+                "nombre": "Cliente Público",
+                "email": "publico@ejemplo.com",
+                "fecha": self.fecha.isoformat(),
+                "hora_inicio": "14:00",
+                "hora_fin": "15:00",
+            },
+            format="json",
+        )
+        self.assertEqual(resp.status_code, 201, resp.data)
+        return Cita.objects.get(pk=resp.data["cita_id"])
+
+    def _correos(self):
+        outbox.procesar_pendientes()
+        return len(mail.outbox)
+
+    def test_un_correo_por_cambio(self, _mock_sync):
+        cita = self._reservar_publico()
+        self.assertEqual(self._correos(), 1)
+        # Un solo mensaje con todos los destinatarios
+        self.assertEqual(
+            sorted(mail.outbox[0].to),
+            ["contacto@ejemplo.com", "publico@ejemplo.com", "tester@example.com"],
+        )
+        self.assertTrue(mail.outbox[0].subject.startswith("Confirmación"))
+
+        cita.hora_inicio, cita.hora_fin = time(16, 0), time(17, 0)
+        cita.save()
+        self.assertEqual(self._correos(), 2)
+        self.assertTrue(mail.outbox[1].subject.startswith("Actualización"))
+
+        cita.estado = "cancelada"
+        cita.save()
+        self.assertEqual(self._correos(), 3)
+        self.assertTrue(mail.outbox[2].subject.startswith("Cambio de estado"))
+
+        # Guardar sin cambios o solo campos internos no reenvía
+        cita.save()
+        Cita.objects.get(pk=cita.pk).save()
+        cita.recordatorio_enviado = True
+        cita.save(update_fields=["recordatorio_enviado"])
+        self.assertEqual(self._correos(), 3)
+
+    def test_volver_a_un_estado_anterior_se_notifica(self, _mock_sync):
+        cita = self._reservar_publico()
+        for estado in ("cancelada", "confirmada"):
+            cita.estado = estado
+            cita.save()
+        self.assertEqual(self._correos(), 3)
+        self.assertEqual(
+            [m.subject.split(" de cita")[0] for m in mail.outbox],
+            ["Confirmación", "Cambio de estado", "Cambio de estado"],
+        )
+        self.assertIn("Estado: confirmada", mail.outbox[2].body)
+
+    def test_volver_a_un_horario_anterior_se_notifica(self, _mock_sync):
+        cita = self._reservar_publico()
+        for inicio in (16, 14, 16):
+            cita.hora_inicio, cita.hora_fin = time(inicio, 0), time(inicio + 1, 0)
+            cita.save()
+        self.assertEqual(self._correos(), 4)
+        self.assertIn("Horario: 16:00 - 17:00", mail.outbox[-1].body)
+
+    def test_misma_entrega_del_mismo_save_no_duplica(self, _mock_sync):
+        cita = self._reservar_publico()
+        cita.estado = "cancelada"
+        cita.save()
+        # Reentrega de la señal del mismo save (mismos valores de partida y llegada)
+        enviar_notificacion_cita(Cita, cita, created=False)
+        self.assertEqual(self._correos(), 2)
+
+    def test_mismo_cambio_desde_dos_instancias_no_duplica(self, _mock_sync):
+        cita = self._reservar_publico()
+        otra = Cita.objects.get(pk=cita.pk)
+        for instancia in (cita, otra):
+            # Dos requests cargaron la misma fila y guardan el mismo cambio
+            instancia.estado = "cancelada"
+            instancia.save()
+            instancia.save()
+        self.assertEqual(self._correos(), 2)
+
+    def test_orden_de_receptores_no_importa(self, _mock_sync):
+        receptores = post_save.receivers[:]
+
+        def restaurar():
+            post_save.receivers = receptores
+            post_save.sender_receivers_cache.clear()
+
+        self.addCleanup(restaurar)
+        # El correo queda después de invalidar_disponibilidad_cita, que refresca `_valores_cargados`
+        post_save.disconnect(enviar_notificacion_cita, sender=Cita)
+        post_save.connect(enviar_notificacion_cita, sender=Cita)
+
+        cita = self._reservar_publico()
+        cita.estado = "cancelada"
+        cita.save()
+        self.assertEqual(self._correos(), 2)
+        self.assertTrue(mail.outbox[1].subject.startswith("Cambio de estado"))
+
+    def test_clave_repetida_no_duplica(self, _mock_sync):
+        primero = outbox.encolar_correo("A", "B", ["x@ejemplo.com"], clave="cita:1:creada:abc")
+        segundo = outbox.encolar_correo("A", "B", ["x@ejemplo.com"], clave="cita:1:creada:abc")
+        self.assertEqual(primero.pk, segundo.pk)
+        self.assertEqual(self._correos(), 1)
+
+
+class OutboxSinTransaccionTests(TransactionTestCase):
+    """Los handlers corren en autocommit, como en `run_outbox` (sin la transacción de TestCase)."""
+
+    def test_error_de_bd_en_un_handler_no_deshace_los_demas(self):
+        correo = outbox.encolar_correo("Asunto", "Cuerpo", ["x@ejemplo.com"])
+        sync = outbox.encolar("calendar_sync", {"cita_id": 0})
+
+        def falla_con_bd(_payload):
+            Cita.objects.create()  # IntegrityError: faltan columnas NOT NULL
+
+        with mock.patch.dict(outbox.HANDLERS, {"calendar_sync": falla_con_bd}), self.assertLogs(
+            "reservas.outbox", level="WARNING"
+        ):
+            self.assertEqual(outbox.procesar_lote(), (1, 1))
+
+        correo.refresh_from_db()
+        sync.refresh_from_db()
+        self.assertEqual(correo.estado, "procesado")
+        self.assertEqual((sync.estado, sync.intentos), ("pendiente", 1))
+        self.assertIn("NOT NULL", sync.ultimo_error.upper())
+        # El correo ya enviado no se reenvía en el siguiente pase
+        OutboxEvento.objects.filter(pk=sync.pk).update(disponible_en=timezone.now())
+        with mock.patch.dict(outbox.HANDLERS, {"calendar_sync": lambda _payload: None}):
+            self.assertEqual(outbox.procesar_lote(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
@@ -0,0 +1,95 @@
+from datetime import date, time, timedelta
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from ..models import Cita, Cliente
+from .base import BaseTestData
+
+
+class PaginacionCursorTests(BaseTestData):
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+        clientes = Cliente.objects.bulk_create(
+            Cliente(negocio=self.negocio, nombre=f"Cliente {i}", email=f"c{i}@ejemplo.com") for i in range(4)
+        )
+        base = date.today() + timedelta(days=3)
+        # Empates en (fecha, hora_inicio) para comprobar el desempate por id
+        citas = [
+            Cita(
+                negocio=self.negocio,
+                servicio=self.servicio,
+                cliente=cliente,
+                fecha=base + timedelta(days=dia),
+                hora_inicio=inicio,
+                hora_fin=time(inicio.hour + 1),
+                estado="confirmada",
+            )
+            for dia in range(3)
+            for inicio in (time(14, 0), time(19, 0))
+            for cliente in clientes[:2]
+        ]
+        Cita.objects.bulk_create(citas)
+        self.esperado = list(Cita.objects.order_by("-fecha", "-hora_inicio", "-id").values_list("id", flat=True))
+        self.url = reverse("cita-list")
+
+    def _recorrer(self, url, params=None):
+        ids, paginas = [], []
+        response = self.api.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200, response.data)
+            paginas.append(response.data)
+            ids.extend(item["id"] for item in response.data["results"])
+            if not response.data["next"]:
+                return ids, paginas
+            response = self.api.get(response.data["next"])
+
+    def test_recorre_todas_las_citas_sin_repetir(self):
+        ids, paginas = self._recorrer(self.url, {"page_size": 5})
+        self.assertEqual(ids, self.esperado)
+        self.assertEqual([len(p["results"]) for p in paginas], [5, 5, 2])
+        self.assertIsNone(paginas[0]["previous"])
+
+        # Y de vuelta con los enlaces "previous"
+        hacia_atras = []
+        response = self.api.get(paginas[-1]["previous"])
+        while True:
+            hacia_atras = [item["id"] for item in response.data["results"]] + hacia_atras
+            if not response.data["previous"]:
+                break
+            response = self.api.get(response.data["previous"])
+        self.assertEqual(hacia_atras, self.esperado[:10])
+
+    def test_respeta_ordering(self):
+        ids, _ = self._recorrer(self.url, {"page_size": 4, "ordering": "fecha"})
+        self.assertEqual(ids, list(Cita.objects.order_by("fecha", "id").values_list("id", flat=True)))
+
+    def test_una_consulta_por_pagina_sin_offset_ni_count(self):
+        primera = self.api.get(self.url, {"page_size": 5})
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api.get(primera.data["next"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        sql = ctx.captured_queries[0]["sql"].upper()
+        self.assertNotIn("OFFSET", sql)
+        self.assertNotIn("COUNT(", sql)
+
+    def test_fields_omite_campos_y_joins(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api.get(self.url, {"fields": "id,fecha,hora_inicio,estado"})
+        self.assertEqual(set(response.data["results"][0]), {"id", "fecha", "hora_inicio", "estado"})
+        self.assertNotIn("JOIN", ctx.captured_queries[0]["sql"].upper())
+
+        response = self.api.get(self.url, {"fields": "id,cliente_nombre", "page_size": 1})
+        self.assertEqual(set(response.data["results"][0]), {"id", "cliente_nombre"})
+
+    def test_cursor_invalido(self):
+        self.assertEqual(self.api.get(self.url, {"cursor": "no-es-un-cursor"}).status_code, 404)
+
+    def test_clientes_paginados(self):
+        ids, _ = self._recorrer(reverse("cliente-list"), {"page_size": 2, "fields": "id,nombre"})
+        self.assertEqual(ids, list(Cliente.objects.order_by("-creado_en", "-id").values_list("id", flat=True)))
@@ -0,0 +1,100 @@
+from datetime import date, time, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core import mail
+from django.core.mail import get_connection
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+
+from ..models import Cita, Cliente
+from .base import BaseTestData
+
+
+class EnviarRecordatoriosTests(BaseTestData):
+    TOTAL = 7
+
+    def setUp(self):
+        super().setUp()
+        manana = date.today() + timedelta(days=1)
+        for i in range(self.TOTAL):
+            cliente = Cliente.objects.create(negocio=self.negocio, nombre=f"Cliente {i}", email=f"c{i}@ejemplo.com")
+            Cita.objects.create(
+                negocio=self.negocio,
+                servicio=self.servicio,
+                cliente=cliente,
+                fecha=manana,
+                hora_inicio=time(13 + i, 0),
+                hora_fin=time(14 + i, 0),
+                estado="confirmada",
+            )
+        sin_email = Cliente.objects.create(negocio=self.negocio, nombre="Sin email", email="")
+        Cita.objects.create(
+            negocio=self.negocio,
+            servicio=self.servicio,
+            cliente=sin_email,
+            fecha=manana,
+            hora_inicio=time(21, 0),
+            hora_fin=time(22, 0),
+        )
+
+    def _run(self, *args):
+        out = StringIO()
+        call_command("enviar_recordatorios", *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_envia_por_lotes_con_una_conexion_por_lote(self):
+        with mock.patch(
+            "reservas.management.commands.enviar_recordatorios.get_connection", side_effect=get_connection
+        ) as conexiones:
+            salida = self._run("--batch-size", "3")
+
+        self.assertEqual(len(mail.outbox), self.TOTAL)
+        self.assertEqual(conexiones.call_count, 3)
+        self.assertIn(f"Recordatorios enviados: {self.TOTAL} en 3 lote(s)", salida)
+        self.assertEqual(Cita.objects.filter(recordatorio_enviado=True).count(), self.TOTAL)
+
+        # Segunda corrida: nada pendiente
+        self._run()
+        self.assertEqual(len(mail.outbox), self.TOTAL)
+
+    def test_consultas_por_lote_constantes(self):
+        # Por lote: 1 SELECT + 1 UPDATE; más el SELECT final vacío
+        with self.assertNumQueries(2 * 3 + 1):
+            self._run("--batch-size", "3")
+
+    def test_dry_run_no_envia_ni_marca(self):
+        salida = self._run("--dry-run", "--batch-size", "5")
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertFalse(Cita.objects.filter(recordatorio_enviado=True).exists())
+        self.assertIn(f"[dry-run] Recordatorios a enviar: {self.TOTAL} en 2 lote(s)", salida)
+
+    def test_lote_fallido_queda_pendiente(self):
+        with mock.patch("django.core.mail.backends.locmem.EmailBackend.send_messages", side_effect=OSError("smtp")):
+            salida = self._run()
+        self.assertIn(f"Sin enviar: {self.TOTAL}", salida)
+        self.assertFalse(Cita.objects.filter(recordatorio_enviado=True).exists())
+
+    def test_fallo_a_mitad_de_lote_marca_los_entregados(self):
+        send_original = EmailBackend.send_messages
+        llamadas = []
+
+        def send_messages(backend, messages):
+            llamadas.append(messages)
+            if len(llamadas) == 3:
+                raise OSError("smtp caído")
+            return send_original(backend, messages)
+
+        with mock.patch.object(EmailBackend, "send_messages", autospec=True, side_effect=send_messages):
+            salida = self._run("--batch-size", "5")
+
+        # Lote 1: dos entregados antes del fallo; lote 2 completo
+        entregados = 2 + (self.TOTAL - 5)
+        self.assertEqual(len(mail.outbox), entregados)
+        self.assertEqual(Cita.objects.filter(recordatorio_enviado=True).count(), entregados)
+        self.assertIn(f"Sin enviar: {self.TOTAL - entregados}", salida)
+
+        # El reintento solo envía los que faltaban
+        self._run()
+        self.assertEqual(len(mail.outbox), self.TOTAL)
+        self.assertEqual(len({m.to[0] for m in mail.outbox}), self.TOTAL)
@@ -1,54 +1,16 @@
 from datetime import date, datetime, time, timedelta
 from unittest import mock
 
-from django.contrib.auth import get_user_model
-from django.test import TestCase, override_settings
+from django.test import override_settings
 from django.urls import reverse
 
-from googleapiclient.errors import HttpError
 from rest_framework.test import APIClient
 
-from .models import CalendarCredential, Cita, Cliente, Mesa, Negocio, Servicio
-from .google_sync import _build_event_body, resync_calendar_events, sync_cita_to_calendar
-from .serializers import CitaSerializer, MesaSerializer
-from .utils import suggest_slot
-
-
-class BaseTestData(TestCase):
-    def setUp(self):
-        User = get_user_model()
-        self.user = User.objects.create_user(
-            username="tester",
-            email="tester@example.com",
-            password="pass1234",
-        )
-        self.negocio = Negocio.objects.create(
-            nombre="Restaurante Prueba",
-            propietario=self.user,
-            direccion="Calle 1",
-            telefono="1234567890",
-        )
-        self.servicio = Servicio.objects.create(
-            negocio=self.negocio,
-            nombre="Mesa 2 personas",
-            duracion_minutos=60,
-            precio=0,
-        )
-        self.cliente = Cliente.objects.create(
-            negocio=self.negocio,
-            nombre="Cliente Uno",
-            email="cliente@ejemplo.com",
-        )
-        # Solo una mesa activa para probar saturación
-        self.mesa = Mesa.objects.create(
-            negocio=self.negocio,
-            servicio=self.servicio,
-            nombre="Mesa 1",
-            tipo="normal_2",
-            capacidad_min=1,
-            capacidad_max=2,
-            activa=True,
-        )
+from ..models import CalendarCredential, Cita, Cliente, Negocio
+from ..google_sync import _build_event_body, resync_calendar_events, sync_cita_to_calendar
+from ..serializers import CitaSerializer, MesaSerializer
+from ..utils import suggest_slot
+from .base import BaseTestData, _FakeCalendarService, proximo_dia_abierto
 
 
 class CitaSerializerTests(BaseTestData):
@@ -73,7 +35,7 @@ class CitaSerializerTests(BaseTestData):
                 "negocio": self.negocio.id,
                 "servicio": self.servicio.id,
                 "cliente": self.cliente.id,
-                "fecha": date.today() + timedelta(days=1),
+                "fecha": proximo_dia_abierto(),
                 "hora_inicio": time(14, 0),
                 "hora_fin": time(15, 0),
                 "estado": "confirmada",
@@ -88,7 +50,7 @@ class CitaSerializerTests(BaseTestData):
                 "negocio": self.negocio.id,
                 "servicio": self.servicio.id,
                 "cliente": self.cliente.id,
-                "fecha": date.today() + timedelta(days=1),
+                "fecha": proximo_dia_abierto(),
                 "hora_inicio": time(14, 30),
                 "hora_fin": time(15, 30),
                 "estado": "pendiente",
@@ -125,7 +87,7 @@ class CitaSerializerTests(BaseTestData):
             "negocio": self.negocio.id,
             "servicio": self.servicio.id,
             "cliente": self.cliente.id,
-            "fecha": date.today() + timedelta(days=1),
+            "fecha": proximo_dia_abierto(),
             "hora_inicio": time(17, 0),
             "hora_fin": time(18, 0),
             "estado": "confirmada",
@@ -160,14 +122,14 @@ class SuggestionTests(BaseTestData):
             negocio=self.negocio,
             servicio=self.servicio,
             cliente=self.cliente,
-            fecha=date.today() + timedelta(days=1),
+            fecha=proximo_dia_abierto(),
             hora_inicio=time(14, 0),
             hora_fin=time(15, 0),
             estado="confirmada",
         )
         slot = suggest_slot(
             servicio=self.servicio,
-            fecha_desde=date.today() + timedelta(days=1),
+            fecha_desde=proximo_dia_abierto(),
             duracion_minutos=60,
         )
         self.assertIsNotNone(slot)
@@ -179,7 +141,7 @@ class SuggestionTests(BaseTestData):
         self.mesa.save()
         slot = suggest_slot(
             servicio=self.servicio,
-            fecha_desde=date.today() + timedelta(days=1),
+            fecha_desde=proximo_dia_abierto(),
             duracion_minutos=60,
         )
         self.assertIsNone(slot)
@@ -189,7 +151,7 @@ class SuggestionTests(BaseTestData):
         preferida = time(19, 0)
         slot = suggest_slot(
             servicio=self.servicio,
-            fecha_desde=date.today() + timedelta(days=1),
+            fecha_desde=proximo_dia_abierto(),
             duracion_minutos=60,
             prefer_hora=preferida,
         )
@@ -197,59 +159,6 @@ class SuggestionTests(BaseTestData):
         self.assertEqual(slot.hora_inicio, preferida)
 
 
-class _FakeResponse:
-    def __init__(self, status, reason=""):
-        self.status = status
-        self.reason = reason
-
-
-class _FakeRequest:
-    def __init__(self, payload=None, exception=None):
-        self.payload = payload
-        self.exception = exception
-
-    def execute(self):
-        if self.exception:
-            raise self.exception
-        return self.payload
-
-
-class _FakeEventsService:
-    def __init__(self):
-        self.store = {}
-
-    def insert(self, calendarId, body, sendUpdates=None):
-        event_id = f"evt_{len(self.store) + 1}"
-        payload = {"id": event_id, **body}
-        self.store[event_id] = payload
-        return _FakeRequest(payload)
-
-    def update(self, calendarId, eventId, body):
-        if eventId not in self.store:
-            return _FakeRequest(exception=HttpError(_FakeResponse(404), b""))
-        self.store[eventId].update(body)
-        return _FakeRequest(self.store[eventId])
-
-    def delete(self, calendarId, eventId):
-        if eventId not in self.store:
-            return _FakeRequest(exception=HttpError(_FakeResponse(404), b""))
-        self.store.pop(eventId, None)
-        return _FakeRequest({})
-
-    def get(self, calendarId, eventId):
-        if eventId not in self.store:
-            return _FakeRequest(exception=HttpError(_FakeResponse(404), b""))
-        return _FakeRequest(self.store[eventId])
-
-
-class _FakeCalendarService:
-    def __init__(self):
-        self.events_service = _FakeEventsService()
-
-    def events(self):
-        return self.events_service
-
-
 class GoogleCalendarSyncTests(BaseTestData):
     @override_settings(TIME_ZONE="UTC")
     def test_event_body_agrega_zona_horaria(self):
@@ -269,9 +178,8 @@ class GoogleCalendarSyncTests(BaseTestData):
         self.assertIsNotNone(parsed.tzinfo)
         self.assertEqual(body["start"]["timeZone"], "UTC")
 
-    @mock.patch("reservas.signals.sync_cita_to_calendar")
     @mock.patch("reservas.google_sync._get_service")
-    def test_resync_crea_evento_cuando_no_existe(self, mock_get_service, _mock_signal):
+    def test_resync_crea_evento_cuando_no_existe(self, mock_get_service):
         fake_service = _FakeCalendarService()
         mock_get_service.return_value = (fake_service, "primary")
         cita = Cita.objects.create(
@@ -292,9 +200,8 @@ class GoogleCalendarSyncTests(BaseTestData):
         self.assertTrue(cita.event_id)
         self.assertIn(cita.event_id, fake_service.events_service.store)
 
-    @mock.patch("reservas.signals.sync_cita_to_calendar")
     @mock.patch("reservas.google_sync._get_service")
-    def test_resync_actualiza_evento_existente(self, mock_get_service, _mock_signal):
+    def test_resync_actualiza_evento_existente(self, mock_get_service):
         fake_service = _FakeCalendarService()
         mock_get_service.return_value = (fake_service, "primary")
         cita = Cita.objects.create(
@@ -315,9 +222,8 @@ class GoogleCalendarSyncTests(BaseTestData):
         self.assertEqual(actualizados, 1)
         self.assertEqual(fake_service.events_service.store["evt_1"]["summary"], f"Cita: {self.servicio.nombre} - {self.cliente.nombre}")
 
-    @mock.patch("reservas.signals.sync_cita_to_calendar")
     @mock.patch("reservas.google_sync._get_service")
-    def test_sync_recrea_cuando_calendar_devuelve_404(self, mock_get_service, _mock_signal):
+    def test_sync_recrea_cuando_calendar_devuelve_404(self, mock_get_service):
         fake_service = _FakeCalendarService()
         mock_get_service.return_value = (fake_service, "primary")
         cita = Cita.objects.create(
@@ -353,11 +259,10 @@ class GoogleCalendarApiTests(BaseTestData):
         resp = self.client.post(reverse("google-calendar"), {"calendar_id": "my-cal"})
         self.assertEqual(resp.status_code, 400)
 
-    @mock.patch("reservas.signals.sync_cita_to_calendar")
-    @mock.patch("reservas.google_sync._get_service")
-    def test_resync_endpoint_funciona(self, mock_get_service, _mock_signal):
+    @mock.patch("reservas.google_sync._cargar_calendar")
+    def test_resync_endpoint_funciona(self, mock_cargar):
         fake_service = _FakeCalendarService()
-        mock_get_service.return_value = (fake_service, "primary")
+        mock_cargar.return_value = (fake_service, "primary", None, 1)
         CalendarCredential.objects.create(
             nombre="default",
             calendar_id="primary",
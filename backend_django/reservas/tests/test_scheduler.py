@@ -0,0 +1,122 @@
+import time as time_mod
+from datetime import date, time, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+
+from .. import scheduler
+from ..models import Cita, SchedulerLease
+from .base import BaseTestData
+
+
+class LeaseTests(BaseTestData):
+    def test_un_solo_lider(self):
+        lease = timedelta(seconds=60)
+        self.assertTrue(scheduler.adquirir_lease("a", lease))
+        self.assertFalse(scheduler.adquirir_lease("b", lease))
+        # El titular renueva
+        self.assertTrue(scheduler.adquirir_lease("a", lease))
+
+        # Si el líder deja expirar el lease, otra réplica lo toma
+        SchedulerLease.objects.update(expira_en=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(scheduler.adquirir_lease("b", lease))
+        self.assertFalse(scheduler.adquirir_lease("a", lease))
+
+        scheduler.liberar_lease("b")
+        self.assertTrue(scheduler.adquirir_lease("a", lease))
+
+
+@override_settings(SCHEDULER_JOBS={"marcar_no_show": 60, "enviar_recordatorios": 0})
+class RunSchedulerTests(BaseTestData):
+    def _run(self):
+        out = StringIO()
+        with self.assertLogs("reservas.scheduler", level="INFO") as logs:
+            call_command("run_scheduler", "--once", stdout=out)
+        return out.getvalue(), "\n".join(logs.output)
+
+    def test_ejecuta_jobs_habilitados_y_registra_duracion(self):
+        Cita.objects.create(
+            negocio=self.negocio,
+            servicio=self.servicio,
+            cliente=self.cliente,
+            fecha=date.today() - timedelta(days=1),
+            hora_inicio=time(14, 0),
+            hora_fin=time(15, 0),
+        )
+        salida, logs = self._run()
+
+        self.assertIn("[marcar_no_show]", salida)
+        self.assertNotIn("enviar_recordatorios]", salida)
+        self.assertIn("Citas marcadas como no_asistio: 1", logs)
+        self.assertRegex(logs, r"Job marcar_no_show en \d+\.\d\ds")
+        # --once libera el lease al terminar
+        self.assertFalse(SchedulerLease.objects.exists())
+
+    def test_no_lider_no_ejecuta(self):
+        SchedulerLease.objects.create(
+            nombre=scheduler.LEASE_NOMBRE, titular="otra-replica", expira_en=timezone.now() + timedelta(minutes=1)
+        )
+        out = StringIO()
+        with mock.patch("reservas.scheduler.call_command") as llamado:
+            call_command("run_scheduler", "--once", stdout=out)
+        llamado.assert_not_called()
+        self.assertEqual(SchedulerLease.objects.get().titular, "otra-replica")
+
+
+class EjecutarVencidosTests(BaseTestData):
+    def test_respeta_intervalo_y_aisla_fallos(self):
+        jobs = [scheduler.Job("falla", 60), scheduler.Job("marcar_no_show", 60)]
+
+        def _call(comando, **kwargs):
+            if comando == "falla":
+                raise RuntimeError("boom")
+            kwargs["stdout"].write("ok: 0\n")
+
+        with mock.patch("reservas.scheduler.call_command", side_effect=_call) as llamado, self.assertLogs(
+            "reservas.scheduler", level="INFO"
+        ):
+            resultados = scheduler.ejecutar_vencidos(jobs)
+            self.assertEqual([r[0] for r in resultados], ["marcar_no_show"])
+            self.assertEqual(resultados[0][2], "ok: 0")
+
+            # Ninguno vencido todavía (también el que falló espera su intervalo)
+            self.assertEqual(scheduler.ejecutar_vencidos(jobs), [])
+        self.assertEqual(llamado.call_count, 2)
+
+    def test_renueva_el_lease_mientras_corre_un_job_largo(self):
+        renovaciones = []
+
+        def renovar():
+            renovaciones.append(time_mod.monotonic())
+            return True
+
+        def _call(comando, **kwargs):
+            time_mod.sleep(0.35)
+            kwargs["stdout"].write("ok: 0\n")
+
+        with mock.patch("reservas.scheduler.call_command", side_effect=_call), self.assertLogs(
+            "reservas.scheduler", level="INFO"
+        ):
+            resultados = scheduler.ejecutar_vencidos([scheduler.Job("largo", 60)], sigue_lider=renovar, latido=0.1)
+
+        self.assertEqual(len(resultados), 1)
+        # Una antes del job y al menos dos desde el hilo de latido
+        self.assertGreaterEqual(len(renovaciones), 3)
+
+    def test_lease_perdido_durante_un_job_detiene_la_ronda(self):
+        respuestas = iter([True, False])
+        jobs = [scheduler.Job("primero", 60), scheduler.Job("segundo", 60)]
+
+        def _call(comando, **kwargs):
+            time_mod.sleep(0.25)
+
+        with mock.patch("reservas.scheduler.call_command", side_effect=_call) as llamado, self.assertLogs(
+            "reservas.scheduler", level="WARNING"
+        ) as logs:
+            scheduler.ejecutar_vencidos(jobs, sigue_lider=lambda: next(respuestas, False), latido=0.1)
+
+        self.assertEqual([c.args[0] for c in llamado.call_args_list], ["primero"])
+        self.assertIn("Se perdió el lease del scheduler con un job en curso", "\n".join(logs.output))
@@ -8,6 +8,9 @@ from .views import (
     MesaViewSet,
     AgendaSuggestionView,
     AgendaAvailabilityView,
+    AgendaAvailabilityRangeView,
+    AgendaCacheStatsView,
+    MetricsView,
     PublicMesaAvailabilityView,
     MercadoPagoPreferenceView,
 )
@@ -34,6 +37,9 @@ urlpatterns = [
     path('', include(router.urls)),
     path('agenda/sugerir/', AgendaSuggestionView.as_view(), name='agenda-sugerir'),
     path('agenda/disponibilidad/', AgendaAvailabilityView.as_view(), name='agenda-disponibilidad'),
+    path('agenda/disponibilidad/rango/', AgendaAvailabilityRangeView.as_view(), name='agenda-disponibilidad-rango'),
+    path('agenda/cache/', AgendaCacheStatsView.as_view(), name='agenda-cache'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('public/citas/', crear_cita_publica, name='crear-cita-publica'),
     path('google/authorize/', GoogleAuthStart.as_view(), name='google-authorize'),
     path('google/callback/', GoogleAuthCallback.as_view(), name='google-callback'),
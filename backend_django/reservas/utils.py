@@ -2,15 +2,22 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import date, time, timedelta
+from itertools import groupby
+from operator import itemgetter
 from typing import Optional
 
+from . import cache as availability_cache
+from .horarios import APERTURA_DEFAULT, CIERRE_DEFAULT, Horario, Intervalo, horario_de
 from .models import Cita, Mesa, Servicio
+from .occupancy import OccupancyProfile
 
 
-OPEN_TIME = time(13, 0)
-CLOSE_TIME = time(23, 0)
+# Horario por defecto; el de cada negocio sale de reservas.horarios
+OPEN_TIME = APERTURA_DEFAULT
+CLOSE_TIME = CIERRE_DEFAULT
 STEP_MINUTES = 15
 TOLERANCIA_LLEGADA_MINUTOS = 15  # ventana de llegada antes de marcar no_show (gestiona el comando marcar_no_show)
+ACTIVE_STATES = ("pendiente", "confirmada")
 
 
 def _to_minutes(t: time) -> int:
@@ -21,6 +28,49 @@ def _to_time(minutes: int) -> time:
     return time(minutes // 60, minutes % 60)
 
 
+def _active_bookings(servicio: Servicio, fecha: date) -> list[tuple[int, int]]:
+    """(inicio, fin) en minutos de las citas pendientes/confirmadas del día."""
+    return [
+        (_to_minutes(h_ini), _to_minutes(h_fin))
+        for h_ini, h_fin in Cita.objects.filter(
+            servicio=servicio,
+            fecha=fecha,
+            estado__in=ACTIVE_STATES,
+        ).values_list("hora_inicio", "hora_fin")
+    ]
+
+
+def _iter_bookings_by_day(servicio: Servicio, fecha_desde: date, fecha_hasta: date):
+    """
+    Genera (fecha, [(inicio, fin), ...]) para cada día de [fecha_desde, fecha_hasta],
+    incluidos los días sin citas. Usa una sola consulta ordenada por fecha que se
+    consume de forma perezosa: si quien itera se detiene en el primer día útil,
+    el resto de filas no se materializa.
+    """
+    filas = (
+        Cita.objects.filter(
+            servicio=servicio,
+            fecha__gte=fecha_desde,
+            fecha__lte=fecha_hasta,
+            estado__in=ACTIVE_STATES,
+        )
+        .order_by("fecha")
+        .values_list("fecha", "hora_inicio", "hora_fin")
+        .iterator(chunk_size=500)
+    )
+    grupos = groupby(filas, key=itemgetter(0))
+    siguiente = next(grupos, None)
+
+    dia = fecha_desde
+    while dia <= fecha_hasta:
+        bookings = []
+        if siguiente is not None and siguiente[0] == dia:
+            bookings = [(_to_minutes(h_ini), _to_minutes(h_fin)) for _, h_ini, h_fin in siguiente[1]]
+            siguiente = next(grupos, None)
+        yield dia, bookings
+        dia += timedelta(days=1)
+
+
 @dataclass
 class SlotSuggestion:
     fecha: date
@@ -38,7 +88,7 @@ def suggest_slot(
 ) -> Optional[SlotSuggestion]:
     """
     Heurística para sugerir el mejor horario disponible:
-    - Busca en intervalos de 15 minutos entre 13:00 y 23:00.
+    - Busca en intervalos de 15 minutos dentro del horario del negocio; salta días cerrados.
     - Respeta número de mesas activas por servicio (capacidad de concurrencia).
     - Minimiza tiempos muertos (gap antes + gap después) y, si hay preferencia, penaliza lejanía a la hora preferida.
     - Recorre desde fecha_desde hasta +dias_hacia_adelante.
@@ -47,60 +97,47 @@ def suggest_slot(
     duracion = duracion_minutos or servicio.duracion_minutos or 60
     prefer_min = _to_minutes(prefer_hora) if prefer_hora else None
 
-    open_min = _to_minutes(OPEN_TIME)
-    close_min = _to_minutes(CLOSE_TIME)
+    horario = horario_de(servicio.negocio_id)
+    return availability_cache.cached_suggestion(
+        servicio.id,
+        fecha_base,
+        dias_hacia_adelante,
+        (duracion, prefer_min, horario.version),
+        lambda: _compute_suggestion(servicio, fecha_base, duracion, prefer_min, dias_hacia_adelante, horario),
+    )
+
 
+def _compute_suggestion(
+    servicio: Servicio,
+    fecha_base: date,
+    duracion: int,
+    prefer_min: Optional[int],
+    dias_hacia_adelante: int,
+    horario: Horario,
+) -> Optional[SlotSuggestion]:
     mesas_activas = Mesa.objects.filter(servicio=servicio, activa=True).count()
     if mesas_activas == 0:
         return None
 
-    for offset in range(dias_hacia_adelante + 1):
-        dia = fecha_base + timedelta(days=offset)
-        # Solo citas activas para validar disponibilidad
-        citas = Cita.objects.filter(
-            servicio=servicio,
-            fecha=dia,
-            estado__in=("pendiente", "confirmada"),
-        ).values_list("hora_inicio", "hora_fin")
-
-        bookings = [
-            (_to_minutes(h_ini), _to_minutes(h_fin))
-            for h_ini, h_fin in citas
-        ]
-
-        best_score = None
-        best_slot = None
-
-        # Última hora de inicio permitida para que termine antes de cierre
-        last_start = close_min - duracion
-        if last_start < open_min:
+    # Una sola consulta para toda la ventana; los días se consumen de uno en uno
+    fecha_hasta = fecha_base + timedelta(days=dias_hacia_adelante)
+    for dia, bookings in _iter_bookings_by_day(servicio, fecha_base, fecha_hasta):
+        intervalo = horario.intervalo(dia)
+        # Día cerrado, o la jornada es más corta que la cita
+        if intervalo is None or intervalo[1] - duracion < intervalo[0]:
             continue
+        open_min, close_min = intervalo
+        profile = OccupancyProfile(bookings, open_min, close_min)
 
-        bookings_start_min = min((h_ini for h_ini, _ in bookings), default=None)
         # Si ya hay citas en el día y no hay preferencia, arranca buscando desde el inicio de la jornada ocupada.
-        start_min = open_min if bookings_start_min is None or prefer_min is not None else bookings_start_min
-
-        for start in range(start_min, last_start + 1, STEP_MINUTES):
-            end = start + duracion
-
-            # Verificar concurrencia con mesas activas
-            overlaps = sum(1 for h_ini, h_fin in bookings if not (h_fin <= start or h_ini >= end))
-            if overlaps >= mesas_activas:
-                continue
-
-            # Buscar huecos inmediatos para minimizar tiempos muertos
-            prev_end = max((h_fin for h_ini, h_fin in bookings if h_fin <= start), default=open_min)
-            next_start = min((h_ini for h_ini, h_fin in bookings if h_ini >= end), default=close_min)
-            idle_before = start - prev_end
-            idle_after = next_start - end
-            score = idle_before + idle_after
-
-            if prefer_min is not None:
-                score += abs(start - prefer_min) * 0.5
-
-            if best_score is None or score < best_score:
-                best_score = score
-                best_slot = (start, end)
+        start_min = open_min if not profile.starts or prefer_min is not None else profile.starts[0]
+        best_slot = profile.best_gap(
+            duracion,
+            mesas_activas,
+            STEP_MINUTES,
+            prefer_min=prefer_min,
+            start_min=start_min,
+        )
 
         if best_slot:
             start_min, end_min = best_slot
@@ -117,41 +154,96 @@ def suggest_slot(
     return None
 
 
+def dia_cerrado(fecha: date, negocio_id: Optional[int] = None) -> bool:
+    """Si el negocio (o el horario por defecto: jueves cerrado) no abre ese día."""
+    return horario_de(negocio_id).cerrado(fecha)
+
+
+def _slots_for_day(intervalo: Intervalo, bookings, duracion: int, mesas_activas: int) -> list[tuple[time, time]]:
+    if intervalo is None:
+        return []
+
+    open_min, close_min = intervalo
+    profile = OccupancyProfile(bookings, open_min, close_min)
+    return [
+        (_to_time(start), _to_time(end))
+        for start, end in profile.free_slots(duracion, mesas_activas, STEP_MINUTES)
+    ]
+
+
 def available_slots(servicio: Servicio, fecha: date, duracion_minutos: Optional[int] = None):
     """
     Devuelve lista de slots disponibles (hora_inicio, hora_fin) para un servicio/fecha,
-    usando step de 15 minutos y considerando mesas activas y solapes.
+    usando step de 15 minutos y considerando mesas activas, solapes y el horario del negocio.
+    El resultado se cachea por (servicio, fecha, duracion); ver reservas.cache.
     """
-    # Jueves cerrado
-    if fecha.weekday() == 3:  # 0=Lunes ... 3=Jueves
+    horario = horario_de(servicio.negocio_id)
+    intervalo = horario.intervalo(fecha)
+    if intervalo is None:  # ni siquiera consultamos la BD
         return []
 
     duracion = duracion_minutos or servicio.duracion_minutos or 60
-    open_min = _to_minutes(OPEN_TIME)
-    close_min = _to_minutes(CLOSE_TIME)
+    return availability_cache.cached_slots(
+        servicio.id,
+        fecha,
+        duracion,
+        lambda: _compute_available_slots(servicio, fecha, duracion, intervalo),
+        horario_version=horario.version,
+    )
+
+
+def _compute_available_slots(
+    servicio: Servicio, fecha: date, duracion: int, intervalo: Intervalo
+) -> list[tuple[time, time]]:
+    if intervalo[1] - duracion < intervalo[0]:
+        return []
     mesas_activas = Mesa.objects.filter(servicio=servicio, activa=True).count()
     if mesas_activas == 0:
         return []
 
-    bookings = [
-        (_to_minutes(h_ini), _to_minutes(h_fin))
-        for h_ini, h_fin in Cita.objects.filter(
-            servicio=servicio,
-            fecha=fecha,
-            estado__in=("pendiente", "confirmada"),
-        ).values_list("hora_inicio", "hora_fin")
-    ]
+    return _slots_for_day(intervalo, _active_bookings(servicio, fecha), duracion, mesas_activas)
 
-    last_start = close_min - duracion
-    if last_start < open_min:
-        return []
 
-    slots = []
-    for start in range(open_min, last_start + 1, STEP_MINUTES):
-        end = start + duracion
-        overlaps = sum(1 for h_ini, h_fin in bookings if not (h_fin <= start or h_ini >= end))
-        if overlaps >= mesas_activas:
-            continue
-        slots.append((_to_time(start), _to_time(end)))
+def available_slots_range(
+    servicio: Servicio,
+    fecha_desde: date,
+    fecha_hasta: date,
+    duracion_minutos: Optional[int] = None,
+) -> dict[date, list[tuple[time, time]]]:
+    """
+    Slots disponibles por día en [fecha_desde, fecha_hasta] con una sola consulta de citas.
+    Mismas reglas que available_slots (incluidos días cerrados). Solo se calculan
+    los días que no estén en cache.
+    """
+    dias = [fecha_desde + timedelta(days=i) for i in range((fecha_hasta - fecha_desde).days + 1)]
+    duracion = duracion_minutos or servicio.duracion_minutos or 60
+    if not dias:
+        return {}
+
+    horario = horario_de(servicio.negocio_id)
+    return availability_cache.cached_slots_range(
+        servicio.id,
+        dias,
+        duracion,
+        lambda faltantes: _compute_slots_range(servicio, min(faltantes), max(faltantes), duracion, horario),
+        horario_version=horario.version,
+    )
+
+
+def _compute_slots_range(
+    servicio: Servicio,
+    fecha_desde: date,
+    fecha_hasta: date,
+    duracion: int,
+    horario: Horario,
+) -> dict[date, list[tuple[time, time]]]:
+    dias = [fecha_desde + timedelta(days=i) for i in range((fecha_hasta - fecha_desde).days + 1)]
+    resultado = {dia: [] for dia in dias}
+
+    mesas_activas = Mesa.objects.filter(servicio=servicio, activa=True).count()
+    if mesas_activas == 0:
+        return resultado
 
-    return slots
+    for dia, bookings in _iter_bookings_by_day(servicio, fecha_desde, fecha_hasta):
+        resultado[dia] = _slots_for_day(horario.intervalo(dia), bookings, duracion, mesas_activas)
+    return resultado
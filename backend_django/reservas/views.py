@@ -1,28 +1,56 @@
-from datetime import date, time
+from contextlib import nullcontext
+from datetime import date, time, timedelta
 import json
 import os
 from urllib import request as urlrequest
 from urllib.error import HTTPError, URLError
 from rest_framework import viewsets, permissions, filters
-from rest_framework.permissions import AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated, IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.conf import settings
+from django.http import HttpResponse
+from django.db.models import Case, Count, Max, Min, Value, When
+from django.db.models.functions import Coalesce, NullIf, Trim
 from .models import Negocio, Servicio, Cliente, Cita, Mesa
+from .pagination import CitaPagination, ClientePagination
 from .serializers import (
     NegocioSerializer,
     ServicioSerializer,
     ClienteSerializer,
     CitaSerializer,
     MesaSerializer,
+    campos_solicitados,
 )
-from .utils import suggest_slot, available_slots
+from . import cache as availability_cache
+from . import metricas
+from .agenda_lock import bloquear_agenda
+from .renderers import JSONPrecalculadoRenderer, SlotsCompactosRenderer, dias_json, es_compacto, slots_json
+from .condicional import get_condicional, huella_catalogo, huella_dia, huella_mesas, huella_rango
+from .utils import suggest_slot, available_slots, available_slots_range, dia_cerrado
 
 
 # ====== VISTAS SIMPLES PARA DESARROLLO ======
 # TODO: Más adelante metemos permisos por usuario / auth seria
 
 
+class JoinsSegunCamposMixin:
+    """
+    Con ``?fields=`` solo hace JOIN de las relaciones cuyos campos ``*_nombre``
+    se pidieron. ``joins_por_campo`` mapea campo del serializer -> relación.
+    """
+    joins_por_campo: dict[str, str] = {}
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        campos = campos_solicitados(self.request)
+        relaciones = [
+            relacion for campo, relacion in self.joins_por_campo.items() if campos is None or campo in campos
+        ]
+        # select_related() sin argumentos seguiría todas las FK
+        return queryset.select_related(*relaciones) if relaciones else queryset
+
+
 class NegocioViewSet(viewsets.ModelViewSet):
     """
     CRUD de negocios.
@@ -41,21 +69,33 @@ class ServicioViewSet(viewsets.ModelViewSet):
     CRUD de servicios.
     """
     # Ordenamos por id para mantener consistencia de selección en frontend
-    queryset = Servicio.objects.all().order_by('id')
+    queryset = Servicio.objects.select_related('negocio').order_by('id')
     serializer_class = ServicioSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['nombre', 'descripcion']
     ordering_fields = ['precio', 'duracion_minutos', 'nombre']
 
+    # Catálogo público: ETag por versión del catálogo y cacheable en CDN
+    @get_condicional(huella_catalogo, "CACHE_CONTROL_CATALOGO_SEGUNDOS")
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
-class ClienteViewSet(viewsets.ModelViewSet):
+    @get_condicional(huella_catalogo, "CACHE_CONTROL_CATALOGO_SEGUNDOS")
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+
+class ClienteViewSet(JoinsSegunCamposMixin, viewsets.ModelViewSet):
     """
     CRUD de clientes.
+    Listado paginado por cursor sobre (creado_en, id); acepta ?fields=.
     """
-    queryset = Cliente.objects.all().order_by('-creado_en')
+    queryset = Cliente.objects.all().order_by('-creado_en', '-id')
     serializer_class = ClienteSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = ClientePagination
+    joins_por_campo = {'negocio_nombre': 'negocio'}
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['nombre', 'email', 'telefono']
     ordering_fields = ['creado_en', 'nombre']
@@ -73,15 +113,23 @@ class MesaViewSet(viewsets.ModelViewSet):
     ordering_fields = ['nombre', 'capacidad_max']
 
 
-class CitaViewSet(viewsets.ModelViewSet):
+class CitaViewSet(JoinsSegunCamposMixin, viewsets.ModelViewSet):
     """
     CRUD de citas.
+    Listado paginado por cursor sobre (fecha, hora_inicio, id); acepta ?fields=.
+    Altas y ediciones validan y guardan bajo el mismo bloqueo por (servicio, fecha)
+    que la reserva pública, así el admin no sobrevende contra reservas simultáneas.
     """
-    queryset = Cita.objects.select_related('negocio', 'servicio', 'cliente').order_by(
-        '-fecha', '-hora_inicio'
-    )
+    queryset = Cita.objects.order_by('-fecha', '-hora_inicio', '-id')
     serializer_class = CitaSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CitaPagination
+    joins_por_campo = {
+        'negocio_nombre': 'negocio',
+        'servicio_nombre': 'servicio',
+        'cliente_nombre': 'cliente',
+        'mesa_nombre': 'mesa',
+    }
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = [
         'cliente__nombre',
@@ -91,6 +139,26 @@ class CitaViewSet(viewsets.ModelViewSet):
     ]
     ordering_fields = ['fecha', 'hora_inicio', 'creado_en']
 
+    def create(self, request, *args, **kwargs):
+        with self._bloqueo_agenda(request):
+            return super().create(request, *args, **kwargs)
+
+    def update(self, request, *args, **kwargs):
+        with self._bloqueo_agenda(request, self.get_object()):
+            return super().update(request, *args, **kwargs)
+
+    def _bloqueo_agenda(self, request, instancia=None):
+        """Bloqueo del (servicio, fecha) destino; sin datos válidos la validación los rechaza sin bloquear."""
+        servicio_id = request.data.get("servicio") or (instancia.servicio_id if instancia else None)
+        fecha = request.data.get("fecha") or (instancia.fecha.isoformat() if instancia else None)
+        try:
+            servicio_id, fecha = int(servicio_id), date.fromisoformat(str(fecha))
+        except (TypeError, ValueError):
+            return nullcontext()
+        if not Servicio.objects.filter(pk=servicio_id).exists():
+            return nullcontext()
+        return bloquear_agenda(servicio_id, fecha)
+
 
 class AgendaSuggestionView(APIView):
     """
@@ -160,9 +228,12 @@ class AgendaSuggestionView(APIView):
 class AgendaAvailabilityView(APIView):
     """
     Devuelve slots disponibles para un servicio y fecha.
+    Con ?format=compact los slots son pares [inicio, fin] en minutos desde medianoche.
     """
     permission_classes = [AllowAny]
+    renderer_classes = [JSONPrecalculadoRenderer, SlotsCompactosRenderer]
 
+    @get_condicional(huella_dia, "CACHE_CONTROL_DISPONIBILIDAD_SEGUNDOS")
     def get(self, request):
         servicio_id = request.query_params.get("servicio")
         fecha_str = request.query_params.get("fecha")
@@ -181,15 +252,69 @@ class AgendaAvailabilityView(APIView):
             return Response({"detail": "Fecha inválida. Usa YYYY-MM-DD."}, status=400)
 
         slots = available_slots(servicio, fecha_val)
-        return Response(
-            [
-                {
-                    "hora_inicio": h_ini.strftime("%H:%M"),
-                    "hora_fin": h_fin.strftime("%H:%M"),
-                }
-                for h_ini, h_fin in slots
-            ]
-        )
+        return Response(slots_json(slots, compacto=es_compacto(request)))
+
+
+class AgendaAvailabilityRangeView(APIView):
+    """
+    Devuelve slots disponibles por día para un rango de fechas (calendario mensual)
+    con una sola consulta de citas. Con ?conteo=1 solo regresa cuántos slots libres hay
+    y con ?format=compact los slots son pares [inicio, fin] en minutos.
+    """
+    permission_classes = [AllowAny]
+    renderer_classes = [JSONPrecalculadoRenderer, SlotsCompactosRenderer]
+    MAX_DIAS = 62
+
+    @get_condicional(huella_rango, "CACHE_CONTROL_DISPONIBILIDAD_SEGUNDOS")
+    def get(self, request):
+        servicio_id = request.query_params.get("servicio")
+        desde_str = request.query_params.get("desde")
+        hasta_str = request.query_params.get("hasta")
+        solo_conteo = request.query_params.get("conteo", "").lower() in ("1", "true", "yes")
+
+        if not servicio_id or not desde_str or not hasta_str:
+            return Response({"detail": "Parámetros 'servicio', 'desde' y 'hasta' son requeridos."}, status=400)
+
+        try:
+            servicio = Servicio.objects.get(pk=servicio_id, activo=True)
+        except Servicio.DoesNotExist:
+            return Response({"detail": "Servicio no encontrado o inactivo."}, status=404)
+
+        try:
+            desde_val = date.fromisoformat(desde_str)
+            hasta_val = date.fromisoformat(hasta_str)
+        except ValueError:
+            return Response({"detail": "Fecha inválida. Usa YYYY-MM-DD."}, status=400)
+
+        if hasta_val < desde_val:
+            return Response({"detail": "'hasta' debe ser mayor o igual que 'desde'."}, status=400)
+        if hasta_val - desde_val >= timedelta(days=self.MAX_DIAS):
+            return Response({"detail": f"El rango no puede exceder {self.MAX_DIAS} días."}, status=400)
+
+        por_dia = available_slots_range(servicio, desde_val, hasta_val)
+        dias = ((fecha, dia_cerrado(fecha, servicio.negocio_id), slots) for fecha, slots in por_dia.items())
+        return Response(dias_json(dias, con_slots=not solo_conteo, compacto=es_compacto(request)))
+
+
+class AgendaCacheStatsView(APIView):
+    """
+    Contadores hit/miss del cache de disponibilidad (proceso actual y globales).
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(availability_cache.stats())
+
+
+class MetricsView(APIView):
+    """
+    Latencia, consultas y tiempo en BD por vista en formato de texto de Prometheus
+    (solo staff; requiere METRICAS_HABILITADAS para que haya datos).
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(metricas.exportar(), content_type=metricas.CONTENT_TYPE)
 
 
 class PublicMesaAvailabilityView(APIView):
@@ -199,6 +324,7 @@ class PublicMesaAvailabilityView(APIView):
 
     permission_classes = [AllowAny]
 
+    @get_condicional(huella_mesas, "CACHE_CONTROL_DISPONIBILIDAD_SEGUNDOS")
     def get(self, request):
         servicio_id = request.query_params.get("servicio")
         fecha_str = request.query_params.get("fecha")
@@ -221,55 +347,124 @@ class PublicMesaAvailabilityView(APIView):
 
         # Permite traer todas las mesas activas con servicio=all (vista agregada)
         if servicio_id == "all" or not servicio_id:
-            mesas = Mesa.objects.filter(activa=True, servicio__activo=True)
-            servicios_ids = mesas.values_list("servicio_id", flat=True).distinct()
+            servicio_id = None
         else:
             try:
-                servicio = Servicio.objects.get(pk=servicio_id, activo=True)
-            except Servicio.DoesNotExist:
+                servicio_id = int(servicio_id)
+            except ValueError:
+                return Response({"detail": "Servicio no encontrado o inactivo."}, status=404)
+            if not Servicio.objects.filter(pk=servicio_id, activo=True).exists():
                 return Response({"detail": "Servicio no encontrado o inactivo."}, status=404)
-            mesas = Mesa.objects.filter(servicio=servicio, activa=True)
-            servicios_ids = [servicio.id]
-        choice_labels = {key: label for key, label in Mesa.TIPO_CHOICES}
-        grouped = {}
-        for mesa in mesas:
-            tipo_key = (mesa.tipo or mesa.nombre or "general").strip()
-            display_name = choice_labels.get(mesa.tipo, mesa.nombre or tipo_key)
-            if tipo_key not in grouped:
-                grouped[tipo_key] = {
-                    "id": tipo_key,
-                    "nombre": display_name,
-                    "capacidad": mesa.capacidad_max or mesa.capacidad_min or 4,
-                    "total": 0,
-                    "ocupadas": 0,
-                    "precio": float(getattr(mesa.servicio, "precio", 0) or 0),
-                }
-            grouped[tipo_key]["total"] += 1
 
-        estados_activos = ("pendiente", "confirmada")
-        if hora_fin_val:
-            citas_qs = Cita.objects.filter(
-                servicio_id__in=servicios_ids,
-                fecha=fecha_val,
-                estado__in=estados_activos,
-                hora_inicio__lt=hora_fin_val,
-                hora_fin__gt=hora_inicio_val,
+        data = availability_cache.cached_mesas(
+            servicio_id,
+            fecha_val,
+            hora_inicio_val,
+            hora_fin_val,
+            lambda: self._disponibilidad_por_tipo(servicio_id, fecha_val, hora_inicio_val, hora_fin_val),
+        )
+        return Response(data)
+
+    @staticmethod
+    def _clave_tipo(prefijo=""):
+        """Grupo de una mesa: su tipo; las mesas sin tipo se agrupan por nombre."""
+        return Coalesce(
+            NullIf(f"{prefijo}tipo", Value("")),
+            NullIf(Trim(f"{prefijo}nombre"), Value("")),
+            Value("general"),
+        )
+
+    @classmethod
+    def _disponibilidad_por_tipo(cls, servicio_id, fecha_val, hora_inicio_val, hora_fin_val):
+        """
+        Dos consultas agregadas sin importar el tamaño del salón: mesas por
+        servicio y tipo, y citas activas en el horario por tipo de mesa.
+        """
+        if servicio_id:
+            mesas = Mesa.objects.filter(servicio_id=servicio_id, activa=True)
+            citas = Cita.objects.filter(servicio_id=servicio_id)
+        else:
+            mesas = Mesa.objects.filter(activa=True, servicio__activo=True)
+            citas = Cita.objects.filter(servicio__activo=True)
+
+        grupos = (
+            mesas.values("servicio_id", clave=cls._clave_tipo())
+            .annotate(
+                total=Count("id"),
+                tipo=Max("tipo"),
+                capacidad_min=Min("capacidad_min"),
+                capacidad=Max("capacidad_max"),
+                precio=Max("servicio__precio"),
             )
+            .order_by("clave", "servicio_id")
+        )
+
+        citas = citas.filter(fecha=fecha_val, estado__in=("pendiente", "confirmada"))
+        if hora_fin_val:
+            citas = citas.filter(hora_inicio__lt=hora_fin_val, hora_fin__gt=hora_inicio_val)
         else:
-            citas_qs = Cita.objects.filter(
-                servicio_id__in=servicios_ids,
-                fecha=fecha_val,
-                estado__in=estados_activos,
-                hora_inicio__gte=hora_inicio_val,
+            citas = citas.filter(hora_inicio__gte=hora_inicio_val)
+        # Una cita con mesa asignada ocupa el tipo de su mesa; las antiguas sin mesa
+        # (clave None) se reparten abajo, una mesa por cita.
+        filas_citas = (
+            citas.values_list(
+                Case(When(mesa__isnull=False, then=cls._clave_tipo("mesa__")), default=Value(None)),
+                "servicio_id",
+                "personas",
             )
+            .annotate(n=Count("id"))
+            .order_by()
+        )
 
-        ocupadas_total = citas_qs.count()
-        total_mesas = sum([item["total"] for item in grouped.values()]) or 1
-        for tipo_key, data in grouped.items():
-            proporcional = (ocupadas_total * data["total"]) // total_mesas
-            data["ocupadas"] = min(proporcional, data["total"])
+        grupos = list(grupos)
+        ocupadas = {}  # (servicio_id, clave) -> mesas ocupadas
+        sin_mesa = []
+        for clave, servicio, personas, n in filas_citas:
+            if clave is None:
+                sin_mesa += [(servicio, personas)] * n
+            else:
+                ocupadas[(servicio, clave)] = ocupadas.get((servicio, clave), 0) + n
+        # Best fit como asignacion: cada cita sin mesa ocupa el tipo libre más chico
+        # de su servicio que admite a sus personas (o cualquiera libre si ninguno).
+        # Las de más personas primero, que tienen menos tipos posibles.
+        sin_mesa.sort(key=lambda c: -(c[1] or 0))
+        for servicio, personas in sin_mesa:
+            libres = [
+                g
+                for g in grupos
+                if g["servicio_id"] == servicio and ocupadas.get((servicio, g["clave"]), 0) < g["total"]
+            ]
+            if not libres:
+                continue
+            admiten = [
+                g for g in libres if personas is None or (g["capacidad_min"] or 1) <= personas <= (g["capacidad"] or 4)
+            ]
+            g = min(admiten or libres, key=lambda g: (g["capacidad"] or 4, g["clave"]))
+            ocupadas[(servicio, g["clave"])] = ocupadas.get((servicio, g["clave"]), 0) + 1
 
-        return Response(list(grouped.values()))
+        por_tipo = {}
+        for g in grupos:
+            fila = por_tipo.setdefault(
+                g["clave"], {"total": 0, "ocupadas": 0, "tipo": None, "capacidad": None, "precio": None}
+            )
+            fila["total"] += g["total"]
+            fila["ocupadas"] += min(ocupadas.get((g["servicio_id"], g["clave"]), 0), g["total"])
+            fila["tipo"] = max(filter(None, (fila["tipo"], g["tipo"])), default=None)
+            fila["capacidad"] = max(filter(None, (fila["capacidad"], g["capacidad"])), default=None)
+            fila["precio"] = max((p for p in (fila["precio"], g["precio"]) if p is not None), default=None)
+
+        choice_labels = dict(Mesa.TIPO_CHOICES)
+        return [
+            {
+                "id": clave,
+                "nombre": choice_labels.get(fila["tipo"], clave),
+                "capacidad": fila["capacidad"] or 4,
+                "total": fila["total"],
+                "ocupadas": min(fila["ocupadas"], fila["total"]),
+                "precio": float(fila["precio"] or 0),
+            }
+            for clave, fila in por_tipo.items()
+        ]
 
 
 class MercadoPagoPreferenceView(APIView):
@@ -11,7 +11,7 @@ from rest_framework.views import APIView
 from google_auth_oauthlib.flow import Flow
 
 from .models import CalendarCredential
-from .google_sync import calendar_status, resync_calendar_events
+from .google_sync import calendar_status, resync_calendar_events, sync_calendar_incremental
 
 
 SCOPES = ["https://www.googleapis.com/auth/calendar"]
@@ -95,12 +95,12 @@ class GoogleAuthCallback(APIView):
 
 class GoogleCalendarStatus(APIView):
     """
-    Devuelve el estado de la integración con Calendar.
+    Devuelve el estado de la integración con Calendar (`?negocio_id=` para la de un negocio).
     """
     permission_classes = [AllowAny]
 
     def get(self, request):
-        return Response(calendar_status())
+        return Response(calendar_status(request.query_params.get("negocio_id")))
 
 
 class GoogleCalendarConfig(APIView):
@@ -138,12 +138,14 @@ class GoogleCalendarConfig(APIView):
 
 class GoogleCalendarResync(APIView):
     """
-    Endpoint para forzar resincronización manual de citas futuras.
+    Endpoint para resincronización manual de citas futuras.
+    Por defecto solo envía las que cambiaron; con `full` reenvía todas.
     """
     permission_classes = [AllowAny]
 
     def post(self, request):
-        limit = request.data.get("limit") or 200
+        full = str(request.data.get("full", "")).lower() in ("1", "true", "yes")
+        limit = request.data.get("limit") or (200 if full else 500)
         try:
             limit = int(limit)
         except (TypeError, ValueError):
@@ -153,5 +155,6 @@ class GoogleCalendarResync(APIView):
         if not status.get("authorized"):
             return Response({"detail": "Primero autoriza con Google Calendar."}, status=400)
 
-        created, updated = resync_calendar_events(limit=limit)
+        sync = resync_calendar_events if full else sync_calendar_incremental
+        created, updated = sync(limit=limit)
         return Response({"created": created, "updated": updated})
@@ -16,6 +16,9 @@ const todayISO = hoy.toISOString().slice(0, 10);
 const maxDateISO = new Date(Date.now() + 60 * 24 * 60 * 60 * 1000).toISOString().slice(0, 10);
 const weekDays = ["D", "L", "M", "M", "J", "V", "S"];
 
+// Clientes por búsqueda: se piden al servidor con ?search= en vez de traer la tabla completa
+const CLIENTES_POR_BUSQUEDA = 20;
+
 const hours = Array.from({ length: 10 }, (_, i) => 13 + i); // 13 a 22
 const minutes = ["00", "15", "30", "45"];
 
@@ -52,6 +55,8 @@ export default function NuevaCitaPage() {
   const [selectedNegocio, setSelectedNegocio] = useState("");
   const [selectedServicio, setSelectedServicio] = useState("");
   const [selectedCliente, setSelectedCliente] = useState("");
+  const [busquedaCliente, setBusquedaCliente] = useState("");
+  const [hayClientes, setHayClientes] = useState(false);
   const [clienteNombre, setClienteNombre] = useState("");
   const [clienteTipo, setClienteTipo] = useState<"vip" | "frecuente" | "nuevo">("nuevo");
   const [fecha, setFecha] = useState(todayISO);
@@ -68,7 +73,7 @@ export default function NuevaCitaPage() {
   const [successMsg, setSuccessMsg] = useState<string | null>(null);
   const [submitting, setSubmitting] = useState(false);
   const [token, setToken] = useState<string | null>(null);
-  const noCatalogs = !negocios.length || !servicios.length || !clientes.length;
+  const noCatalogs = !negocios.length || !servicios.length || !hayClientes;
 
   const slots = useMemo(
     () => hours.flatMap((h) => minutes.map((m) => `${String(h).padStart(2, "0")}:${m}`)),
@@ -86,25 +91,59 @@ export default function NuevaCitaPage() {
 
     (async () => {
       try {
-        const [nRes, sRes, cRes] = await Promise.all([
+        const [nRes, sRes] = await Promise.all([
           fetch(apiUrl("/api/negocios/"), { cache: "no-store", headers: { Authorization: `Token ${stored}` } }),
           fetch(apiUrl("/api/servicios/"), { cache: "no-store", headers: { Authorization: `Token ${stored}` } }),
-          fetch(apiUrl("/api/clientes/"), { cache: "no-store", headers: { Authorization: `Token ${stored}` } }),
         ]);
-        const [nJson, sJson, cJson] = await Promise.all([nRes.json(), sRes.json(), cRes.json()]);
+        const [nJson, sJson] = await Promise.all([nRes.json(), sRes.json()]);
         setNegocios(Array.isArray(nJson) ? nJson : []);
         setServicios(Array.isArray(sJson) ? sJson : []);
-        setClientes(Array.isArray(cJson) ? cJson : []);
         setSelectedNegocio(nJson?.[0]?.id ? String(nJson[0].id) : "");
         setSelectedServicio(sJson?.[0]?.id ? String(sJson[0].id) : "");
-        setSelectedCliente(cJson?.[0]?.id ? String(cJson[0].id) : "");
-        setClienteNombre(cJson?.[0]?.nombre || "");
       } catch (err) {
         setErrorMsg(lang === "es" ? "No se pudieron cargar catálogos." : "Could not load catalogs.");
       }
     })();
   }, [lang]);
 
+  useEffect(() => {
+    if (!token) return;
+    const termino = busquedaCliente.trim();
+    const controller = new AbortController();
+    // Sin término trae los más recientes; al escribir espera una pausa antes de consultar
+    const timer = setTimeout(async () => {
+      try {
+        const params = new URLSearchParams({
+          page_size: String(CLIENTES_POR_BUSQUEDA),
+          fields: "id,nombre,negocio,email",
+        });
+        if (termino) params.set("search", termino);
+        const res = await fetch(apiUrl(`/api/clientes/?${params}`), {
+          cache: "no-store",
+          headers: { Authorization: `Token ${token}` },
+          signal: controller.signal,
+        });
+        const page = await res.json();
+        // /api/clientes/ está paginado por cursor: los clientes vienen en `results`
+        const lista: Cliente[] = Array.isArray(page?.results) ? page.results : [];
+        setClientes(lista);
+        setSelectedCliente((prev) =>
+          lista.some((c) => String(c.id) === prev) ? prev : lista[0]?.id ? String(lista[0].id) : "",
+        );
+        if (!termino) {
+          setHayClientes(lista.length > 0);
+          setClienteNombre((prev) => prev || lista[0]?.nombre || "");
+        }
+      } catch (err) {
+        if (!controller.signal.aborted) setClientes([]);
+      }
+    }, termino ? 250 : 0);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [token, busquedaCliente]);
+
   useEffect(() => {
     setMonthView(new Date(fecha));
   }, [fecha]);
@@ -269,6 +308,14 @@ export default function NuevaCitaPage() {
 
           <div className="space-y-1">
             <label className="block text-sm font-medium text-slate-200">Cliente</label>
+            <input
+              type="search"
+              value={busquedaCliente}
+              onChange={(e) => setBusquedaCliente(e.target.value)}
+              className="w-full rounded-md border border-slate-700 bg-slate-950 px-3 py-2 text-sm"
+              placeholder={lang === "es" ? "Buscar por nombre, correo o teléfono" : "Search by name, email or phone"}
+              disabled={!token}
+            />
             <select
               name="cliente"
               value={selectedCliente}
@@ -37,6 +37,7 @@ export const copy: Record<
       acciones: string;
     };
     empty: string;
+    loadMore: string;
     view: string;
     delete: string;
     finalize: string;
@@ -67,6 +68,7 @@ export const copy: Record<
       acciones: "Acciones",
     },
     empty: "No hay citas registradas aún.",
+    loadMore: "Cargar más",
     view: "Ver / editar",
     delete: "Eliminar",
     finalize: "Finalizar",
@@ -102,6 +104,7 @@ export const copy: Record<
       acciones: "Actions",
     },
     empty: "No appointments yet.",
+    loadMore: "Load more",
     view: "View / edit",
     delete: "Delete",
     finalize: "Complete",
@@ -131,6 +134,9 @@ export default function CitasPage() {
   const t = copy[lang];
   const [token, setToken] = useState<string | null>(null);
   const [citas, setCitas] = useState<Cita[]>([]);
+  // Siguiente página del cursor que devuelve /api/citas/ (null = no hay más)
+  const [nextUrl, setNextUrl] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState<boolean>(false);
   const [loading, setLoading] = useState<boolean>(false);
   const [loginUser, setLoginUser] = useState("");
   const [loginPass, setLoginPass] = useState("");
@@ -157,11 +163,13 @@ export default function CitasPage() {
           setToken(null);
           window.localStorage.removeItem("sirToken");
           setCitas([]);
+          setNextUrl(null);
           return;
         }
         if (!res.ok) throw new Error("fetch citas failed");
         const data = await res.json();
-        setCitas(Array.isArray(data) ? data : []);
+        setCitas(Array.isArray(data?.results) ? data.results : []);
+        setNextUrl(data?.next ?? null);
       } catch (err) {
         setErrorMsg(t.actionError);
       } finally {
@@ -171,6 +179,26 @@ export default function CitasPage() {
     fetchCitas();
   }, [token, t.authError, t.actionError]);
 
+  const loadMore = async () => {
+    if (!token || !nextUrl) return;
+    setLoadingMore(true);
+    setErrorMsg(null);
+    try {
+      const res = await fetch(nextUrl, {
+        headers: { Authorization: `Token ${token}` },
+        cache: "no-store",
+      });
+      if (!res.ok) throw new Error("fetch citas failed");
+      const data = await res.json();
+      setCitas((prev) => [...prev, ...(Array.isArray(data?.results) ? data.results : [])]);
+      setNextUrl(data?.next ?? null);
+    } catch (err) {
+      setErrorMsg(t.actionError);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleLogin = async (e: React.FormEvent) => {
     e.preventDefault();
     setErrorMsg(null);
@@ -262,9 +290,23 @@ export default function CitasPage() {
               {lang === "es" ? "Cargando citas..." : "Loading appointments..."}
             </div>
           ) : (
-            <div className="border border-slate-800 rounded-xl overflow-hidden bg-slate-900/40">
-              <CitasTable initialCitas={citas} lang={lang} t={t} token={token} />
-            </div>
+            <>
+              <div className="border border-slate-800 rounded-xl overflow-hidden bg-slate-900/40">
+                <CitasTable key={citas.length} initialCitas={citas} lang={lang} t={t} token={token} />
+              </div>
+              {nextUrl && (
+                <div className="mt-4 flex justify-center">
+                  <button
+                    type="button"
+                    onClick={loadMore}
+                    disabled={loadingMore}
+                    className="rounded-lg border border-slate-700 px-4 py-2 text-sm text-slate-200 hover:border-emerald-400 hover:text-emerald-200 disabled:opacity-50"
+                  >
+                    {loadingMore ? "..." : t.loadMore}
+                  </button>
+                </div>
+              )}
+            </>
           )}
         </>
       )}